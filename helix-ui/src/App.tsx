@@ -1,4 +1,4 @@
-import React, { useEffect, useState } from "react";
+import React, { useEffect, useRef, useState } from "react";
 import { io, Socket } from "socket.io-client";
 import ChatBar from "./components/chatBar";
 import Workspace from "./components/Workspace";
@@ -6,13 +6,24 @@ import Header from "./components/Header";
 import { ThemeProvider } from "./components/theme-provider";
 import { ChatMessage, Task } from "./types"; // Import from types.ts
 
-interface WorkspacePayload {
-  tasks: Task[];
+interface WorkspaceSnapshot {
+  version: number;
+  workspace: { tasks?: Task[] };
+}
+
+interface WorkspaceDelta {
+  version: number;
+  base_version: number;
+  partial: boolean;
+  upserts: Task[];
+  removed: number[];
+  final_sequence?: string | null;
 }
 
 // Adjust to your backend server
+// Multi-worker deployments without sticky sessions need VITE_WEBSOCKET_ONLY=true (polling is pinned to one worker)
 const socket: Socket = io("http://localhost:5000", {
-  transports: ["websocket", "polling"],
+  transports: import.meta.env.VITE_WEBSOCKET_ONLY === "true" ? ["websocket"] : ["websocket", "polling"],
   reconnection: true,
   reconnectionAttempts: Infinity,
   reconnectionDelay: 1000,
@@ -23,6 +34,7 @@ const App: React.FC = () => {
   // Socket + Chat + Workspace Logic
   const [chatMessages, setChatMessages] = useState<ChatMessage[]>([]);
   const [workspaceTasks, setWorkspaceTasks] = useState<Task[]>([]);
+  const workspaceVersion = useRef(0);
 
   useEffect(() => {
     socket.on("connect", () => {
@@ -33,15 +45,25 @@ const App: React.FC = () => {
       setChatMessages((prev) => [...prev, { sender: "Helix", text: data }]);
     });
 
-    socket.on("workspace_update", (data: WorkspacePayload) => {
-      setWorkspaceTasks(data.tasks || []);
-      // setChatMessages((prev) => [
-      //   ...prev,
-      //   {
-      //     sender: "Helix",
-      //     text: "Final outreach sequence generated. Check the workspace for details.",
-      //   },
-      // ]);
+    // Full state on connect/reconnect (or after we ask for a resync)
+    socket.on("workspace_snapshot", (data: WorkspaceSnapshot) => {
+      workspaceVersion.current = data.version;
+      setWorkspaceTasks(data.workspace.tasks || []);
+    });
+
+    // Only the changed steps; resync if we missed a version
+    socket.on("workspace_delta", (delta: WorkspaceDelta) => {
+      if (delta.base_version !== workspaceVersion.current) {
+        socket.emit("workspace_resync");
+        return;
+      }
+      workspaceVersion.current = delta.version;
+      setWorkspaceTasks((prev) => {
+        const byId = new Map(prev.map((task) => [task.id, task]));
+        delta.removed.forEach((id) => byId.delete(id));
+        delta.upserts.forEach((task) => byId.set(task.id, task));
+        return Array.from(byId.values()).sort((a, b) => a.id - b.id);
+      });
     });
 
     socket.on("disconnect", () => {
@@ -51,7 +73,8 @@ const App: React.FC = () => {
     return () => {
       socket.off("connect");
       socket.off("ai_response");
-      socket.off("workspace_update");
+      socket.off("workspace_snapshot");
+      socket.off("workspace_delta");
       socket.off("disconnect");
     };
   }, []);
@@ -1,11 +1,8 @@
 import React, { useState, useEffect } from 'react';
 import { Tabs, TabsList, TabsTrigger, TabsContent } from '@/components/ui/tabs';
 import Sequences from './Sequences'; // Keep this import
-import { io } from 'socket.io-client';
 import { Task, Sequence } from '../types'; // Import from centralized types
 
-const socket = io('http://localhost:5000');
-
 interface WorkspaceProps {
   tasks: Task[];
 }
@@ -30,28 +27,6 @@ const Workspace: React.FC<WorkspaceProps> = ({ tasks }) => {
     }
   }, [tasks]);
 
-  useEffect(() => {
-    const handleSocketUpdate = (updatedWorkspace: { tasks: Task[] }) => {
-      console.log('🔄 Received workspace update:', updatedWorkspace);
-      if (updatedWorkspace.tasks) {
-        setSequences(
-          updatedWorkspace.tasks.map((task) => ({
-            id: task.id,
-            title: task.description,
-            message: {
-              subject: task.email_subject || task.message?.subject || 'Generated Outreach Email',
-              body: task.email_body || task.message?.body || 'No Content Provided',
-            },
-          }))
-        );
-      }
-    };
-    socket.on('workspace_update', handleSocketUpdate);
-    return () => {
-      socket.off('workspace_update', handleSocketUpdate);
-    };
-  }, []);
-
   const handleExecuteSequence = (id: number) => {
     console.log(`Executing sequence ${id}`);
     // Placeholder for actual execution logic
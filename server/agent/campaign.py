@@ -0,0 +1,302 @@
+import copy
+import csv
+import hashlib
+import io
+import itertools
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+from agent.helix_agent import HelixAgent
+from agent.json_output import OutputError, json_mode_options, parse_json_output, validate_sequence
+from agent.llm_client import llm_client
+from agent.response_cache import cache_scope, normalise_fields, response_cache
+from database.models import db, CampaignBatch
+
+REQUIRED_FIELDS = ("job_role", "technologies", "company_description", "location", "benefits")
+
+
+class CampaignInputError(ValueError):
+    """Raised when a campaign upload cannot be parsed into required_fields records."""
+
+
+def parse_records(raw: bytes, content_type: str, max_records: int) -> list:
+    """Reads a JSON list (or `{"records": [...]}`) or a CSV with one column per required field."""
+    text = raw.decode("utf-8-sig")
+    if "csv" in (content_type or ""):
+        rows = list(csv.DictReader(io.StringIO(text)))
+    else:
+        try:
+            data = json.loads(text)
+        except ValueError as e:
+            raise CampaignInputError(f"Body is not valid JSON: {e}")
+        rows = data.get("records") if isinstance(data, dict) else data
+        if not isinstance(rows, list):
+            raise CampaignInputError("Expected a list of records")
+
+    if not rows:
+        raise CampaignInputError("No records supplied")
+    if len(rows) > max_records:
+        raise CampaignInputError(f"At most {max_records} records per campaign")
+
+    records = []
+    for index, row in enumerate(rows):
+        if not isinstance(row, dict):
+            raise CampaignInputError(f"Record {index} is not an object")
+        fields = {key: (str(row.get(key)).strip() if row.get(key) not in (None, "") else None) for key in REQUIRED_FIELDS}
+        missing = [key for key, value in fields.items() if not value]
+        if missing:
+            raise CampaignInputError(f"Record {index} is missing {', '.join(missing)}")
+        records.append(fields)
+    return records
+
+
+def dedupe(records: list):
+    """Groups identical records (after normalisation). Returns `OrderedDict(key -> (fields, [indexes]))`."""
+    jobs = OrderedDict()
+    for index, fields in enumerate(records):
+        key = hashlib.sha256(json.dumps(normalise_fields(fields), sort_keys=True).encode("utf-8")).hexdigest()[:16]
+        jobs.setdefault(key, (fields, []))[1].append(index)
+    return jobs
+
+
+def _is_valid(workspace: dict) -> bool:
+    return bool(workspace.get("tasks")) and not str(workspace.get("final_sequence", "")).startswith("Error:")
+
+
+class CampaignRunner:
+    """Generates sequences for many required_fields records at once.
+
+    Online runs share one worker pool, so `max_workers` caps concurrent
+    generations across every campaign in the process. Identical records are
+    generated once, and results are yielded as soon as each one completes.
+    Offline runs go through a batch backend (OpenAI Batch API, or the local
+    stand-in) instead; each batch's owner and records are kept in the
+    campaign_batch table, so any worker can serve its results.
+    """
+
+    def __init__(self, max_workers=4, max_records=200, batch_backend="openai"):
+        self.max_workers = max_workers
+        self.max_records = max_records
+        self.batch_backend_kind = batch_backend
+        self._pool = None
+        self._batch_backend = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.max_workers = app.config.get("HELIX_CAMPAIGN_WORKERS", self.max_workers)
+        self.max_records = app.config.get("HELIX_CAMPAIGN_MAX_RECORDS", self.max_records)
+        self.batch_backend_kind = app.config.get("HELIX_BATCH_BACKEND", self.batch_backend_kind)
+
+    def _executor(self):
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="helix-campaign")
+        return self._pool
+
+    def batch_backend(self):
+        if self._batch_backend is None:
+            with self._lock:
+                if self._batch_backend is None:
+                    backend = LocalBatchBackend if self.batch_backend_kind == "local" else OpenAIBatchBackend
+                    self._batch_backend = backend()
+        return self._batch_backend
+
+    def shutdown(self, wait=True):
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait)
+            self._pool = None
+
+    def run(self, jobs, app=None, user_id=None):
+        """Yields `(key, fields, indexes, workspace_or_None, error_or_None)` in completion order.
+
+        `user_id` lets generation be seeded from that user's similar previous sequences.
+        """
+        def generate(fields):
+            agent = HelixAgent()
+            agent.user_id = user_id
+            agent.persist = False  # The campaign route saves its sequences in one bulk insert
+            if app is None:
+                return agent.generate_sequence(fields)
+            with app.app_context():
+                return agent.generate_sequence(fields)
+
+        futures = {self._executor().submit(generate, fields): (key, fields, indexes)
+                   for key, (fields, indexes) in jobs.items()}
+        for future in as_completed(futures):
+            key, fields, indexes = futures[future]
+            try:
+                workspace = future.result()
+            except Exception as e:
+                yield key, fields, indexes, None, str(e)
+                continue
+            if _is_valid(workspace):
+                yield key, fields, indexes, workspace, None
+            else:
+                yield key, fields, indexes, None, workspace.get("final_sequence") or "Generation failed"
+
+    def submit_batch(self, jobs, user_id):
+        """Offline mode: cached records resolve immediately, the rest become one batch job owned by `user_id`.
+
+        Returns `(batch_id_or_None, cached)` where `cached` maps key -> workspace.
+        """
+        agent = HelixAgent()
+        model = agent.generation_model()
+        cached, lines = {}, []
+        for key, (fields, _) in jobs.items():
+            hit = response_cache.get(fields, model, HelixAgent.generation_prompt_version(), scope=cache_scope(user_id))
+            if hit is not None:
+                cached[key] = hit
+                continue
+            agent.required_fields = dict(fields)
+            lines.append({
+                "custom_id": key,
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {
+                    "model": model,
+                    "messages": agent.generation_messages(),
+                    "max_tokens": 5000,
+                    "temperature": 0.7,
+                    **json_mode_options(model),
+                },
+            })
+        if not lines:
+            return None, cached
+        batch_id = self.batch_backend().submit(lines)
+        fields_by_key = {line["custom_id"]: jobs[line["custom_id"]][0] for line in lines}
+        try:
+            db.session.add(CampaignBatch(batch_id=batch_id, user_id=user_id, fields=fields_by_key))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            print(f"❌ Batch {batch_id} was submitted but could not be recorded")
+            raise
+        return batch_id, cached
+
+    def collect_batch(self, batch_id, user_id):
+        """Returns `(status, results, first_collection)`.
+
+        Batches that do not exist or belong to another user report status
+        "not_found". `results` (key -> {fields, workspace | error}) is None
+        until the batch has finished; `first_collection` is True for exactly
+        one caller across all workers, so the sequences are saved once.
+        """
+        batch = db.session.get(CampaignBatch, batch_id)
+        if batch is None or batch.user_id != user_id:
+            return "not_found", None, False
+        fields_by_key = batch.fields
+        db.session.rollback()  # ✅ Don't hold a DB connection while the Batch API answers
+
+        status, outputs = self.batch_backend().results(batch_id)
+        if outputs is None:
+            return status, None, False
+        # ✅ Conditional update: only the request that flips collected_at gets first_collection
+        first_collection = CampaignBatch.query.filter_by(batch_id=batch_id, collected_at=None).update(
+            {"collected_at": datetime.utcnow()}) == 1
+        db.session.commit()
+
+        model = HelixAgent().generation_model()
+        results = {}
+        for key, text, error in outputs:
+            fields = fields_by_key.get(key)
+            if error is None:
+                try:
+                    workspace, _ = parse_json_output(text, validate_sequence)
+                    if fields:
+                        # Batch prompts are never seeded from the user's history
+                        response_cache.put(fields, model, HelixAgent.generation_prompt_version(), copy.deepcopy(workspace),
+                                           scope=cache_scope(user_id), personalised=False)
+                    results[key] = {"fields": fields, "workspace": workspace}
+                    continue
+                except OutputError as e:
+                    error = str(e)
+            results[key] = {"fields": fields, "error": error}
+        return status, results, first_collection
+
+
+class OpenAIBatchBackend:
+    """Submits JSONL requests through the OpenAI Batch API (24h completion window, half price)."""
+
+    def submit(self, lines):
+        client = llm_client.openai_client()
+        payload = "\n".join(json.dumps(line) for line in lines).encode("utf-8")
+        upload = client.files.create(file=("campaign.jsonl", payload), purpose="batch")
+        batch = client.batches.create(input_file_id=upload.id, endpoint="/v1/chat/completions", completion_window="24h")
+        print(f"✅ Submitted campaign batch {batch.id} ({len(lines)} requests)")
+        return batch.id
+
+    def results(self, batch_id):
+        client = llm_client.openai_client()
+        batch = client.batches.retrieve(batch_id)
+        if batch.status != "completed":
+            return batch.status, None
+
+        outputs = []
+        for file_id, failed in ((batch.output_file_id, False), (batch.error_file_id, True)):
+            if not file_id:
+                continue
+            for line in client.files.content(file_id).text.splitlines():
+                if line.strip():
+                    outputs.append(_batch_output(json.loads(line), failed))
+        return batch.status, outputs
+
+
+class LocalBatchBackend:
+    """Stand-in for the Batch API (tests, local runs): works through the JSONL on a background thread
+    with the regular LLM client and reports the same statuses and output line format. Batches live in
+    this process, so the local backend only suits a single worker.
+    """
+
+    def __init__(self):
+        self._ids = itertools.count(1)
+        self._batches = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, lines):
+        batch_id = f"batch_local_{next(self._ids)}_{int(time.time())}"  # Unique across restarts (batch_id is a key)
+        with self._lock:
+            self._batches[batch_id] = {"status": "in_progress", "outputs": [], "created_at": time.time()}
+        threading.Thread(target=self._process, args=(batch_id, lines), name=f"helix-{batch_id}", daemon=True).start()
+        return batch_id
+
+    def _process(self, batch_id, lines):
+        outputs = []
+        for line in lines:
+            try:
+                request = dict(line["body"])
+                response = llm_client.create("generate", **request)
+                outputs.append({"custom_id": line["custom_id"], "response": {"status_code": 200, "body": {
+                    "choices": [{"message": {"content": response.choices[0].message.content}}]}}, "error": None})
+            except Exception as e:
+                outputs.append({"custom_id": line["custom_id"], "response": None, "error": {"message": str(e)}})
+        with self._lock:
+            self._batches[batch_id].update(status="completed", outputs=outputs)
+
+    def results(self, batch_id):
+        with self._lock:
+            batch = self._batches.get(batch_id)
+        if batch is None:
+            return "not_found", None
+        if batch["status"] != "completed":
+            return batch["status"], None
+        return batch["status"], [_batch_output(line, False) for line in batch["outputs"]]
+
+
+def _batch_output(line: dict, failed: bool):
+    """Normalises one Batch API output line to `(custom_id, content, error)`."""
+    key = line.get("custom_id")
+    response = line.get("response") or {}
+    if failed or line.get("error") or response.get("status_code") != 200:
+        error = (line.get("error") or {}).get("message") or f"Request failed ({response.get('status_code')})"
+        return key, None, error
+    choices = response.get("body", {}).get("choices") or [{}]
+    return key, choices[0].get("message", {}).get("content") or "", None
+
+
+# ✅ Shared runner; its pool caps concurrent campaign generations process-wide
+campaign_runner = CampaignRunner()
@@ -0,0 +1,202 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from types import SimpleNamespace
+
+# Request fields that decide the reply; model, timeouts and streaming do not
+REQUEST_KEYS = ("messages", "tools", "tool_choice", "max_tokens", "temperature")
+
+
+def request_hash(purpose: str, request: dict) -> str:
+    payload = {"purpose": purpose, **{key: request.get(key) for key in REQUEST_KEYS}}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:20]
+
+
+class Cassette:
+    """A recorded agent session: one gzip-compressed JSON line per event, appended as it happens.
+
+    Events (short keys keep thousands of sessions small):
+      {"t": "turn", "i": user_input}
+      {"t": "llm", "p": purpose, "h": request_hash, "c": content, "a": tool_arguments, "u": [prompt, completion, cached], "ms": latency}
+      {"t": "end", "r": response_type, "w": workspace, "f": required_fields, "ms": turn_ms}
+    Requests are stored only as their hash; the replies carry everything replay needs.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_session(cls, directory: str, session_key: str):
+        os.makedirs(directory, exist_ok=True)
+        name = hashlib.sha256(session_key.encode("utf-8")).hexdigest()[:16]  # No emails in file names
+        return cls(os.path.join(directory, f"{name}-{int(time.time())}.jsonl.gz"))
+
+    def append(self, event: dict):
+        line = (json.dumps(event, separators=(",", ":")) + "\n").encode("utf-8")
+        with self._lock:
+            with gzip.open(self.path, "ab") as f:  # Each append is its own gzip member; readers see one stream
+                f.write(line)
+
+    def events(self) -> list:
+        with gzip.open(self.path, "rt", encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def turns(self) -> list:
+        """`[{"input", "calls": [llm events], "end": end event or None}]` in recorded order."""
+        turns = []
+        for event in self.events():
+            if event["t"] == "turn":
+                turns.append({"input": event["i"], "calls": [], "end": None})
+            elif turns and event["t"] == "llm":
+                turns[-1]["calls"].append(event)
+            elif turns and event["t"] == "end":
+                turns[-1]["end"] = event
+        return turns
+
+
+def _usage(response):
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return None
+    cached = getattr(getattr(usage, "prompt_tokens_details", None), "cached_tokens", None) or 0
+    return [usage.prompt_tokens or 0, usage.completion_tokens or 0, cached]
+
+
+class RecordingLLM:
+    """Wraps the LLM client and appends every call's reply to a cassette (streams once they are drained)."""
+
+    def __init__(self, client, cassette: Cassette):
+        self.client = client
+        self.cassette = cassette
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)  # model_for, tier_order, stats, ...
+
+    def create(self, purpose: str, json_mode=False, **request):
+        start = time.perf_counter()
+        response = self.client.create(purpose, json_mode=json_mode, **request)
+        event = {"t": "llm", "p": purpose, "h": request_hash(purpose, request)}
+        if request.get("stream"):
+            return _RecordingStream(response, self.cassette, event, start)
+
+        message = response.choices[0].message
+        tool_calls = getattr(message, "tool_calls", None)
+        event.update(c=message.content, a=tool_calls[0].function.arguments if tool_calls else None,
+                     u=_usage(response), ms=round((time.perf_counter() - start) * 1000, 1))
+        self.cassette.append(event)
+        return response
+
+
+class _RecordingStream:
+    def __init__(self, stream, cassette, event, start):
+        self._stream = stream
+        self._cassette = cassette
+        self._event = event
+        self._start = start
+        self._parts = []
+        self._usage = None
+        self._closed = False
+
+    def __iter__(self):
+        for chunk in self._stream:
+            if getattr(chunk, "usage", None):
+                self._usage = _usage(chunk)
+            if chunk.choices and chunk.choices[0].delta.content:
+                self._parts.append(chunk.choices[0].delta.content)
+            yield chunk
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._stream.close()
+        self._event.update(c="".join(self._parts), a=None, u=self._usage,
+                           ms=round((time.perf_counter() - self._start) * 1000, 1))
+        self._cassette.append(self._event)
+
+
+class ReplayMiss(Exception):
+    """Raised when a replayed session makes an LLM call the recording has no reply for."""
+
+
+class ReplayLLM:
+    """Serves a session's recorded replies instead of calling the API.
+
+    A call is matched on its request hash first. When prompts or routing
+    changed, the hash differs: the next unused reply recorded for the same
+    purpose is used instead (counted in `fuzzy`), and a call with nothing
+    left to serve raises ReplayMiss (counted in `missing`).
+    """
+
+    def __init__(self, model="replay"):
+        self.model = model
+        self._calls = []
+        self._used = []
+        self._lock = threading.Lock()
+        self.exact = 0
+        self.fuzzy = 0
+        self.missing = 0
+
+    def model_for(self, purpose: str) -> str:
+        return self.model
+
+    def answered_model(self):
+        return self.model
+
+    def load_turn(self, calls: list):
+        """Serves the replies recorded for the next turn (unused ones from the previous turn are dropped)."""
+        with self._lock:
+            self._calls = list(calls)
+            self._used = [False] * len(calls)
+
+    def _take(self, purpose, digest):
+        with self._lock:
+            for matches_exactly in (True, False):
+                for index, call in enumerate(self._calls):
+                    if self._used[index] or call["p"] != purpose:
+                        continue
+                    if matches_exactly and call["h"] != digest:
+                        continue
+                    self._used[index] = True
+                    if matches_exactly:
+                        self.exact += 1
+                    else:
+                        self.fuzzy += 1
+                    return call
+            self.missing += 1
+        raise ReplayMiss(f"No recorded reply left for '{purpose}'")
+
+    def create(self, purpose: str, json_mode=False, **request):
+        call = self._take(purpose, request_hash(purpose, request))
+        prompt, completion, cached = call.get("u") or [0, 0, 0]
+        usage = SimpleNamespace(prompt_tokens=prompt, completion_tokens=completion, total_tokens=prompt + completion,
+                                prompt_tokens_details=SimpleNamespace(cached_tokens=cached))
+        if request.get("stream"):
+            return _ReplayStream(call.get("c") or "", usage)
+
+        tool_calls = None
+        if call.get("a") is not None:
+            tool_calls = [SimpleNamespace(function=SimpleNamespace(name="apply_sequence_patch", arguments=call["a"]))]
+        message = SimpleNamespace(role="assistant", content=call.get("c"), tool_calls=tool_calls)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message, finish_reason="stop")], usage=usage)
+
+
+class _ReplayStream:
+    CHUNK_CHARS = 24
+
+    def __init__(self, text, usage):
+        self._text = text
+        self._usage = usage
+
+    def __iter__(self):
+        for start in range(0, len(self._text), self.CHUNK_CHARS):
+            delta = SimpleNamespace(content=self._text[start:start + self.CHUNK_CHARS])
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)], usage=None)
+        yield SimpleNamespace(choices=[], usage=self._usage)
+
+    def close(self):
+        pass
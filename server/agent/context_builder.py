@@ -0,0 +1,107 @@
+import json
+from functools import lru_cache
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except Exception:  # tiktoken is optional; fall back to a ~4 chars/token estimate
+    _encoding = None
+
+MESSAGE_OVERHEAD_TOKENS = 4  # role + separators per chat message
+GIST_CHARS = 160
+
+
+@lru_cache(maxsize=4096)
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return max(1, len(text) // 4)
+
+
+def message_tokens(message: dict) -> int:
+    return count_tokens(message.get("content") or "") + MESSAGE_OVERHEAD_TOKENS
+
+
+@lru_cache(maxsize=4096)
+def _compact_content(role: str, content: str) -> str:
+    """Replaces full workspace JSON dumps with a one-line reference."""
+    if role != "assistant" or not content.startswith("{"):
+        return content
+    try:
+        response = json.loads(content)
+    except json.JSONDecodeError:
+        return content
+    workspace = response.get("workspace") if isinstance(response, dict) else None
+    if not isinstance(workspace, dict) or not workspace.get("tasks"):
+        return content
+    steps = "; ".join(str(task.get("description", task.get("id"))) for task in workspace["tasks"])
+    return f"[Workspace update with {len(workspace['tasks'])} steps: {steps[:GIST_CHARS]}. See the current workspace for details.]"
+
+
+def compact_message(message: dict) -> dict:
+    content = message.get("content") or ""
+    compacted = _compact_content(message.get("role", ""), content)
+    if compacted == content:
+        return message
+    return {"role": message["role"], "content": compacted}
+
+
+@lru_cache(maxsize=4096)
+def gist(role: str, content: str) -> str:
+    """One summary line for a turn that no longer fits verbatim."""
+    text = " ".join(_compact_content(role, content).split())
+    if len(text) > GIST_CHARS:
+        text = text[:GIST_CHARS].rstrip() + "…"
+    return f"{role}: {text}"
+
+
+class ContextBuilder:
+    """Builds the `messages` history for one prompt within a token budget.
+
+    The most recent turns are kept verbatim (with workspace dumps compacted);
+    everything older is folded into a single system message holding the
+    session's rolling summary plus a gist line per dropped turn. A
+    `summary_share` of the budget is reserved for that summary.
+    """
+
+    def __init__(self, budget: int, min_recent: int = 2, summary_share: float = 0.25):
+        self.budget = budget
+        self.min_recent = min_recent
+        self.recent_budget = int(budget * (1 - summary_share))
+
+    def build(self, history: list, summary_lines: list = None) -> list:
+        recent = []
+        used = 0
+        cut = len(history)
+
+        for index in range(len(history) - 1, -1, -1):
+            message = compact_message(history[index])
+            cost = message_tokens(message)
+            if used + cost > self.recent_budget and len(recent) >= self.min_recent:
+                break
+            recent.append(message)
+            used += cost
+            cut = index
+        recent.reverse()
+
+        older = list(summary_lines or []) + [gist(m.get("role", ""), m.get("content") or "") for m in history[:cut]]
+        if not older:
+            return recent
+
+        # ✅ Keep the newest summary lines that still fit in what is left of the budget
+        remaining = max(self.budget - used - MESSAGE_OVERHEAD_TOKENS, 0)
+        kept = []
+        for line in reversed(older):
+            cost = count_tokens(line) + 1
+            if cost > remaining:
+                break
+            kept.append(line)
+            remaining -= cost
+        if not kept:
+            return recent
+
+        kept.reverse()
+        summary = {"role": "system", "content": "Summary of earlier conversation:\n" + "\n".join(kept)}
+        return [summary, *recent]
@@ -0,0 +1,127 @@
+import copy
+import json
+import re
+
+STEP_FIELDS = ("description", "subject", "body")
+
+# Function-calling schema the model fills in instead of echoing the whole sequence
+PATCH_TOOL = {
+    "type": "function",
+    "function": {
+        "name": "apply_sequence_patch",
+        "description": "Apply a minimal list of edits to the outreach sequence.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "operations": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "op": {"type": "string", "enum": ["update", "insert", "delete"]},
+                            "step_id": {
+                                "type": "integer",
+                                "description": "Step to update/delete; for insert, the step to insert after (0 = at the start, omit = at the end).",
+                            },
+                            "fields": {
+                                "type": "object",
+                                "description": "Only the changed fields; insert requires all of them.",
+                                "properties": {field: {"type": "string"} for field in STEP_FIELDS},
+                            },
+                        },
+                        "required": ["op"],
+                    },
+                },
+                "final_sequence": {"type": "string", "description": "Updated one-line summary of the sequence."},
+            },
+            "required": ["operations"],
+        },
+    },
+}
+
+
+class PatchError(ValueError):
+    """Raised when a patch does not fit the current sequence."""
+
+
+def describe_sequence(workspace: dict) -> str:
+    """Compact JSON of the current steps for the edit prompt."""
+    return json.dumps({"tasks": workspace.get("tasks", []), "final_sequence": workspace.get("final_sequence")},
+                      separators=(",", ":"))
+
+
+def validate_patch(patch: dict, workspace: dict, allowed_ops=("update", "insert", "delete")):
+    """Checks every operation against the current sequence; raises PatchError on the first problem."""
+    if not isinstance(patch, dict) or not isinstance(patch.get("operations"), list):
+        raise PatchError("Patch must be an object with an 'operations' list")
+    if not patch["operations"]:
+        raise PatchError("Patch contains no operations")
+
+    step_ids = {task.get("id") for task in workspace.get("tasks", [])}
+    deleted = set()
+    for index, operation in enumerate(patch["operations"]):
+        if not isinstance(operation, dict):
+            raise PatchError(f"Operation {index} is not an object")
+        op = operation.get("op")
+        step_id = operation.get("step_id")
+        fields = operation.get("fields") or {}
+        if op not in allowed_ops:
+            raise PatchError(f"Operation {index}: '{op}' is not allowed here")
+        if not isinstance(fields, dict) or any(key not in STEP_FIELDS for key in fields):
+            raise PatchError(f"Operation {index}: fields must only contain {', '.join(STEP_FIELDS)}")
+        if any(not isinstance(value, str) for value in fields.values()):
+            raise PatchError(f"Operation {index}: field values must be strings")
+
+        if op in ("update", "delete") and (step_id not in step_ids or step_id in deleted):
+            raise PatchError(f"Operation {index}: step {step_id} does not exist")
+        if op == "delete":
+            deleted.add(step_id)
+        if op == "update" and not fields:
+            raise PatchError(f"Operation {index}: update has no fields")
+        if op == "insert":
+            if step_id not in (None, 0) and (step_id not in step_ids or step_id in deleted):
+                raise PatchError(f"Operation {index}: cannot insert after missing step {step_id}")
+            missing = [field for field in STEP_FIELDS if not fields.get(field)]
+            if missing:
+                raise PatchError(f"Operation {index}: insert is missing {', '.join(missing)}")
+
+
+def apply_patch(workspace: dict, patch: dict) -> dict:
+    """Returns a new workspace with the (validated) patch applied and step ids renumbered."""
+    result = copy.deepcopy(workspace)
+    tasks = result.setdefault("tasks", [])
+
+    def position(step_id):
+        return next(i for i, task in enumerate(tasks) if task.get("id") == step_id)
+
+    for operation in patch["operations"]:
+        op, step_id, fields = operation["op"], operation.get("step_id"), operation.get("fields") or {}
+        if op == "update":
+            task = tasks[position(step_id)]
+            if "description" in fields:
+                task["description"] = fields["description"]
+            message = task.setdefault("message", {})
+            for key in ("subject", "body"):
+                if key in fields:
+                    message[key] = fields[key]
+        elif op == "delete":
+            del tasks[position(step_id)]
+        elif op == "insert":
+            new_task = {
+                "id": None,
+                "description": fields["description"],
+                "message": {"subject": fields["subject"], "body": fields["body"]},
+            }
+            if step_id is None:
+                tasks.append(new_task)
+            else:
+                tasks.insert(0 if step_id == 0 else position(step_id) + 1, new_task)
+
+    # ✅ Keep ids (and any "Step N:" prefixes) sequential after inserts/deletes
+    for number, task in enumerate(tasks, start=1):
+        task["id"] = number
+        task["description"] = re.sub(r"^Step \d+:", f"Step {number}:", task.get("description", ""))
+
+    if patch.get("final_sequence"):
+        result["final_sequence"] = patch["final_sequence"]
+    return result
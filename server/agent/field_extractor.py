@@ -0,0 +1,271 @@
+import re
+import threading
+
+# Canonical skill name -> aliases (matched case-insensitively on word boundaries; see AMBIGUOUS_ALIASES)
+TECH_SKILLS = {
+    "Python": ["python", "py3"],
+    "Django": ["django"],
+    "Flask": ["flask"],
+    "FastAPI": ["fastapi"],
+    "JavaScript": ["javascript", "js", "es6"],
+    "TypeScript": ["typescript", "ts"],
+    "React": ["react", "react.js", "reactjs"],
+    "Vue": ["vue", "vue.js", "vuejs"],
+    "Angular": ["angular"],
+    "Node.js": ["node", "node.js", "nodejs"],
+    "Java": ["java"],
+    "Spring": ["spring", "spring boot"],
+    "Kotlin": ["kotlin"],
+    "Swift": ["swift"],
+    "Go": ["golang", "go lang"],
+    "Rust": ["rust"],
+    "C++": ["c++", "cpp"],
+    "C#": ["c#", "csharp"],
+    ".NET": [".net", "dotnet"],
+    "Ruby": ["ruby"],
+    "Rails": ["rails", "ruby on rails"],
+    "PHP": ["php"],
+    "Scala": ["scala"],
+    "SQL": ["sql"],
+    "PostgreSQL": ["postgres", "postgresql"],
+    "MySQL": ["mysql"],
+    "MongoDB": ["mongodb", "mongo"],
+    "Redis": ["redis"],
+    "Kafka": ["kafka"],
+    "GraphQL": ["graphql"],
+    "AWS": ["aws", "amazon web services"],
+    "GCP": ["gcp", "google cloud"],
+    "Azure": ["azure"],
+    "Docker": ["docker"],
+    "Kubernetes": ["kubernetes", "k8s"],
+    "Terraform": ["terraform"],
+    "Machine Learning": ["machine learning", "ml"],
+    "PyTorch": ["pytorch"],
+    "TensorFlow": ["tensorflow"],
+    "Spark": ["spark", "pyspark"],
+    "iOS": ["ios"],
+    "Android": ["android"],
+}
+
+# Canonical location -> aliases
+LOCATIONS = {
+    "Remote": ["remote", "fully remote", "remote-first", "work from home", "wfh"],
+    "Hybrid": ["hybrid"],
+    "New York, NY": ["new york", "nyc", "new york city", "manhattan", "brooklyn"],
+    "San Francisco, CA": ["san francisco", "sf", "bay area"],
+    "Los Angeles, CA": ["los angeles", "la"],
+    "Seattle, WA": ["seattle"],
+    "Austin, TX": ["austin"],
+    "Boston, MA": ["boston"],
+    "Chicago, IL": ["chicago"],
+    "Denver, CO": ["denver"],
+    "Atlanta, GA": ["atlanta"],
+    "Miami, FL": ["miami"],
+    "Washington, DC": ["washington dc", "washington, dc", "d.c."],
+    "Toronto, Canada": ["toronto"],
+    "Vancouver, Canada": ["vancouver"],
+    "London, UK": ["london"],
+    "Berlin, Germany": ["berlin"],
+    "Amsterdam, Netherlands": ["amsterdam"],
+    "Dublin, Ireland": ["dublin"],
+    "Paris, France": ["paris"],
+    "Bangalore, India": ["bangalore", "bengaluru"],
+    "Singapore": ["singapore"],
+    "Sydney, Australia": ["sydney"],
+}
+
+PERKS = [
+    "equity", "stock options", "rsu", "rsus", "401k", "401(k)", "health insurance", "healthcare",
+    "dental", "vision", "pto", "unlimited pto", "paid time off", "parental leave", "bonus",
+    "signing bonus", "relocation", "learning budget", "gym", "wellness", "remote stipend",
+]
+
+SALARY_PATTERN = re.compile(
+    r"(?:\$|usd\s?|£|€)\s?\d[\d,]*(?:\.\d+)?\s?(?:k|K)?(?:\s?(?:-|to|–)\s?(?:\$|£|€)?\s?\d[\d,]*(?:\.\d+)?\s?(?:k|K)?)?"
+    r"|\b\d{2,3}\s?(?:k|K)\b(?:\s?(?:-|to|–)\s?\d{2,3}\s?(?:k|K)\b)?"
+)
+
+ROLE_PATTERN = re.compile(
+    r"\b((?:(?:senior|sr\.?|junior|jr\.?|staff|principal|lead|mid[- ]level|entry[- ]level)\s+)?"
+    r"(?:[a-z.+#]+\s+){0,3}?"
+    r"(?:engineer|developer|dev|architect|scientist|designer|manager|analyst|sre|programmer))\b",
+    re.IGNORECASE,
+)
+
+ROLE_STOPWORDS = {"a", "an", "the", "hire", "hiring", "need", "looking", "for", "want", "our", "new", "to", "we", "i"}
+
+QUESTION_WORDS = ("what", "why", "how", "which", "who", "can", "could", "should", "do", "does")
+
+# Aliases that are also everyday words or abbreviations ("spring", "la", "ts"). They only count
+# next to a cue word, alongside an unambiguous match, or as the answer to that field's question.
+AMBIGUOUS_ALIASES = {"js", "ts", "react", "node", "spring", "swift", "rust", "ml", "go lang", "la", "sf"}
+
+SKILL_CUES = {
+    "experience", "experienced", "stack", "skill", "skills", "proficient", "proficiency", "expert", "using",
+    "know", "knows", "developer", "developers", "engineer", "engineers", "dev", "devs", "framework",
+    "frameworks", "language", "languages", "backend", "frontend", "fullstack", "years", "yrs",
+}
+LOCATION_CUES = {"in", "based", "located", "office", "offices", "onsite", "on-site", "near", "from", "relocate", "hq"}
+
+# Replies that never answer a question, however short
+NON_ANSWERS = {
+    "yes", "no", "ok", "okay", "sure", "thanks", "thank you", "idk", "not sure", "skip", "n/a", "none",
+    "sounds good", "great", "cool", "got it", "perfect",
+}
+
+WORD_PATTERN = re.compile(r"[\w+#.-]+")
+
+
+def _alias_pattern(alias):
+    return re.compile(r"(?<![\w.+#])" + re.escape(alias) + r"(?![\w+#])", re.IGNORECASE)
+
+
+def _gazetteer(entries):
+    return [(name, [(_alias_pattern(a), a in AMBIGUOUS_ALIASES) for a in aliases]) for name, aliases in entries.items()]
+
+
+_SKILL_PATTERNS = _gazetteer(TECH_SKILLS)
+_LOCATION_PATTERNS = _gazetteer(LOCATIONS)
+_PERK_PATTERNS = [(perk, _alias_pattern(perk)) for perk in PERKS]
+
+
+class FieldExtractor:
+    """Rule- and gazetteer-based extraction of the hiring fields.
+
+    Runs before the LLM on every turn. Returns `{field: (value, confidence)}`
+    for whatever it can read from the message: skills from TECH_SKILLS,
+    places from LOCATIONS, salary/perk patterns, a role noun phrase, and the
+    message itself when it answers the question that was just asked.
+    """
+
+    def __init__(self, confidence_threshold=0.8, max_answer_words=40):
+        self.confidence_threshold = confidence_threshold
+        self.max_answer_words = max_answer_words
+        self._lock = threading.Lock()
+        self.turns = 0
+        self.turns_resolved_locally = 0
+        self.fields_filled = 0
+        self.llm_calls = 0
+        self.llm_calls_saved = 0
+
+    def extract(self, text: str, pending_field: str = None) -> dict:
+        results = {}
+        if not text:
+            return results
+
+        for field, patterns, cues in (("technologies", _SKILL_PATTERNS, SKILL_CUES),
+                                      ("location", _LOCATION_PATTERNS, LOCATION_CUES)):
+            names, in_context = self._find_all(patterns, cues, text)
+            if names:
+                # ✅ Ambiguous aliases on their own stay below the threshold unless this field was asked for
+                confident = in_context or (pending_field == field and self._looks_like_answer(text))
+                results[field] = (", ".join(names), 0.9 if confident else 0.5)
+
+        benefits = [m.group(0).strip() for m in SALARY_PATTERN.finditer(text)]
+        benefits += [perk for perk, pattern in _PERK_PATTERNS if pattern.search(text)]
+        if benefits:
+            results["benefits"] = (", ".join(dict.fromkeys(benefits)), 0.85)
+
+        role = self._find_role(text)
+        if role:
+            results["job_role"] = (role, 0.85)
+
+        # ✅ A short, non-question reply of the right shape is the answer to the question that was just asked
+        answer = text.strip().rstrip(".")
+        if pending_field and self._looks_like_answer(text) and self._fits_field(pending_field, answer, results):
+            if results.get(pending_field, (None, 0))[1] < self.confidence_threshold:
+                results[pending_field] = (answer, 0.95)
+
+        return results
+
+    def confident(self, results: dict) -> dict:
+        return {
+            field: value
+            for field, (value, confidence) in results.items()
+            if confidence >= self.confidence_threshold
+        }
+
+    def record_turn(self, fields_filled: int, llm_called: bool):
+        with self._lock:
+            self.turns += 1
+            self.fields_filled += fields_filled
+            if llm_called:
+                self.llm_calls += 1
+            else:
+                self.llm_calls_saved += 1
+                self.turns_resolved_locally += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "turns": self.turns,
+                "fields_filled_locally": self.fields_filled,
+                "hit_rate": (self.turns_resolved_locally / self.turns) if self.turns else 0.0,
+                "llm_calls": self.llm_calls,
+                "llm_calls_saved": self.llm_calls_saved,
+            }
+
+    def _looks_like_answer(self, text):
+        stripped = text.strip()
+        if not stripped or stripped.endswith("?"):
+            return False
+        if stripped.lower().split()[0] in QUESTION_WORDS:
+            return False
+        if stripped.lower().rstrip(".!") in NON_ANSWERS:
+            return False
+        return len(stripped.split()) <= self.max_answer_words
+
+    @staticmethod
+    def _fits_field(field, answer, results):
+        """Basic type check for a pending-field answer, so "sounds good" is not taken as a location."""
+        words = answer.split()
+        if field == "technologies":
+            return "technologies" in results or len(words) == 1 or (
+                len(words) <= 8 and ("," in answer or " and " in answer.lower()))
+        if field == "location":
+            # Unknown places must at least look like a proper noun ("Portland", "Lisbon, Portugal")
+            return "location" in results or (
+                len(words) <= 5 and any(w[0].isupper() for w in words) and not any(c.isdigit() for c in answer))
+        if field == "benefits":
+            return "benefits" in results or any(c.isdigit() for c in answer)
+        if field == "job_role":
+            return "job_role" in results or (len(words) <= 6 and any(c.isalpha() for c in answer))
+        if field == "company_description":
+            return len(words) >= 2
+        return True
+
+    @staticmethod
+    def _find_all(patterns, cues, text):
+        """Canonical names matched in `text`, and whether any ambiguous alias among them had context."""
+        words = [w.lower() for w in WORD_PATTERN.findall(text)]
+        found, unambiguous, ambiguous_in_context = [], False, False
+        for name, alias_patterns in patterns:
+            for pattern, ambiguous in alias_patterns:
+                match = pattern.search(text)
+                if not match:
+                    continue
+                found.append(name)
+                if not ambiguous:
+                    unambiguous = True
+                else:
+                    # Cue words up to three words before or two after the alias
+                    index = len(WORD_PATTERN.findall(text[:match.start()]))
+                    span = len(WORD_PATTERN.findall(match.group(0)))
+                    window = words[max(0, index - 3):index] + words[index + span:index + span + 2]
+                    ambiguous_in_context = ambiguous_in_context or any(w in cues for w in window)
+                break
+        return found, unambiguous or ambiguous_in_context
+
+    @staticmethod
+    def _find_role(text):
+        match = ROLE_PATTERN.search(text)
+        if not match:
+            return None
+        words = match.group(1).split()
+        while words and words[0].lower() in ROLE_STOPWORDS:
+            words.pop(0)
+        return " ".join(words) if words else None
+
+
+# ✅ Shared extractor; its counters are process-wide metrics
+field_extractor = FieldExtractor()
@@ -1,15 +1,49 @@
-import os
+import copy
 import json
-from openai import OpenAI
-from database.db_setup import insert_message, insert_task
-
-client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+import threading
+import time
+from database.db_setup import insert_message, insert_sequence, insert_sequence_revision, prune_sequence_revisions
+from agent.query_executor import QueryCancelled
+from agent.stream_parser import TaskStreamParser
+from agent.field_extractor import field_extractor
+from agent.context_builder import ContextBuilder, compact_message, gist
+from agent.response_cache import cache_scope, response_cache
+from agent.sequence_index import sequence_index
+from agent.workspace_store import WorkspaceStore
+from agent.prompts import prompt_registry
+from agent.intent_router import intent_router
+from socket_events.broadcast import WorkspaceChannel
+from agent.llm_client import llm_client
+from agent.edit_engine import PATCH_TOOL, PatchError, apply_patch, describe_sequence, validate_patch
+from agent.json_output import (
+    CONTINUE_PROMPT, OutputError, join_continuation, parse_json_output,
+    validate_object, validate_sequence, validate_step_result,
+)
+from monitoring.metrics import (
+    span, turn_seconds, llm_seconds, llm_tokens, llm_cached_prompt_share, llm_errors, llm_parse_failures,
+    llm_output_repairs,
+)
 
 class HelixAgent:
-    def __init__(self, model="gpt-4", socketio_instance=None):
-        self.model = model
+    # Token budget for the conversation history sent with each prompt
+    CONTEXT_BUDGETS = {
+        "extract_fields": 800,
+        "generate": 2000,
+        "modify": 600,
+        "append": 600,
+    }
+    MAX_SUMMARY_LINES = 50
+    REVERT_LOCK_TIMEOUT = 2.0  # Seconds a revert waits for a running turn before reporting busy
+    # Follow-up requests for the missing tail of a cut-off JSON reply
+    MAX_CONTINUATIONS = 2
+
+    def __init__(self, model=None, socketio_instance=None, max_history=40, room=None, stream_workspace=False,
+                 max_revisions=50):
+        self.model = model  # Pins every call to one model; None routes each call type to its tier
+        self.max_history = max_history
         self.conversation_history = []
-        self.latest_workspace = None
+        self.history_summary = []  # Rolling gist of turns trimmed from conversation_history
+        self.workspace = WorkspaceStore(max_revisions)  # Revision history; latest_workspace is its head
         self.required_fields = {
             "job_role": None,
             "technologies": None,
@@ -17,157 +51,353 @@ class HelixAgent:
             "location": None,
             "benefits": None
         }
+        self.pending_field = None  # Field named in the last question we asked
         self.socketio = socketio_instance
+        self.room = room
+        self.user_id = None  # Set by the session manager for signed-in users; tags stored messages/tasks
+        self.channel = WorkspaceChannel(socketio_instance, room)
+        self.stream_workspace = stream_workspace
+        self.lock = threading.Lock()
+        self._cancel_event = None
+        self._deadline = None
+        self._bypass_cache = False
+        self._generated_by = None  # Model that answered the last generation call (a fallback tier's, after a fallback)
+        self.on_turn_end = None
+        self.llm = llm_client  # Swapped for a RecordingLLM / ReplayLLM (agent/cassette.py)
+        self.cassette = None  # Set while recording: turns and their outcomes are appended to it
+        self.persist = True  # Write messages and sequence revisions to the database (off for offline replay)
+
+    @property
+    def latest_workspace(self):
+        """The head revision's workspace (None before the first sequence). Read-only: commit changes instead."""
+        return self.workspace.current()
+
+    @latest_workspace.setter
+    def latest_workspace(self, workspace):
+        # Restores (rehydration, replay) become a revision but are not persisted again
+        if workspace:
+            self.workspace.commit(workspace, label="restore")
+
+    def _commit_workspace(self, workspace: dict, label: str) -> dict:
+        """Records a new revision and queues it for the sequence table. Error payloads are never committed."""
+        if str(workspace.get("final_sequence") or "").startswith("Error:"):
+            return workspace
+        revision = self.workspace.commit(workspace, label=label)
+        if revision is not None:
+            self._persist_revision(revision)
+        return workspace
+
+    def _persist_revision(self, revision):
+        """Generations become new (append-only) sequence rows; edits and reverts go to sequence_revision."""
+        if not self.persist or self.user_id is None:
+            return
+        if revision.label == "generate":
+            insert_sequence(self.user_id, self.room, revision.version, revision.to_json(), self.required_fields)
+            sequence_index.invalidate(self.user_id)
+            return
+        insert_sequence_revision(self.user_id, self.room, revision.version, revision.to_json(), self.required_fields)
+        if revision.version % self.workspace.max_revisions == 0:
+            # ✅ Keep the table to the same depth as the in-memory history (one DELETE per max_revisions edits)
+            try:
+                prune_sequence_revisions(self.room, self.workspace.max_revisions)
+            except Exception as e:
+                print(f"❌ Could not prune revisions for {self.room}: {e}")
+
+    def revert(self, version: int) -> dict:
+        """Makes an earlier revision current again (as a new version) without calling the LLM.
+
+        Raises KeyError when `version` is unknown or was pruned. Call with `lock` held.
+        """
+        revision = self.workspace.revert(version)
+        self._persist_revision(revision)
+        self.channel.publish(self.latest_workspace)
+        if self.on_turn_end:
+            self.on_turn_end(self)
+        return self.latest_workspace
+
+    def to_snapshot(self) -> dict:
+        """Returns the serialisable session state (saved after each turn and on eviction)."""
+        return {
+            "conversation_history": self.conversation_history,
+            "history_summary": self.history_summary,
+            "required_fields": self.required_fields,
+            "pending_field": self.pending_field,
+            "workspace_store": self.workspace.to_dict(),
+            "workspace_version": self.channel.version,
+        }
 
-    def process_query(self, user_input: str) -> dict:
+    def load_snapshot(self, snapshot: dict):
+        """Restores session state produced by `to_snapshot`."""
+        self.conversation_history = snapshot.get("conversation_history", [])[-self.max_history:]
+        self.history_summary = snapshot.get("history_summary", [])
+        for key in self.required_fields.keys():
+            self.required_fields[key] = snapshot.get("required_fields", {}).get(key)
+        self.pending_field = snapshot.get("pending_field")
+        if snapshot.get("workspace_store"):
+            self.workspace = WorkspaceStore.from_dict(snapshot["workspace_store"], self.workspace.max_revisions)
+        elif snapshot.get("latest_workspace") is not None:
+            self.latest_workspace = snapshot["latest_workspace"]  # Saved before revisions existed
+        self.channel.restore(snapshot.get("workspace_version", 0), self.latest_workspace)
+
+    def owner(self) -> dict:
+        """Who stored messages and task rows belong to."""
+        return {"user_id": self.user_id, "session_key": self.room}
+
+    def _store_message(self, sender: str, content: str):
+        if self.persist:
+            insert_message(sender, content, **self.owner())
+
+    def resync(self, sid):
+        """Sends the full current workspace to one (re)connecting socket."""
+        if self.latest_workspace and not self.channel.version:
+            self.channel.publish(self.latest_workspace)  # First publish after rehydration
+        self.channel.send_snapshot(to=sid)
+
+    def _trim_history(self):
+        """Keeps only the most recent `max_history` messages so a session cannot grow without bound.
+
+        Trimmed turns are folded into the rolling `history_summary`.
+        """
+        if len(self.conversation_history) > self.max_history:
+            removed = self.conversation_history[:-self.max_history]
+            del self.conversation_history[:-self.max_history]
+            self.history_summary.extend(gist(m["role"], m.get("content") or "") for m in removed)
+            del self.history_summary[:-self.MAX_SUMMARY_LINES]
+
+    def _context(self, prompt_name: str) -> list:
+        """History messages for `prompt_name`, fitted to its CONTEXT_BUDGETS entry."""
+        builder = ContextBuilder(self.CONTEXT_BUDGETS[prompt_name])
+        return builder.build(self.conversation_history, self.history_summary)
+
+    def _check_cancelled(self, deadline=None):
+        """Stops the turn before the next LLM call if it was cancelled or ran out of time.
+
+        An explicit `deadline` is for calls made outside the turn (step execution) and skips the turn's state.
+        """
+        if deadline is not None:
+            if time.monotonic() >= deadline:
+                raise QueryCancelled("Step deadline exceeded")
+            return
+        if self._cancel_event is not None and self._cancel_event.is_set():
+            raise QueryCancelled("Query cancelled")
+        if self._deadline is not None and time.monotonic() >= self._deadline:
+            raise QueryCancelled("Query deadline exceeded")
+
+    def _llm_timeout(self, deadline=None):
+        """Seconds left for the next LLM call before `deadline` or the turn's (None when there is neither)."""
+        deadline = deadline if deadline is not None else self._deadline
+        if deadline is None:
+            return None
+        return max(deadline - time.monotonic(), 1.0)
+
+    def process_query(self, user_input: str, cancel_event=None, deadline=None, bypass_cache=False) -> dict:
         """Processes user input, prevents repeated questions, and generates outreach sequences."""
+        self._cancel_event = cancel_event
+        self._deadline = deadline
+        self._bypass_cache = bypass_cache
+        start = time.perf_counter()
+        outcome = "error"
+        if self.cassette is not None:
+            self.cassette.append({"t": "turn", "i": user_input})
+        try:
+            response = self._process_query(user_input)
+            outcome = response.get("type", "final")
+            if self.cassette is not None:
+                self.cassette.append({"t": "end", "r": outcome, "w": response.get("workspace") or {},
+                                      "f": self.required_fields, "ms": round((time.perf_counter() - start) * 1000, 1)})
+            if self.on_turn_end:
+                self.on_turn_end(self)  # e.g. save state to the external session store
+            return response
+        except QueryCancelled:
+            outcome = "cancelled"
+            raise
+        finally:
+            turn_seconds.observe(time.perf_counter() - start, outcome=outcome)
+            self._cancel_event = None
+            self._deadline = None
+            self._bypass_cache = False
+
+    def _process_query(self, user_input: str) -> dict:
         self.conversation_history.append({"role": "user", "content": user_input})
-        insert_message("User", user_input)
+        self._trim_history()
+        self._store_message("User", user_input)
 
-        is_edit_request = any(keyword in user_input.lower() for keyword in ["edit", "change", "modify", "update"])
-        is_addition_request = any(keyword in user_input.lower() for keyword in ["add", "insert", "append"])
+        # ✅ Edits only make sense once a sequence exists; otherwise skip classification entirely
+        intent = "provide_info"
+        if self.latest_workspace:
+            with span("route_intent"):
+                intent, _, _ = intent_router.route(user_input, fallback=self._classify_intent_with_llm)
 
-        if is_addition_request and self.latest_workspace:
+        if intent == "append":
             workspace_output = self._append_new_step(user_input)
-        elif is_edit_request and self.latest_workspace:
+        elif intent == "modify":
             workspace_output = self._modify_existing_sequence(user_input)
         else:
-            self._update_fields_with_history()
+            with span("update_fields"):
+                self._update_fields_with_history()
             missing_fields = [key for key, value in self.required_fields.items() if value is None]
 
             if missing_fields:
                 next_missing_field = missing_fields[0]
+                self.pending_field = next_missing_field
+                question = f"What is the {next_missing_field.replace('_', ' ')}?"
+                self._store_message("Helix", question)
                 return {
                     "type": "question",
-                    "chat": {"type": "question", "content": f"What is the {next_missing_field.replace('_', ' ')}?"},
+                    "chat": {"type": "question", "content": question},
                     "workspace": {}
                 }
 
-            if self.socketio:
-                self.socketio.emit("ai_response", "Generating outreach sequence...")
+            self.pending_field = None
+            self._emit("ai_response", "Generating outreach sequence...")
 
             workspace_output = self._generate_workspace_update()
 
-        response = {
-            "type": "final",
-            "chat": None,
-            "workspace": workspace_output if workspace_output else {}
-        }
+        error = str((workspace_output or {}).get("final_sequence") or "")
+        if error.startswith("Error:"):
+            # ✅ Errors were never committed: report them in chat and keep clients on the head revision
+            # (this also takes back steps streamed before the failure)
+            response = {
+                "type": "error",
+                "chat": {"type": "error", "content": error[len("Error:"):].strip()},
+                "workspace": self.latest_workspace or {}
+            }
+            self.channel.publish(self.latest_workspace or {})
+        else:
+            response = {
+                "type": "final",
+                "chat": None,
+                "workspace": workspace_output if workspace_output else {}
+            }
+
+            # ✅ Send only the changed steps to the session room
+            if workspace_output:
+                self.channel.publish(workspace_output)
 
         self.conversation_history.append({"role": "assistant", "content": json.dumps(response)})
+        self._trim_history()
+        self._store_message("Helix", json.dumps(response))
         return response
 
+    def _classify_intent_with_llm(self, user_input: str):
+        """Cheap escalation for messages the local intent classifier is unsure about."""
+        self._check_cancelled()
+        try:
+            response = self._chat(
+                "intent",
+                messages=prompt_registry.get("intent").messages([{"role": "user", "content": user_input}]),
+                max_tokens=3,
+                temperature=0,
+                timeout=self._llm_timeout(),
+            )
+            return response.choices[0].message.content.strip().lower()
+        except Exception as e:
+            print(f"ERROR: Intent escalation failed - {e}")
+            return None
+
     def _update_fields_with_history(self):
-        """Ensures answered fields are not asked again by using conversation history."""
-        instruction = (
-            "Analyze the conversation history and extract structured hiring details.\n"
-            "Fill missing fields but do NOT overwrite already stored values.\n\n"
-            f"Current Data: {json.dumps(self.required_fields)}\n"
-            f"Conversation History: {json.dumps(self.conversation_history[-5:])}\n\n"
-            "Return updated JSON in this format:\n"
-            "{\n"
-            '  "job_role": "Extracted job role",\n'
-            '  "technologies": "Extracted relevant skills",\n'
-            '  "company_description": "Company details",\n'
-            '  "location": "Mentioned location",\n'
-            '  "benefits": "Any perks, salary, or compensation details"\n'
-            "}"
+        """Ensures answered fields are not asked again by using conversation history.
+
+        The local extractor runs first. The LLM still runs while fields are
+        missing, unless the message was a short answer to the pending question.
+        """
+        user_input = self.conversation_history[-1]["content"] if self.conversation_history else ""
+        extracted = field_extractor.confident(field_extractor.extract(user_input, self.pending_field))
+        filled = 0
+        for key, value in extracted.items():
+            if self.required_fields.get(key) is None:
+                self.required_fields[key] = value
+                filled += 1
+
+        # ✅ Skip the LLM only when nothing is missing, or the message was a short, direct answer to our question
+        missing_fields = [key for key, value in self.required_fields.items() if value is None]
+        direct_answer = (
+            self.pending_field in extracted
+            and self.required_fields.get(self.pending_field) == extracted[self.pending_field]
+            and len(user_input.split()) <= field_extractor.max_answer_words
+        )
+        needs_llm = bool(missing_fields) and not direct_answer
+        field_extractor.record_turn(filled, needs_llm)
+        if not needs_llm:
+            return
+
+        messages = prompt_registry.get("extract_fields").messages(
+            self._context("extract_fields"),
+            current_data=json.dumps(self.required_fields),
+            missing_fields=json.dumps(missing_fields),
+            recent_history=json.dumps([compact_message(m) for m in self.conversation_history[-5:]]),
         )
 
+        self._check_cancelled()
         try:
-            response = client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "system", "content": instruction}, *self.conversation_history],
+            response = self._chat(
+                "extract_fields",
+                messages=messages,
                 max_tokens=500,
                 temperature=0.3,
+                timeout=self._llm_timeout(),
+                json_mode=True,
             )
 
-            extracted_data = json.loads(response.choices[0].message.content.strip())
-            if isinstance(extracted_data, dict):
-                for key in self.required_fields.keys():
-                    if extracted_data.get(key) and self.required_fields[key] is None:
-                        self.required_fields[key] = extracted_data[key]
+            # A truncated object is repaired to its complete fields; the rest are simply asked again
+            extracted_data = self._parse_output(response.choices[0].message.content, validate_object, "extract_fields")
+            for key in self.required_fields.keys():
+                if extracted_data.get(key) and self.required_fields[key] is None:
+                    self.required_fields[key] = extracted_data[key]
 
-        except (json.JSONDecodeError, ValueError) as e:
+        except OutputError as e:
             print(f"ERROR: Failed to extract details - {e}")
 
-    def _generate_workspace_update(self) -> dict:
-        """Generates hiring outreach sequence after all fields are provided."""
-        instruction = (
-            "You are Helix, an AI recruiter responsible for hiring software engineers.\n\n"
-            "Generate a structured JSON outreach sequence to attract and hire top talent.\n\n"
-            "Each step must include:\n"
-            "  - `id`: Step number\n"
-            "  - `description`: Short description of the step\n"
-            "  - `message`: An object with `subject` and `body` fields\n\n"
-            "Your response MUST be in valid JSON format like this:\n"
-            "{\n"
-            '  "tasks": [\n'
-            '    {"id": 1, "description": "Step 1: Initial outreach email",\n'
-            '     "message": {"subject": "Email Subject", "body": "Email Body"}},\n'
-            '    {"id": 2, "description": "Step 2: Follow-up email",\n'
-            '     "message": {"subject": "Follow-up Subject", "body": "Follow-up Body"}},\n'
-            '    {"id": 3, "description": "Step 3: Final email",\n'
-            '     "message": {"subject": "Final Email Subject", "body": "Final Email Body"}}\n'
-            '  ],\n'
-            '  "final_sequence": "A structured 3-step outreach sequence to hire the best candidates."\n'
-            "}\n\n"
-            f"Job Role: {self.required_fields['job_role']}\n"
-            f"Technologies: {self.required_fields['technologies']}\n"
-            f"Company: {self.required_fields['company_description']}\n"
-            f"Location: {self.required_fields['location']}\n"
-            f"Benefits: {self.required_fields['benefits']}\n"
-        )
+    def generate_sequence(self, required_fields: dict) -> dict:
+        """One-shot generation for a complete set of fields (bulk campaigns), skipping the chat turn."""
+        for key in self.required_fields:
+            self.required_fields[key] = required_fields.get(key)
+        return self._generate_workspace_update()
+
+    @staticmethod
+    def generation_prompt_version() -> str:
+        """Changes whenever the generation template does, so cached sequences from an older prompt are not reused."""
+        return prompt_registry.version("generate")
 
+    def generation_messages(self, seed: dict = None, context=()) -> list:
+        """The sequence-generation prompt for the current required_fields.
 
-        return self._get_ai_response(instruction)
+        `seed` is a previous sequence for a similar role to adapt instead of writing from scratch.
+        """
+        messages = prompt_registry.get("generate").messages(context, **self.required_fields)
+        if seed and seed.get("tasks"):
+            reference = json.dumps({"tasks": seed["tasks"], "final_sequence": seed.get("final_sequence", "")})
+            messages[-1]["content"] += "\n\n" + prompt_registry.get("generate_seed").render(seed=reference)
+        return messages
+
+    def _generate_workspace_update(self) -> dict:
+        """Generates hiring outreach sequence after all fields are provided."""
+        with span("cache_lookup"):
+            cached = response_cache.get(
+                self.required_fields, self.generation_model(), self.generation_prompt_version(),
+                bypass=self._bypass_cache, scope=cache_scope(self.user_id, self.room)
+            )
+        if cached is not None:
+            return self._commit_workspace(copy.deepcopy(cached), label="generate")
+
+        seed = sequence_index.seed_for(self.user_id, self.required_fields)
+        messages = self.generation_messages(seed, self._context("generate"))
+        self._generated_by = None
+        workspace = self._get_ai_response(messages, "generate", stream=self.stream_workspace and self.socketio is not None)
+        if workspace.get("tasks") and not str(workspace.get("final_sequence", "")).startswith("Error:"):
+            # ✅ Keyed on the model that wrote it: a fallback tier's sequence is never served as the primary's
+            response_cache.put(self.required_fields, self._generated_by or self.generation_model(),
+                               self.generation_prompt_version(), copy.deepcopy(workspace),
+                               scope=cache_scope(self.user_id, self.room), personalised=bool(seed))
+        return workspace
 
     def _modify_existing_sequence(self, user_input: str) -> dict:
-        """Modifies an existing step without erasing previous steps."""
+        """Modifies the requested steps without erasing or regenerating the others."""
 
         if not self.latest_workspace or "tasks" not in self.latest_workspace:
             return {"tasks": [], "final_sequence": "Error: No existing sequence to modify."}
 
-        instruction = (
-            "You are Helix, an AI recruiter responsible for modifying the outreach sequence.\n\n"
-            "**Modify ONLY the relevant step** based on the user's request. **DO NOT create a new sequence** from scratch.\n"
-            "**DO NOT erase** steps that are not mentioned.\n\n"
-            f"EXISTING SEQUENCE:\n{json.dumps(self.latest_workspace, indent=2)}\n\n"
-            f"USER REQUEST:\n{user_input}\n\n"
-            "Your response MUST follow this exact JSON format:\n"
-            "{\n"
-            '  "tasks": [\n'
-            '    {"id": 1, "description": "Step 1: Updated Initial outreach email to potential candidates",\n'
-            '     "message": {"subject": "Updated Email Subject",\n'
-            '                 "body": "Updated Email Content"}},\n'
-            '    {"id": 2, "description": "Existing Step 2",\n'
-            '     "message": {"subject": "Existing Subject", "body": "Existing Body"}},\n'
-            '    {"id": 3, "description": "Existing Step 3",\n'
-            '     "message": {"subject": "Existing Subject", "body": "Existing Body"}}\n'
-            '  ],\n'
-            '  "final_sequence": "Updated outreach sequence including modified step."\n'
-            "}"
-        )
-
-        modified_response = self._get_ai_response(instruction)
-
-        # ✅ Validate AI response before applying changes
-        if isinstance(modified_response, dict) and "tasks" in modified_response:
-            for step in modified_response["tasks"]:
-                if step["id"] == 1:  # ✅ Ensure Step 1 is fully updated
-                    self.latest_workspace["tasks"][0] = step  # ✅ Replace step 1 with full update
-                
-            self.latest_workspace["final_sequence"] = modified_response["final_sequence"]
-
-            # ✅ Emit updated sequence to frontend UI
-            if self.socketio:
-                self.socketio.emit("update_workspace", self.latest_workspace)
-
-            return self.latest_workspace
-
-        else:
-            print(f"❌ AI Returned Invalid Step Modification: {modified_response}")  
-            return {"tasks": self.latest_workspace["tasks"], "final_sequence": "Error: AI response did not contain a valid step modification."}
+        return self._apply_ai_patch(user_input, "modify", ("update", "insert", "delete"), "step modification")
 
     def _append_new_step(self, user_input: str) -> dict:
         """Appends a new step to the outreach sequence without modifying existing steps."""
@@ -175,80 +405,196 @@ class HelixAgent:
         if not self.latest_workspace or "tasks" not in self.latest_workspace:
             return {"tasks": [], "final_sequence": "Error: No existing sequence to append a step to."}
 
-        instruction = (
-            "You are Helix, an AI recruiting assistant responsible for hiring employees.\n\n"
-            "Add **ONLY ONE new step** to the existing outreach sequence based on the user's request.\n"
-            "**DO NOT modify** or erase existing steps.\n\n"
-            f"EXISTING SEQUENCE:\n{json.dumps(self.latest_workspace)}\n\n"
-            f"USER REQUEST:\n{user_input}\n\n"
-            "Your response MUST include the full sequence with the added step:\n"
-            "{\n"
-            '  "tasks": [\n'
-            '    {"id": 1, "description": "Existing Step 1"},\n'
-            '    {"id": 2, "description": "Existing Step 2"},\n'
-            '    {"id": 3, "description": "Existing Step 3"},\n'
-            '    {"id": 4, "description": "New Step Added"}\n'
-            '  ],\n'
-            '  "final_sequence": "Updated outreach sequence including new step."\n'
-            "}"
-        )
-
-        new_step_response = self._get_ai_response(instruction)
-
-        # ✅ Validate AI response
-        if isinstance(new_step_response, dict) and "tasks" in new_step_response:
-            self.latest_workspace["tasks"] = new_step_response["tasks"]  # ✅ Append new step
-            self.latest_workspace["final_sequence"] = new_step_response["final_sequence"]  # ✅ Update summary
+        return self._apply_ai_patch(user_input, "append", ("insert",), "step addition", max_operations=1)
 
-            # ✅ Emit updated sequence to frontend UI
-            if self.socketio:
-                self.socketio.emit("update_workspace", self.latest_workspace)
+    def _apply_ai_patch(self, user_input: str, context: str, allowed_ops, label: str, max_operations=None) -> dict:
+        """Asks the model for a patch via function calling, validates it and applies it locally.
 
-            return self.latest_workspace
-
-        else:
-            print(f"❌ AI Returned Invalid Step Addition: {new_step_response}")  # Debugging
-            return {"tasks": self.latest_workspace["tasks"], "final_sequence": "Error: AI response did not contain a valid step addition."}
+        `context` names both the prompt template and its CONTEXT_BUDGETS entry.
+        """
+        messages = prompt_registry.get(context).messages(
+            self._context(context), sequence=describe_sequence(self.latest_workspace), user_request=user_input
+        )
+        self._check_cancelled()
+        try:
+            response = self._chat(
+                context,
+                messages=messages,
+                tools=[PATCH_TOOL],
+                tool_choice={"type": "function", "function": {"name": "apply_sequence_patch"}},
+                max_tokens=1500,
+                temperature=0.3,
+                timeout=self._llm_timeout(),
+            )
+            tool_calls = response.choices[0].message.tool_calls
+            if not tool_calls:
+                raise PatchError("Model did not return a patch")
+            patch = json.loads(tool_calls[0].function.arguments)
+            validate_patch(patch, self.latest_workspace, allowed_ops)
+            if max_operations and len(patch["operations"]) > max_operations:
+                raise PatchError(f"Expected at most {max_operations} operation(s)")
+
+            return self._commit_workspace(apply_patch(self.latest_workspace, patch), label=context)
+
+        except QueryCancelled:
+            raise
+
+        except Exception as e:
+            if isinstance(e, ValueError):  # JSON and PatchError; API errors are counted by _chat
+                llm_parse_failures.inc(purpose=context)
+            print(f"❌ AI Returned Invalid {label.title()}: {e}")
+            return {"tasks": self.latest_workspace["tasks"], "final_sequence": f"Error: AI response did not contain a valid {label}."}
+
+    def execute_step(self, step, deadline=None) -> dict:
+        """Executes one outreach step: turns it into the final, ready-to-send message.
+
+        `step` is a workspace task dict or plain step text. Raises on failure so
+        the task engine can retry it. Runs on task threads alongside the
+        session's turns, so it uses its own `deadline` (monotonic) rather
+        than the turn's.
+        """
+        step_text = step if isinstance(step, str) else json.dumps(step)
+        messages = prompt_registry.get("execute_step").messages(
+            hiring_details=json.dumps(self.required_fields), step=step_text
+        )
+        response = self._chat(
+            "execute_step",
+            messages=messages,
+            max_tokens=800,
+            temperature=0.3,
+            timeout=self._llm_timeout(deadline),
+            json_mode=True,
+        )
+        return self._parse_output(response.choices[0].message.content, validate_step_result, "execute_step", messages,
+                                  deadline=deadline)
 
-    def _get_ai_response(self, instruction: str) -> dict:
-        """Helper function to get AI-generated responses and handle errors."""
+    def _get_ai_response(self, messages: list, context: str, stream: bool = False) -> dict:
+        """Generates a sequence, repairing or continuing malformed output instead of regenerating it."""
         workspace_text = ""
+        self._check_cancelled()
         try:
-            response = client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "system", "content": instruction}, *self.conversation_history],
-                max_tokens=5000,
-                temperature=0.7,
-            )
-            workspace_text = response.choices[0].message.content.strip()
-            parsed_response = json.loads(workspace_text)
-
-            # ✅ Ensure correct format: Convert 'sequence' to 'tasks'
-            if "sequence" in parsed_response:
-                parsed_response["tasks"] = [
-                    {
-                        "id": step["id"],
-                        "description": f"Step {step['id']}: {step['type'].replace('_', ' ').title()}",
-                        "message": {
-                            "subject": step["subject"],
-                            "body": step["body"]
-                        }
-                    }
-                    for step in parsed_response["sequence"]
-                ]
-                del parsed_response["sequence"]  # ✅ Remove incorrect key
-
-            # ✅ Validate AI response before applying changes
-            if "tasks" not in parsed_response or not isinstance(parsed_response["tasks"], list):
-                raise ValueError("Invalid response format from AI")
-
-            self.latest_workspace = parsed_response  
-            return parsed_response
-
-        except (json.JSONDecodeError, ValueError, Exception) as e:
+            if stream:
+                workspace_text = self._stream_completion(messages, context)
+            else:
+                response = self._chat(
+                    context,
+                    messages=messages,
+                    max_tokens=5000,
+                    temperature=0.7,
+                    timeout=self._llm_timeout(),
+                    json_mode=True,
+                )
+                workspace_text = response.choices[0].message.content.strip()
+            self._generated_by = self.llm.answered_model()  # Before any continuation call
+
+            parsed_response = self._parse_output(workspace_text, validate_sequence, context, messages)
+            return self._commit_workspace(parsed_response, label=context)
+
+        except QueryCancelled:
+            raise
+
+        except Exception as e:
             print(f"ERROR: JSON decoding failed: {str(e)}\nResponse: {workspace_text}")
             return {"tasks": [], "final_sequence": "Error: AI returned malformed JSON. Please retry."}
 
+    def _parse_output(self, text: str, validate, purpose: str, messages=None, deadline=None):
+        """Parses a JSON completion: local repair first, then (for cut-off output) up to
+        MAX_CONTINUATIONS requests for just the missing tail. Raises OutputError.
+        """
+        for attempt in range(self.MAX_CONTINUATIONS + 1):
+            try:
+                value, repaired = parse_json_output(text, validate)
+                if repaired or attempt:
+                    llm_output_repairs.inc(purpose=purpose, method="continued" if attempt else "repaired")
+                return value
+            except OutputError as e:
+                if not (e.truncated and messages) or attempt == self.MAX_CONTINUATIONS:
+                    llm_parse_failures.inc(purpose=purpose)
+                    raise
+                print(f"⏹️ {purpose} output was cut off ({e}); asking for the rest")
+
+            self._check_cancelled(deadline)
+            response = self._chat(
+                purpose,
+                messages=[*messages, {"role": "assistant", "content": text}, {"role": "user", "content": CONTINUE_PROMPT}],
+                max_tokens=2000,
+                temperature=0,
+                timeout=self._llm_timeout(deadline),
+            )
+            text = join_continuation(text, response.choices[0].message.content or "")
+
+    def _stream_completion(self, messages: list, context: str) -> str:
+        """Streams the completion, emitting each finished step as a partial `workspace_update`.
+
+        Returns the full text so the caller can validate it exactly like a
+        non-streamed response; the final, validated sequence is emitted by the caller.
+        """
+        parser = TaskStreamParser()
+        start = time.perf_counter()
+        stream = self._chat(
+            context,
+            messages=messages,
+            max_tokens=5000,
+            temperature=0.7,
+            timeout=self._llm_timeout(),
+            stream=True,
+            stream_options={"include_usage": True},
+            json_mode=True,
+        )
+
+        try:
+            for chunk in stream:
+                self._check_cancelled()
+                if getattr(chunk, "usage", None):
+                    self._record_usage(context, chunk.usage)  # Final chunk when include_usage is set
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if not delta:
+                    continue
+                if parser.feed(delta):
+                    self.channel.publish({"tasks": list(parser.items), "final_sequence": None}, partial=True)
+        finally:
+            stream.close()
+            llm_seconds.observe(time.perf_counter() - start, purpose=context, stream="true")
+
+        return parser.text.strip()  # Fences and prose are handled by _parse_output
+
+    def generation_model(self) -> str:
+        return self.model or self.llm.model_for("generate")
+
+    def _chat(self, purpose: str, **request):
+        """Calls the LLM through the shared client (tier routing, rate limits, retries, fallback),
+        recording latency, tokens and errors under `purpose`.
+
+        Streamed calls return the stream; their latency is recorded by the caller once drained.
+        """
+        start = time.perf_counter()
+        if self.model:
+            request["model"] = self.model
+        try:
+            response = self.llm.create(purpose, **request)
+        except Exception:
+            llm_errors.inc(purpose=purpose)
+            raise
+        if request.get("stream"):
+            return response
+
+        llm_seconds.observe(time.perf_counter() - start, purpose=purpose, stream="false")
+        if getattr(response, "usage", None):
+            self._record_usage(purpose, response.usage)
+        return response
 
-# ✅ Global instance of HelixAgent
-helix_agent = HelixAgent()
+    @staticmethod
+    def _record_usage(purpose: str, usage):
+        llm_tokens.inc(usage.prompt_tokens or 0, purpose=purpose, kind="prompt")
+        llm_tokens.inc(usage.completion_tokens or 0, purpose=purpose, kind="completion")
+        # Prompt tokens the provider served from its prefix cache (billed and processed at a discount)
+        cached = getattr(getattr(usage, "prompt_tokens_details", None), "cached_tokens", None) or 0
+        llm_tokens.inc(cached, purpose=purpose, kind="cached_prompt")
+        llm_cached_prompt_share.observe(cached / usage.prompt_tokens if usage.prompt_tokens else 0.0, purpose=purpose)
+
+    def _emit(self, event: str, payload):
+        """Emits to this session's room (or broadcasts when the agent has no room)."""
+        if self.socketio:
+            self.socketio.emit(event, payload, to=self.room)
@@ -0,0 +1,146 @@
+import json
+import math
+import os
+import random
+import re
+import threading
+from collections import Counter
+
+INTENTS = ("modify", "append", "provide_info")
+DEFAULT_TRAINING_SET = os.path.join(os.path.dirname(__file__), "data", "intent_examples.jsonl")
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9']+")
+
+
+def load_examples(path=DEFAULT_TRAINING_SET) -> list:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def ngrams(text: str) -> list:
+    """Word unigrams and bigrams, with a sentence-start marker so leading verbs stand out."""
+    words = ["<s>"] + _TOKEN_PATTERN.findall(text.lower())
+    return words[1:] + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+class TfidfIntentClassifier:
+    """Multinomial logistic regression over TF-IDF word n-grams.
+
+    Trained in-process on the shipped labelled set (a few hundred examples,
+    well under a second); prediction is a handful of sparse dot products.
+    """
+
+    def __init__(self, epochs=30, learning_rate=0.5, l2=1e-4, seed=13):
+        self.epochs = epochs
+        self.learning_rate = learning_rate
+        self.l2 = l2
+        self.seed = seed
+        self.idf = {}
+        self.weights = {intent: {} for intent in INTENTS}
+        self.bias = {intent: 0.0 for intent in INTENTS}
+
+    def fit(self, examples: list):
+        documents = [(ngrams(e["text"]), e["intent"]) for e in examples]
+        document_frequency = Counter(gram for grams, _ in documents for gram in set(grams))
+        total = len(documents)
+        self.idf = {gram: math.log((1 + total) / (1 + df)) + 1 for gram, df in document_frequency.items()}
+
+        vectors = [(self._vectorise(grams), intent) for grams, intent in documents]
+        rng = random.Random(self.seed)
+        for epoch in range(self.epochs):
+            rng.shuffle(vectors)
+            rate = self.learning_rate / (1 + epoch * 0.1)
+            for features, intent in vectors:
+                probabilities = self._probabilities(features)
+                for label in INTENTS:
+                    gradient = probabilities[label] - (1.0 if label == intent else 0.0)
+                    weights = self.weights[label]
+                    for gram, value in features.items():
+                        weights[gram] = weights.get(gram, 0.0) * (1 - rate * self.l2) - rate * gradient * value
+                    self.bias[label] -= rate * gradient
+        return self
+
+    def predict(self, text: str):
+        """Returns `(intent, confidence)`."""
+        probabilities = self._probabilities(self._vectorise(ngrams(text)))
+        intent = max(probabilities, key=probabilities.get)
+        return intent, probabilities[intent]
+
+    def _vectorise(self, grams):
+        counts = Counter(gram for gram in grams if gram in self.idf)
+        vector = {gram: count * self.idf[gram] for gram, count in counts.items()}
+        norm = math.sqrt(sum(v * v for v in vector.values()))
+        return {gram: v / norm for gram, v in vector.items()} if norm else vector
+
+    def _probabilities(self, features):
+        scores = {
+            label: self.bias[label] + sum(self.weights[label].get(gram, 0.0) * value for gram, value in features.items())
+            for label in INTENTS
+        }
+        top = max(scores.values())
+        exps = {label: math.exp(score - top) for label, score in scores.items()}
+        total = sum(exps.values())
+        return {label: value / total for label, value in exps.items()}
+
+
+class KeywordIntentClassifier:
+    """The original substring routing, kept as a benchmark baseline."""
+
+    def predict(self, text: str):
+        lowered = text.lower()
+        if any(keyword in lowered for keyword in ["add", "insert", "append"]):
+            return "append", 1.0
+        if any(keyword in lowered for keyword in ["edit", "change", "modify", "update"]):
+            return "modify", 1.0
+        return "provide_info", 1.0
+
+
+class IntentRouter:
+    """Routes a message with a local classifier, escalating to `fallback` only when unsure.
+
+    `fallback(text)` should return one of INTENTS (or None); it is only called
+    when the classifier's confidence is below `confidence_threshold`.
+    """
+
+    def __init__(self, classifier=None, confidence_threshold=0.6, training_set=DEFAULT_TRAINING_SET):
+        self.classifier = classifier
+        self.confidence_threshold = confidence_threshold
+        self.training_set = training_set
+        self._lock = threading.Lock()
+        self.local_routes = 0
+        self.escalations = 0
+
+    def _get_classifier(self):
+        if self.classifier is None:
+            with self._lock:
+                if self.classifier is None:
+                    self.classifier = TfidfIntentClassifier().fit(load_examples(self.training_set))
+        return self.classifier
+
+    def route(self, text: str, fallback=None):
+        """Returns `(intent, confidence, source)` where source is "local" or "llm"."""
+        intent, confidence = self._get_classifier().predict(text)
+        if confidence >= self.confidence_threshold or fallback is None:
+            with self._lock:
+                self.local_routes += 1
+            return intent, confidence, "local"
+
+        with self._lock:
+            self.escalations += 1
+        escalated = fallback(text)
+        if escalated in INTENTS:
+            return escalated, confidence, "llm"
+        return intent, confidence, "local"
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.local_routes + self.escalations
+            return {
+                "local_routes": self.local_routes,
+                "escalations": self.escalations,
+                "escalation_rate": (self.escalations / total) if total else 0.0,
+            }
+
+
+# ✅ Shared router; the classifier is trained lazily on first use
+intent_router = IntentRouter()
@@ -0,0 +1,182 @@
+import json
+import re
+
+# Model families that accept response_format={"type": "json_object"}
+JSON_MODE_PREFIXES = ("gpt-4o", "gpt-4-turbo", "gpt-4-1106", "gpt-4-0125", "gpt-4.1", "gpt-3.5-turbo", "o1", "o3", "o4")
+
+CONTINUE_PROMPT = (
+    "Your previous reply was cut off. Continue EXACTLY where it stopped: output only the remaining "
+    "characters of the JSON, without repeating anything and without markdown."
+)
+
+_FENCE = re.compile(r"^\s*```(?:json)?\s*|\s*```\s*$", re.IGNORECASE)
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+class OutputError(ValueError):
+    """Raised when a completion cannot be parsed or validated, even after repair.
+
+    `truncated` is True when the text stopped mid-JSON, i.e. asking the model
+    to continue is likely to complete it.
+    """
+
+    def __init__(self, message, truncated=False):
+        super().__init__(message)
+        self.truncated = truncated
+
+
+def supports_json_mode(model: str) -> bool:
+    return bool(model) and model.startswith(JSON_MODE_PREFIXES)
+
+
+def json_mode_options(model: str) -> dict:
+    """Extra completion kwargs enabling JSON mode where the model supports it."""
+    return {"response_format": {"type": "json_object"}} if supports_json_mode(model) else {}
+
+
+def _scan(text):
+    """Walks the first JSON value in `text`, dropping trailing commas.
+
+    Returns `(cleaned, stack, cut_points)`. An empty `stack` means the value
+    closed; otherwise it lists the brackets still open at the end (the text was
+    truncated) and `cut_points` holds `(length, open_brackets)` positions in
+    `cleaned` where the value can be cut back to its last complete element.
+    """
+    out = []
+    stack = []
+    cut_points = []
+    in_string = escaped = False
+    for char in text:
+        if in_string:
+            out.append(char)
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+            continue
+
+        if char == '"':
+            in_string = True
+        elif char in _CLOSERS:
+            stack.append(char)
+            out.append(char)
+            cut_points.append((len(out), list(stack)))
+            continue
+        elif char in "}]":
+            while out and (out[-1].isspace() or out[-1] == ","):
+                out.pop()  # Trailing comma before a closing bracket
+            if not stack or _CLOSERS[stack[-1]] != char:
+                break
+            stack.pop()
+            out.append(char)
+            if not stack:
+                return "".join(out), stack, cut_points
+            continue
+        elif char == ",":
+            cut_points.append((len(out), list(stack)))
+        out.append(char)
+    return "".join(out), stack, cut_points
+
+
+def repair_json(text: str):
+    """Best-effort local repair: markdown fences, leading/trailing prose, trailing commas, truncation.
+
+    Returns `(value, truncated)`; a truncated value is cut back to its last
+    complete element and closed. Raises OutputError when nothing parses.
+    """
+    text = _FENCE.sub("", text or "").strip()
+    starts = [i for i in (text.find("{"), text.find("[")) if i != -1]
+    if not starts:
+        raise OutputError("No JSON object in the completion")
+
+    cleaned, stack, cut_points = _scan(text[min(starts):])
+    if not stack:
+        try:
+            return json.loads(cleaned), False
+        except ValueError as e:
+            raise OutputError(f"Unrepairable JSON: {e}")
+
+    # ✅ Truncated: try the latest cut points first so as little as possible is lost
+    for length, open_brackets in reversed(cut_points):
+        candidate = cleaned[:length].rstrip().rstrip(",")
+        candidate += "".join(_CLOSERS[bracket] for bracket in reversed(open_brackets))
+        try:
+            return json.loads(candidate), True
+        except ValueError:
+            continue
+    raise OutputError("Truncated JSON could not be closed", truncated=True)
+
+
+def parse_json_output(text: str, validate=None):
+    """Parses a completion, repairing it locally if needed, then runs `validate(value)`.
+
+    `validate` returns the (possibly normalised) value or raises ValueError.
+    Returns `(value, repaired)`; raises OutputError.
+    """
+    try:
+        value, repaired, truncated = json.loads(text), False, False
+    except (TypeError, ValueError):
+        value, truncated = repair_json(text)
+        repaired = True
+
+    if validate is not None:
+        try:
+            value = validate(value)
+        except ValueError as e:
+            raise OutputError(str(e), truncated=truncated)
+    return value, repaired
+
+
+def join_continuation(partial: str, continuation: str) -> str:
+    """Appends a continuation to the cut-off text, dropping any fence the model reopened with."""
+    continuation = re.sub(r"^\s*```(?:json)?\s*", "", continuation or "", flags=re.IGNORECASE)
+    return partial + continuation
+
+
+def validate_object(value):
+    if not isinstance(value, dict):
+        raise ValueError("Expected a JSON object")
+    return value
+
+
+def validate_sequence(value):
+    """Schema for generated sequences: `{"tasks": [{id, description, message: {subject, body}}], "final_sequence"}`.
+
+    Also accepts the legacy `sequence` shape (`{id, type, subject, body}` steps) and converts it.
+    """
+    value = validate_object(value)
+    if "sequence" in value and "tasks" not in value:
+        value["tasks"] = [
+            {
+                "id": step.get("id"),
+                "description": f"Step {step.get('id')}: {str(step.get('type', 'step')).replace('_', ' ').title()}",
+                "message": {"subject": step.get("subject"), "body": step.get("body")},
+            }
+            for step in value.pop("sequence") if isinstance(step, dict)
+        ]
+
+    tasks = value.get("tasks")
+    if not isinstance(tasks, list) or not tasks:
+        raise ValueError("'tasks' must be a non-empty list")
+    for index, task in enumerate(tasks):
+        if not isinstance(task, dict):
+            raise ValueError(f"Task {index} is not an object")
+        if not isinstance(task.get("description"), str):
+            raise ValueError(f"Task {index} has no description")
+        message = task.get("message")
+        if not isinstance(message, dict) or not all(isinstance(message.get(k), str) for k in ("subject", "body")):
+            raise ValueError(f"Task {index} needs a message with subject and body")
+        if not isinstance(task.get("id"), int):
+            task["id"] = index + 1
+    if not isinstance(value.get("final_sequence"), str):
+        raise ValueError("'final_sequence' must be a string")
+    return value
+
+
+def validate_step_result(value):
+    value = validate_object(value)
+    if not value.get("body"):
+        raise ValueError("Execution result is missing a message body")
+    return value
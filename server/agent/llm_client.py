@@ -0,0 +1,284 @@
+import os
+import random
+import threading
+import time
+
+from openai import OpenAI
+
+from agent.context_builder import message_tokens
+from agent.json_output import supports_json_mode
+from monitoring.metrics import llm_retries, llm_fallbacks, llm_throttled
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class LLMUnavailableError(Exception):
+    """Raised when no tier could take a call (all saturated, broken or failing)."""
+
+
+class TokenBucket:
+    """Refills `per_minute` units per minute; `acquire` waits up to `timeout` seconds for capacity."""
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, amount, timeout=0.0) -> bool:
+        amount = min(float(amount), self.capacity)  # An oversized call may still run on a full bucket
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return True
+                wait = (amount - self.tokens) / self.rate
+            if time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+    def refund(self, amount):
+        with self._lock:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+    def available(self) -> float:
+        with self._lock:
+            self._refill()
+            return self.tokens
+
+
+class CircuitBreaker:
+    """Opens after `failure_threshold` consecutive failures; lets one trial call through after `reset_timeout`."""
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+                return True  # The single trial call
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+
+    def release_trial(self):
+        """A trial call that proved nothing (e.g. rate limited) re-opens the circuit without counting a failure."""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    print(f"⏹️ LLM circuit opened after {self.failures} failures")
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+
+
+class ModelTier:
+    """One model with its own RPM/TPM budget and circuit breaker."""
+
+    def __init__(self, name, model, rpm, tpm, breaker=None):
+        self.name = name
+        self.model = model
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.breaker = breaker or CircuitBreaker()
+
+    def acquire(self, tokens, timeout) -> bool:
+        start = time.monotonic()
+        if not self.requests.acquire(1, timeout):
+            return False
+        if not self.tokens.acquire(tokens, max(0.0, timeout - (time.monotonic() - start))):
+            self.requests.refund(1)
+            return False
+        return True
+
+
+def _is_retryable(error) -> bool:
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return status == 429 or status >= 500
+    # No HTTP status: connection errors and timeouts
+    return type(error).__name__ in ("APIConnectionError", "APITimeoutError")
+
+
+def _retry_after(error):
+    response = getattr(error, "response", None)
+    try:
+        return float(response.headers.get("retry-after")) if response is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class LLMClient:
+    """Chat-completions wrapper with per-tier rate limiting, retries, circuit breaking and fallback.
+
+    Each call names its purpose (e.g. "extract_fields", "generate"), which
+    `routes` maps to a tier ("fast" or "strong", default "strong"). A call
+    first waits up to `fallback_wait` seconds for the primary tier's RPM/TPM
+    budget. If the tier is still saturated, its circuit is open or its
+    retries run out, the call moves on to the next tier. Retries on
+    429/5xx/connection errors use jittered exponential backoff (honouring
+    Retry-After) and stay within the call's `timeout`.
+    """
+
+    def __init__(self, max_retries=3, backoff_base=0.5, backoff_max=8.0, fallback_wait=1.0, request_timeout=60.0):
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.fallback_wait = fallback_wait
+        self.request_timeout = request_timeout
+        self.tiers = {
+            "strong": ModelTier("strong", "gpt-4", rpm=500, tpm=40000),
+            "fast": ModelTier("fast", "gpt-4o-mini", rpm=500, tpm=200000),
+        }
+        self.routes = {"extract_fields": "fast", "intent": "fast"}
+        self._client = None
+        self._lock = threading.Lock()
+        self._answered = threading.local()  # Model of each thread's last successful call
+
+    def init_app(self, app):
+        config = app.config
+        breaker = dict(failure_threshold=config.get("HELIX_LLM_BREAKER_THRESHOLD", 5),
+                       reset_timeout=config.get("HELIX_LLM_BREAKER_RESET", 30.0))
+        self.tiers = {
+            "strong": ModelTier("strong", config.get("HELIX_MODEL_STRONG", "gpt-4"),
+                                config.get("HELIX_STRONG_RPM", 500), config.get("HELIX_STRONG_TPM", 40000),
+                                CircuitBreaker(**breaker)),
+            "fast": ModelTier("fast", config.get("HELIX_MODEL_FAST", "gpt-4o-mini"),
+                              config.get("HELIX_FAST_RPM", 500), config.get("HELIX_FAST_TPM", 200000),
+                              CircuitBreaker(**breaker)),
+        }
+        routes = config.get("HELIX_LLM_ROUTES")
+        if routes is not None:
+            self.routes = dict(pair.strip().split("=", 1) for pair in routes.split(",") if "=" in pair)
+        self.max_retries = config.get("HELIX_LLM_RETRIES", self.max_retries)
+        self.fallback_wait = config.get("HELIX_LLM_FALLBACK_WAIT", self.fallback_wait)
+        self.request_timeout = config.get("HELIX_LLM_REQUEST_TIMEOUT", self.request_timeout)
+
+    def openai_client(self):
+        # Created lazily so OPENAI_BASE_URL / OPENAI_API_KEY set after import still apply
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"), max_retries=0,
+                                          timeout=self.request_timeout)
+        return self._client
+
+    def tier_order(self, purpose: str) -> list:
+        primary = self.tiers.get(self.routes.get(purpose, "strong"), self.tiers["strong"])
+        return [primary] + [tier for tier in self.tiers.values() if tier is not primary]
+
+    def model_for(self, purpose: str) -> str:
+        return self.tier_order(purpose)[0].model
+
+    def answered_model(self):
+        """The model that answered this thread's last successful `create` (a fallback tier's, after a fallback)."""
+        return getattr(self._answered, "model", None)
+
+    def create(self, purpose: str, json_mode=False, **request):
+        """`chat.completions.create` for `purpose`; `model` in `request` pins the primary tier's model."""
+        timeout = request.get("timeout") or self.request_timeout
+        deadline = time.monotonic() + timeout
+        estimate = sum(message_tokens(m) for m in request.get("messages", [])) + request.get("max_tokens", 500)
+        pinned_model = request.pop("model", None)
+
+        tiers = self.tier_order(purpose)
+        last_error = None
+        for index, tier in enumerate(tiers):
+            is_last = index == len(tiers) - 1
+            if not tier.breaker.allow():
+                continue
+            wait = max(0.0, deadline - time.monotonic()) if is_last else min(self.fallback_wait, timeout)
+            if not tier.acquire(estimate, wait):
+                llm_throttled.inc(tier=tier.name)
+                tier.breaker.release_trial()  # ✅ Hand back the half-open trial we never used
+                continue
+            if index:
+                llm_fallbacks.inc(purpose=purpose, tier=tier.name)
+
+            model = pinned_model if (pinned_model and index == 0) else tier.model
+            call = dict(request, model=model)
+            if json_mode and supports_json_mode(model):
+                call["response_format"] = {"type": "json_object"}
+            try:
+                response = self._call_with_retries(purpose, tier, call, deadline)
+            except Exception as e:
+                if not _is_retryable(e):
+                    raise  # Bad request, auth error, ...: another tier will not help
+                last_error = e
+                continue
+
+            usage = getattr(response, "usage", None)
+            if usage is not None and usage.total_tokens:
+                tier.tokens.refund(max(0, estimate - usage.total_tokens))
+            self._answered.model = model
+            return response
+
+        raise LLMUnavailableError(f"No LLM tier available for '{purpose}': {last_error or 'all tiers saturated'}")
+
+    def _call_with_retries(self, purpose, tier, call, deadline):
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                call["timeout"] = max(1.0, deadline - time.monotonic())
+                response = self.openai_client().chat.completions.create(**call)
+                tier.breaker.record_success()
+                return response
+            except Exception as e:
+                if not _is_retryable(e):
+                    tier.breaker.record_success()  # The API answered; the request itself was bad
+                    raise
+                if getattr(e, "status_code", None) == 429:
+                    tier.breaker.release_trial()  # Rate limits mean "slow down", not "broken"
+                else:
+                    tier.breaker.record_failure()
+                delay = _retry_after(e) or min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1))
+                delay *= random.uniform(0.5, 1.0)
+                if attempt > self.max_retries or time.monotonic() + delay >= deadline or not tier.breaker.allow():
+                    raise
+                llm_retries.inc(purpose=purpose)
+                print(f"⏹️ LLM {tier.name} call failed ({e}); retry {attempt} in {delay:.1f}s")
+                time.sleep(delay)
+
+    def stats(self) -> dict:
+        return {
+            name: {
+                "model": tier.model,
+                "circuit": tier.breaker.state,
+                "requests_available": round(tier.requests.available(), 1),
+                "tokens_available": round(tier.tokens.available()),
+            }
+            for name, tier in self.tiers.items()
+        }
+
+
+# ✅ Shared LLM client used by every HelixAgent
+llm_client = LLMClient()
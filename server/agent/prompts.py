@@ -0,0 +1,89 @@
+import hashlib
+import os
+import threading
+from string import Template
+
+from agent.context_builder import count_tokens
+
+DEFAULT_PROMPT_DIR = os.path.join(os.path.dirname(__file__), "data", "prompts")
+SEPARATOR = "---"  # Line splitting a template file into its static prefix and its variable part
+# OpenAI only caches prompt prefixes from this length on (then in 128-token steps)
+PROVIDER_CACHE_MIN_TOKENS = 1024
+
+
+class PromptTemplate:
+    """One prompt: a static prefix sent verbatim on every call, then `$placeholder` data.
+
+    The prefix becomes the first system message and the variable part the
+    last one, after any conversation history. Every call for the same
+    template then starts with identical tokens, which the provider can serve
+    from its prompt cache. `version` changes whenever the file does.
+    """
+
+    def __init__(self, name, static, dynamic):
+        self.name = name
+        self.static = static.strip()
+        self.dynamic = Template(dynamic.strip()) if dynamic.strip() else None
+        digest = hashlib.sha256(f"{self.static}\0{dynamic.strip()}".encode("utf-8")).hexdigest()
+        self.version = f"{name}-{digest[:10]}"
+        self.static_tokens = count_tokens(self.static)
+
+    def render(self, **values) -> str:
+        """The variable part with `values` filled in (KeyError for a missing placeholder)."""
+        return self.dynamic.substitute(values) if self.dynamic else ""
+
+    def messages(self, context=(), **values) -> list:
+        """`[static prefix, *context, variable data]` as chat messages."""
+        messages = [{"role": "system", "content": self.static}] if self.static else []
+        messages.extend(context)
+        if self.dynamic:
+            messages.append({"role": "system", "content": self.render(**values)})
+        return messages
+
+
+class PromptRegistry:
+    """Loads every `<name>.txt` template in `directory` once and hands out the parsed templates."""
+
+    def __init__(self, directory=DEFAULT_PROMPT_DIR):
+        self.directory = directory
+        self._templates = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        templates = {}
+        for filename in sorted(os.listdir(self.directory)):
+            if not filename.endswith(".txt"):
+                continue
+            with open(os.path.join(self.directory, filename), encoding="utf-8") as f:
+                lines = f.read().split("\n")
+            split = lines.index(SEPARATOR) if SEPARATOR in lines else len(lines)
+            name = filename[:-len(".txt")]
+            templates[name] = PromptTemplate(name, "\n".join(lines[:split]), "\n".join(lines[split + 1:]))
+        with self._lock:
+            self._templates = templates
+        print(f"✅ Loaded {len(templates)} prompt templates from {self.directory}")
+        return self
+
+    def get(self, name: str) -> PromptTemplate:
+        if self._templates is None:
+            self.load()  # Scripts and benchmarks that skip app.py
+        return self._templates[name]
+
+    def version(self, name: str) -> str:
+        return self.get(name).version
+
+    def stats(self) -> dict:
+        if self._templates is None:
+            self.load()
+        return {
+            name: {
+                "version": template.version,
+                "static_tokens": template.static_tokens,
+                "prefix_cacheable": template.static_tokens >= PROVIDER_CACHE_MIN_TOKENS,
+            }
+            for name, template in self._templates.items()
+        }
+
+
+# ✅ Shared template registry, loaded once at startup in app.py
+prompt_registry = PromptRegistry()
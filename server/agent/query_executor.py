@@ -0,0 +1,156 @@
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+
+class QueryCancelled(Exception):
+    """Raised inside HelixAgent when a query is cancelled or runs past its deadline."""
+
+
+class QueueFullError(Exception):
+    """Raised when the executor already holds `max_queue_depth` waiting queries."""
+
+
+class QueryExecutor:
+    """Runs HelixAgent.process_query on a bounded worker pool.
+
+    Socket handlers submit a query and return immediately; the result is
+    delivered through the `on_done` / `on_error` callbacks. At most
+    `max_workers` LLM turns run at once, at most `max_queue_depth` wait
+    behind them, and each turn is cancelled once it exceeds `timeout`
+    seconds or its owner (a socket sid) disconnects.
+    """
+
+    def __init__(self, max_workers=8, max_queue_depth=100, timeout=120):
+        self.max_workers = max_workers
+        self.max_queue_depth = max_queue_depth
+        self.timeout = timeout
+        self.app = None
+        self._pool = None
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._requests = {}  # request_id -> {"owner", "cancel_event"}
+        self.queued = 0
+        self.active = 0
+        self.completed = 0
+        self.cancelled = 0
+        self.timed_out = 0
+        self.rejected = 0
+
+    def init_app(self, app):
+        """Reads pool limits from the Flask config; workers run inside the app context."""
+        self.app = app
+        self.max_workers = app.config.get("HELIX_LLM_WORKERS", self.max_workers)
+        self.max_queue_depth = app.config.get("HELIX_LLM_QUEUE_LIMIT", self.max_queue_depth)
+        self.timeout = app.config.get("HELIX_LLM_TIMEOUT", self.timeout)
+
+    def _executor(self):
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="helix-llm")
+        return self._pool
+
+    def submit(self, agent, user_input, owner=None, on_done=None, on_error=None, **query_options):
+        """Queues a turn and returns `(request_id, future)` without waiting for the LLM.
+
+        `query_options` (e.g. `bypass_cache`) are passed through to `process_query`.
+        """
+        with self._lock:
+            if self.queued >= self.max_queue_depth:
+                self.rejected += 1
+                raise QueueFullError(f"{self.queued} queries already waiting")
+            request_id = next(self._ids)
+            cancel_event = threading.Event()
+            self._requests[request_id] = {"owner": owner, "cancel_event": cancel_event}
+            self.queued += 1
+
+        deadline = time.monotonic() + self.timeout
+        future = self._executor().submit(
+            self._run, request_id, agent, user_input, cancel_event, deadline, on_done, on_error, query_options
+        )
+        return request_id, future
+
+    def run(self, agent, user_input, **query_options):
+        """Blocking variant for HTTP callers; still bounded by the pool and the timeout."""
+        _, future = self.submit(agent, user_input, **query_options)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            raise QueryCancelled(f"Query exceeded {self.timeout}s timeout")
+
+    def cancel_owner(self, owner):
+        """Cancels every queued or running query submitted by `owner` (e.g. on socket disconnect)."""
+        with self._lock:
+            for entry in self._requests.values():
+                if entry["owner"] == owner:
+                    entry["cancel_event"].set()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "queue_depth": self.queued,
+                "active": self.active,
+                "completed": self.completed,
+                "cancelled": self.cancelled,
+                "timed_out": self.timed_out,
+                "rejected": self.rejected,
+                "max_workers": self.max_workers,
+            }
+
+    def _run(self, request_id, agent, user_input, cancel_event, deadline, on_done, on_error, query_options):
+        with self._lock:
+            self.queued -= 1
+            self.active += 1
+
+        try:
+            if cancel_event.is_set():
+                raise QueryCancelled("Query cancelled before it started")
+            if time.monotonic() >= deadline:
+                raise QueryCancelled(f"Query waited longer than {self.timeout}s in the queue")
+
+            # ✅ One turn at a time per agent so concurrent messages cannot interleave state
+            with agent.lock:
+                if self.app is not None:
+                    with self.app.app_context():
+                        result = agent.process_query(user_input, cancel_event=cancel_event, deadline=deadline, **query_options)
+                else:
+                    result = agent.process_query(user_input, cancel_event=cancel_event, deadline=deadline, **query_options)
+
+            with self._lock:
+                self.completed += 1
+            if on_done and not cancel_event.is_set():
+                on_done(result)
+            return result
+
+        except QueryCancelled as e:
+            with self._lock:
+                if cancel_event.is_set():
+                    self.cancelled += 1
+                else:
+                    self.timed_out += 1
+            print(f"⏹️ Query {request_id} stopped: {e}")
+            if on_error and not cancel_event.is_set():
+                on_error(e)
+            raise
+
+        except Exception as e:
+            print(f"❌ Query {request_id} failed: {e}")
+            if on_error:
+                on_error(e)
+            raise
+
+        finally:
+            with self._lock:
+                self.active -= 1
+                self._requests.pop(request_id, None)
+
+    def shutdown(self, wait=True):
+        for entry in list(self._requests.values()):
+            entry["cancel_event"].set()
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait)
+            self._pool = None
+
+
+# ✅ Shared bounded pool for LLM turns
+query_executor = QueryExecutor()
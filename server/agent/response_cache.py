@@ -0,0 +1,322 @@
+import hashlib
+import json
+import math
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from database.pool import get_connection
+
+VECTOR_DIMENSIONS = 256
+SHARED_SCOPE = "shared"  # Entries every user may see, with HELIX_CACHE_SHARING=global
+
+
+def normalise_fields(required_fields: dict) -> dict:
+    """Canonical form of required_fields: lowercase, collapsed whitespace, sorted skill lists."""
+    normalised = {}
+    for key in sorted(required_fields):
+        value = required_fields[key]
+        if value is None:
+            normalised[key] = None
+            continue
+        if isinstance(value, (list, tuple)):
+            value = ", ".join(str(v) for v in value)
+        text = " ".join(str(value).lower().split())
+        if key == "technologies":
+            text = ", ".join(sorted({part.strip() for part in re.split(r",|/|\band\b|;", text) if part.strip()}))
+        normalised[key] = text
+    return normalised
+
+
+def cache_scope(user_id=None, session_key=None) -> str:
+    """Whose entries a lookup may see: the signed-in user, else the (anonymous) session."""
+    return f"user:{user_id}" if user_id is not None else (session_key or "")
+
+
+def cache_key(required_fields: dict, model: str, prompt_version: str, scope: str = "") -> str:
+    payload = json.dumps({"fields": normalise_fields(required_fields), "model": model, "prompt": prompt_version,
+                          "scope": scope}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def cache_namespace(model: str, prompt_version: str, scope: str = "") -> str:
+    """Similarity matches are only allowed between entries of the same model, prompt and owner scope."""
+    return hashlib.sha256(f"{model}:{prompt_version}:{scope}".encode("utf-8")).hexdigest()[:16]
+
+
+def embed_fields(required_fields: dict) -> list:
+    """Local hashed bag-of-words vector (word unigrams + bigrams), L2-normalised."""
+    vector = [0.0] * VECTOR_DIMENSIONS
+    for key, value in normalise_fields(required_fields).items():
+        words = re.findall(r"[a-z0-9+#.]+", value or "")
+        grams = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+        for gram in grams:
+            digest = hashlib.md5(f"{key}:{gram}".encode("utf-8")).digest()
+            index = int.from_bytes(digest[:4], "little") % VECTOR_DIMENSIONS
+            vector[index] += 1.0 if digest[4] & 1 else -1.0
+    norm = math.sqrt(sum(v * v for v in vector))
+    return [v / norm for v in vector] if norm else vector
+
+
+def cosine(a: list, b: list) -> float:
+    return sum(x * y for x, y in zip(a, b))
+
+
+class SQLiteCacheBackend:
+    """Stores cache entries in a local SQLite file (its table is created here, on first use of the cache)."""
+
+    def __init__(self, path="helix_cache.sqlite3"):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS response_cache ("
+                " cache_key TEXT PRIMARY KEY, namespace TEXT NOT NULL, workspace TEXT NOT NULL, vector TEXT,"
+                " created_at REAL NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._conn.commit()
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT workspace, created_at FROM response_cache WHERE cache_key = ?", (key,)
+            ).fetchone()
+            if row:
+                self._conn.execute("UPDATE response_cache SET last_used = ? WHERE cache_key = ?", (time.time(), key))
+                self._conn.commit()
+        return (json.loads(row[0]), row[1]) if row else None
+
+    def put(self, key, namespace, workspace, vector):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO response_cache (cache_key, namespace, workspace, vector, created_at, last_used)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (key, namespace, json.dumps(workspace), json.dumps(vector) if vector else None, now, now)
+            )
+            self._conn.commit()
+
+    def vectors(self, namespace):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT cache_key, vector FROM response_cache WHERE namespace = ? AND vector IS NOT NULL", (namespace,)
+            ).fetchall()
+        return [(key, json.loads(vector)) for key, vector in rows]
+
+    def evict(self, max_entries, ttl_seconds):
+        with self._lock:
+            self._conn.execute("DELETE FROM response_cache WHERE created_at < ?", (time.time() - ttl_seconds,))
+            self._conn.execute(
+                "DELETE FROM response_cache WHERE cache_key NOT IN"
+                " (SELECT cache_key FROM response_cache ORDER BY last_used DESC LIMIT ?)",
+                (max_entries,)
+            )
+            self._conn.commit()
+
+
+class PostgresCacheBackend:
+    """Stores cache entries in a `response_cache` table (created by the migrations) through the shared pool."""
+
+    def get(self, key):
+        with get_connection() as conn, conn.cursor() as cur:
+            cur.execute(
+                "UPDATE response_cache SET last_used = %s WHERE cache_key = %s RETURNING workspace, created_at",
+                (time.time(), key)
+            )
+            row = cur.fetchone()
+        return (json.loads(row[0]), row[1]) if row else None
+
+    def put(self, key, namespace, workspace, vector):
+        now = time.time()
+        with get_connection() as conn, conn.cursor() as cur:
+            cur.execute(
+                "INSERT INTO response_cache (cache_key, namespace, workspace, vector, created_at, last_used)"
+                " VALUES (%s, %s, %s, %s, %s, %s)"
+                " ON CONFLICT (cache_key) DO UPDATE SET workspace = EXCLUDED.workspace,"
+                " vector = EXCLUDED.vector, created_at = EXCLUDED.created_at, last_used = EXCLUDED.last_used",
+                (key, namespace, json.dumps(workspace), json.dumps(vector) if vector else None, now, now)
+            )
+
+    def vectors(self, namespace):
+        with get_connection() as conn, conn.cursor() as cur:
+            cur.execute(
+                "SELECT cache_key, vector FROM response_cache WHERE namespace = %s AND vector IS NOT NULL", (namespace,)
+            )
+            rows = cur.fetchall()
+        return [(key, json.loads(vector)) for key, vector in rows]
+
+    def evict(self, max_entries, ttl_seconds):
+        with get_connection() as conn, conn.cursor() as cur:
+            cur.execute("DELETE FROM response_cache WHERE created_at < %s", (time.time() - ttl_seconds,))
+            cur.execute(
+                "DELETE FROM response_cache WHERE cache_key NOT IN"
+                " (SELECT cache_key FROM response_cache ORDER BY last_used DESC LIMIT %s)",
+                (max_entries,)
+            )
+
+
+class ResponseCache:
+    """Caches generated sequences keyed on normalised required_fields + model + prompt version + owner scope.
+
+    Exact hits come from the persistent backend. When `similarity_threshold`
+    is set, a miss falls back to the nearest stored entry whose local field
+    vector is at least that similar. Both tiers only see entries of the same
+    scope (`cache_scope`), so by default one user's sequences are never
+    served to another. With `sharing` set to "global" (one tenant per
+    deployment), generations that were not personalised (not seeded from the
+    user's own history) go to a shared scope every lookup also searches.
+    """
+
+    def __init__(self, backend=None, max_entries=5000, ttl_seconds=7 * 24 * 3600, similarity_threshold=None):
+        self.backend = backend
+        self.backend_kind = None
+        self.path = "helix_cache.sqlite3"
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.sharing = "user"  # "user" or "global"
+        self._vectors = OrderedDict()  # namespace -> {key: vector}, loaded lazily; LRU, max_entries vectors in all
+        self._lock = threading.Lock()
+        self._puts = 0
+        self.hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self.bypassed = 0
+
+    def init_app(self, app):
+        """Chooses the backend and limits from the Flask config (the backend itself is opened on first use)."""
+        self.max_entries = app.config.get("HELIX_CACHE_MAX_ENTRIES", self.max_entries)
+        self.ttl_seconds = app.config.get("HELIX_CACHE_TTL", self.ttl_seconds)
+        self.similarity_threshold = app.config.get("HELIX_CACHE_SIMILARITY", self.similarity_threshold)
+        self.sharing = app.config.get("HELIX_CACHE_SHARING", self.sharing)
+        self.backend_kind = app.config.get("HELIX_CACHE_BACKEND", "sqlite")
+        self.path = app.config.get("HELIX_CACHE_PATH", self.path)
+        self.backend = None
+
+    def _get_backend(self):
+        # ✅ Created on first use, not at import: the SQLite backend runs its CREATE TABLE here
+        if self.backend is None and self.backend_kind in ("postgres", "sqlite"):
+            with self._lock:
+                if self.backend is None and self.backend_kind in ("postgres", "sqlite"):
+                    try:
+                        if self.backend_kind == "postgres":
+                            self.backend = PostgresCacheBackend()
+                        else:
+                            self.backend = SQLiteCacheBackend(self.path)
+                    except Exception as e:
+                        print(f"❌ Response cache disabled, backend '{self.backend_kind}' unavailable: {e}")
+                        self.backend_kind = None
+        return self.backend
+
+    def _scopes(self, scope):
+        return [scope, SHARED_SCOPE] if self.sharing == "global" and scope != SHARED_SCOPE else [scope]
+
+    def get(self, required_fields: dict, model: str, prompt_version: str, bypass=False, scope=""):
+        """The cached workspace for `required_fields` within `scope` (see `cache_scope`) or the shared scope, or None."""
+        if bypass:
+            with self._lock:
+                self.bypassed += 1
+            return None
+        if self._get_backend() is None:
+            return None
+
+        try:
+            for lookup_scope in self._scopes(scope):
+                entry = self.backend.get(cache_key(required_fields, model, prompt_version, lookup_scope))
+                if entry and entry[1] >= time.time() - self.ttl_seconds:
+                    with self._lock:
+                        self.hits += 1
+                    return entry[0]
+
+            if self.similarity_threshold:
+                for lookup_scope in self._scopes(scope):
+                    similar = self._nearest(required_fields, cache_namespace(model, prompt_version, lookup_scope))
+                    if similar is not None:
+                        with self._lock:
+                            self.similar_hits += 1
+                        return similar
+        except Exception as e:
+            print(f"❌ Response cache lookup failed: {e}")
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, required_fields: dict, model: str, prompt_version: str, workspace: dict, scope="",
+            personalised=True):
+        """Stores `workspace` under `model`, which should be the model that actually generated it.
+
+        Non-personalised results go to the shared scope when `sharing` is "global".
+        """
+        if self._get_backend() is None:
+            return
+        if self.sharing == "global" and not personalised:
+            scope = SHARED_SCOPE
+        key = cache_key(required_fields, model, prompt_version, scope)
+        namespace = cache_namespace(model, prompt_version, scope)
+        vector = embed_fields(required_fields) if self.similarity_threshold else None
+        try:
+            self.backend.put(key, namespace, workspace, vector)
+            with self._lock:
+                if vector and namespace in self._vectors:
+                    self._vectors[namespace][key] = vector
+                    self._trim_vectors()
+                self._puts += 1
+                run_eviction = self._puts % 100 == 0
+            if run_eviction:
+                self.backend.evict(self.max_entries, self.ttl_seconds)
+                with self._lock:
+                    self._vectors = OrderedDict()  # Reload after eviction
+        except Exception as e:
+            print(f"❌ Response cache write failed: {e}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.similar_hits + self.misses
+            return {
+                "hits": self.hits,
+                "similar_hits": self.similar_hits,
+                "misses": self.misses,
+                "bypassed": self.bypassed,
+                "hit_rate": ((self.hits + self.similar_hits) / lookups) if lookups else 0.0,
+            }
+
+    def _trim_vectors(self):
+        """Keeps at most `max_entries` vectors in memory, dropping least recently searched namespaces first
+        (they reload from the backend on their next lookup). Called with the lock held."""
+        total = sum(len(vectors) for vectors in self._vectors.values())
+        while total > self.max_entries and len(self._vectors) > 1:
+            _, dropped = self._vectors.popitem(last=False)
+            total -= len(dropped)
+        if total > self.max_entries:
+            # One namespace alone is over the cap: keep its newest vectors
+            namespace, vectors = next(iter(self._vectors.items()))
+            self._vectors[namespace] = dict(list(vectors.items())[-self.max_entries:])
+
+    def _nearest(self, required_fields, namespace):
+        with self._lock:
+            if namespace not in self._vectors:
+                self._vectors[namespace] = dict(self.backend.vectors(namespace))
+                self._trim_vectors()
+            self._vectors.move_to_end(namespace)
+            candidates = list(self._vectors[namespace].items())
+
+        query = embed_fields(required_fields)
+        best_key, best_score = None, self.similarity_threshold
+        for key, vector in candidates:
+            score = cosine(query, vector)
+            if score >= best_score:
+                best_key, best_score = key, score
+        if best_key is None:
+            return None
+
+        entry = self.backend.get(best_key)
+        if entry and entry[1] >= time.time() - self.ttl_seconds:
+            return entry[0]
+        return None
+
+
+# ✅ Shared sequence cache, configured in app.py
+response_cache = ResponseCache()
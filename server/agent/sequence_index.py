@@ -0,0 +1,102 @@
+import copy
+import threading
+from collections import OrderedDict
+
+from agent.response_cache import cosine, embed_fields
+from database.models import db, Sequence
+
+
+class SequenceIndex:
+    """Finds a user's saved sequences whose required_fields resemble a new request.
+
+    Vectors are the local hashed n-gram embeddings the response cache uses
+    (no network). Each user's vectors are built from the `sequence.fields`
+    column on first use, kept in an LRU of `max_users` users and updated as
+    sequences are saved. With `seed_threshold` set, generation is seeded
+    with the closest previous sequence instead of starting from scratch.
+    """
+
+    MAX_SEQUENCES_PER_USER = 2000
+
+    def __init__(self, seed_threshold=None, max_users=500):
+        self.seed_threshold = seed_threshold
+        self.max_users = max_users
+        self._users = OrderedDict()  # user_id -> {sequence_id: vector}
+        self._lock = threading.Lock()
+        self.seeded = 0
+
+    def init_app(self, app):
+        self.seed_threshold = app.config.get("HELIX_SEED_SIMILARITY", self.seed_threshold)
+
+    def _vectors(self, user_id) -> dict:
+        with self._lock:
+            vectors = self._users.get(user_id)
+            if vectors is not None:
+                self._users.move_to_end(user_id)
+                return vectors
+
+        rows = (
+            db.session.query(Sequence.id, Sequence.fields)
+            .filter(Sequence.user_id == user_id, Sequence.fields.isnot(None))
+            .order_by(Sequence.timestamp.desc(), Sequence.id.desc())
+            .limit(self.MAX_SEQUENCES_PER_USER)
+            .all()
+        )
+        vectors = {sequence_id: embed_fields(fields) for sequence_id, fields in rows}
+        with self._lock:
+            self._users[user_id] = vectors
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+        return vectors
+
+    def add(self, user_id, sequence_id, fields: dict):
+        """Indexes a newly saved sequence (only users already loaded; others load it from the table)."""
+        if not fields:
+            return
+        with self._lock:
+            vectors = self._users.get(user_id)
+            if vectors is not None:
+                vectors[sequence_id] = embed_fields(fields)
+
+    def invalidate(self, user_id):
+        """Forgets a user's vectors (their sequences were written elsewhere); they reload on next use."""
+        with self._lock:
+            self._users.pop(user_id, None)
+
+    def similar(self, user_id, required_fields: dict, limit=5, min_score=0.0) -> list:
+        """`[(sequence_id, score)]` of the user's closest sequences, best first."""
+        query = embed_fields(required_fields)
+        scored = [(sequence_id, cosine(query, vector)) for sequence_id, vector in self._vectors(user_id).items()]
+        scored = [item for item in scored if item[1] >= min_score]
+        return sorted(scored, key=lambda item: item[1], reverse=True)[:limit]
+
+    def seed_for(self, user_id, required_fields: dict):
+        """The closest previous sequence if it clears `seed_threshold`, else None."""
+        if not self.seed_threshold or user_id is None:
+            return None
+        try:
+            matches = self.similar(user_id, required_fields, limit=1, min_score=self.seed_threshold)
+            if not matches:
+                return None
+            sequence = db.session.get(Sequence, matches[0][0])
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Similar-sequence lookup failed: {e}")
+            return None
+        if sequence is None:
+            return None
+        with self._lock:
+            self.seeded += 1
+        return copy.deepcopy(sequence.sequence_data)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "users_loaded": len(self._users),
+                "sequences_loaded": sum(len(v) for v in self._users.values()),
+                "seeded": self.seeded,
+            }
+
+
+# ✅ Shared similar-sequence index, configured in app.py
+sequence_index = SequenceIndex()
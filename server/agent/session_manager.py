@@ -0,0 +1,302 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from agent.helix_agent import HelixAgent
+from agent.cassette import Cassette, RecordingLLM
+from agent.llm_client import llm_client
+from agent.session_store import SessionConflictError, create_session_store
+from monitoring.metrics import db_write_seconds, db_write_errors, session_conflicts
+from database.models import db, User, UserSection, Sequence
+
+SESSION_SECTION_NAME = "helix_session"
+
+
+class SessionManager:
+    """Hands out one isolated HelixAgent per user (JWT identity), socket sid or anonymous HTTP session id.
+
+    Sessions live in an LRU map capped by `max_sessions` and expire after
+    `ttl_seconds` of inactivity. Evicted user sessions are snapshotted to the
+    UserSection table (workspace revisions are already in Sequence, written
+    as they are made) and rehydrated lazily on their next turn.
+
+    After every turn the agent's state is also saved to the session store
+    (HELIX_SESSION_STORE). With a shared store ("sqlite" on one host,
+    "postgres" across nodes) any worker can serve any turn: a cached agent
+    whose stored version moved on is reloaded before it is handed out, and
+    saves are compare-and-set on the version the agent started from. Stored
+    sessions not saved for `store_ttl_seconds` are pruned, and evicted
+    socket/anonymous sessions are deleted from the store right away.
+    """
+
+    def __init__(self, max_sessions=500, ttl_seconds=1800, max_history=40, stream_workspace=True, max_revisions=50):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.max_history = max_history
+        self.max_revisions = max_revisions
+        self.stream_workspace = stream_workspace
+        self.socketio = None
+        self._sessions = OrderedDict()  # session_key -> {"agent", "last_seen", "version"}
+        self._lock = threading.RLock()
+        self.store_kind = "memory"
+        self.store_path = "helix_sessions.sqlite3"
+        self._store = None
+        self.store_ttl_seconds = 7 * 24 * 3600
+        self.store_prune_interval = 300
+        self._last_prune = time.monotonic()
+        self.record_dir = None  # With HELIX_RECORD_DIR set, each new session is recorded to a cassette there
+
+    def init_app(self, app, socketio_instance=None):
+        """Reads limits from the Flask config and links the Socket.IO instance."""
+        self.max_sessions = app.config.get("HELIX_MAX_SESSIONS", self.max_sessions)
+        self.ttl_seconds = app.config.get("HELIX_SESSION_TTL", self.ttl_seconds)
+        self.max_history = app.config.get("HELIX_MAX_HISTORY", self.max_history)
+        self.max_revisions = app.config.get("HELIX_WORKSPACE_REVISIONS", self.max_revisions)
+        self.stream_workspace = app.config.get("HELIX_STREAM_WORKSPACE", self.stream_workspace)
+        self.socketio = socketio_instance
+        self.store_kind = app.config.get("HELIX_SESSION_STORE", self.store_kind)
+        self.store_path = app.config.get("HELIX_SESSION_STORE_PATH", self.store_path)
+        self.store_ttl_seconds = app.config.get("HELIX_SESSION_STORE_TTL", self.store_ttl_seconds)
+        self.record_dir = app.config.get("HELIX_RECORD_DIR", self.record_dir)
+
+    def _get_store(self):
+        # Created on first use, after the DB pool the postgres store needs is configured.
+        # None in "memory" mode: the cached agents are the only state.
+        if self._store is None and self.store_kind != "memory":
+            with self._lock:
+                if self._store is None:
+                    self._store = create_session_store(self.store_kind, self.store_path)
+        return self._store
+
+    @staticmethod
+    def key_for_user(identity):
+        return f"user:{identity}"
+
+    @staticmethod
+    def key_for_sid(sid):
+        return f"sid:{sid}"
+
+    @staticmethod
+    def key_for_anon(session_id):
+        """Anonymous HTTP clients, keyed on a server-issued id (kept apart from socket sids)."""
+        return f"anon:{session_id}"
+
+    def get_agent(self, session_key: str) -> HelixAgent:
+        """Returns the agent for `session_key`, creating or rehydrating it if needed."""
+        self._prune_store()
+        with self._lock:
+            self._evict_expired()
+
+            entry = self._sessions.get(session_key)
+            if entry is not None:
+                entry["last_seen"] = time.monotonic()
+                self._sessions.move_to_end(session_key)
+                # ✅ Another worker may have served a turn since; pick up its state
+                if self.store_kind != "memory":
+                    self._refresh(session_key, entry)
+                return entry["agent"]
+
+            # ✅ The session key doubles as the Socket.IO room its sockets join
+            agent = HelixAgent(
+                socketio_instance=self.socketio,
+                max_history=self.max_history,
+                room=session_key,
+                stream_workspace=self.stream_workspace,
+                max_revisions=self.max_revisions,
+            )
+            agent.user_id = self._user_id_for(session_key)
+            if self.record_dir:
+                # ✅ Replayed offline with `python -m benchmarks.replay`
+                agent.cassette = Cassette.for_session(self.record_dir, session_key)
+                agent.llm = RecordingLLM(llm_client, agent.cassette)
+            version = self._load_from_store(session_key, agent)
+            if version is None:
+                self._rehydrate(session_key, agent)
+            entry = {
+                "agent": agent,
+                "last_seen": time.monotonic(),
+                "version": version or 0,
+            }
+            if self._get_store() is not None:
+                agent.on_turn_end = lambda turn_agent: self._save_to_store(session_key, entry)
+            self._sessions[session_key] = entry
+
+            while len(self._sessions) > self.max_sessions:
+                oldest_key = next(iter(self._sessions))
+                self.evict(oldest_key)
+
+            return agent
+
+    def evict(self, session_key: str, forget=True):
+        """Drops a session from memory, snapshotting it first when it belongs to a user.
+
+        Socket and anonymous sessions are never rehydrated, so with `forget`
+        their stored state is deleted as well.
+        """
+        with self._lock:
+            entry = self._sessions.pop(session_key, None)
+        if entry is not None:
+            self._snapshot(session_key, entry)
+        store = self._get_store()
+        if forget and store is not None and not session_key.startswith("user:"):
+            try:
+                store.delete(session_key)
+            except Exception as e:
+                print(f"❌ Error deleting session {session_key} from store: {e}")
+
+    def evict_all(self):
+        """Snapshots and drops every session (used on shutdown; other workers may still serve them)."""
+        with self._lock:
+            keys = list(self._sessions.keys())
+        for key in keys:
+            self.evict(key, forget=False)
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def _evict_expired(self):
+        cutoff = time.monotonic() - self.ttl_seconds
+        expired = [key for key, entry in self._sessions.items() if entry["last_seen"] < cutoff]
+        for key in expired:
+            self.evict(key)
+
+    def _prune_store(self):
+        """Deletes stored sessions idle for longer than `store_ttl_seconds`, at most every `store_prune_interval`."""
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_prune < self.store_prune_interval:
+                return
+            self._last_prune = now
+        store = self._get_store()
+        if store is None:
+            return
+        try:
+            removed = store.prune(self.store_ttl_seconds)
+        except Exception as e:
+            print(f"❌ Error pruning session store: {e}")
+            return
+        if removed:
+            print(f"⏹️ Pruned {removed} idle sessions from the store")
+
+    def _load_from_store(self, session_key: str, agent: HelixAgent):
+        """Loads the latest stored state into `agent`. Returns its version, or None if nothing is stored."""
+        store = self._get_store()
+        if store is None:
+            return None
+        try:
+            stored = store.load(session_key)
+        except Exception as e:
+            print(f"❌ Error loading session {session_key} from store: {e}")
+            return None
+        if stored is None:
+            return None
+        version, state = stored
+        agent.load_snapshot(state)
+        return version
+
+    def _refresh(self, session_key: str, entry: dict):
+        try:
+            current = self._get_store().version(session_key)
+        except Exception as e:
+            print(f"❌ Error checking session {session_key} version: {e}")
+            return
+        # Skip when a turn is running here; it saves its own state when it finishes
+        if current is None or current == entry["version"] or not entry["agent"].lock.acquire(blocking=False):
+            return
+        try:
+            version = self._load_from_store(session_key, entry["agent"])
+            if version is not None:
+                entry["version"] = version
+        finally:
+            entry["agent"].lock.release()
+
+    def _save_to_store(self, session_key: str, entry: dict):
+        """Called by the agent after each successful turn (while it holds the agent lock).
+
+        If another worker saved the session since this agent loaded it, the
+        turn is discarded rather than overwriting theirs: the agent reloads
+        the stored state, the session's sockets get a fresh snapshot, and
+        SessionConflictError reaches the caller so the user can retry.
+        """
+        agent = entry["agent"]
+        try:
+            with db_write_seconds.time(table="helix_sessions"):
+                entry["version"] = self._get_store().save(session_key, agent.to_snapshot(), entry["version"])
+        except SessionConflictError:
+            session_conflicts.inc()
+            print(f"⏹️ Session {session_key} was saved by another worker; discarding this turn")
+            # ✅ A row deleted since (evicted or pruned elsewhere) means the next save inserts again
+            entry["version"] = self._load_from_store(session_key, agent) or 0
+            agent.channel.send_snapshot(to=session_key)
+            raise
+        except Exception as e:
+            db_write_errors.inc(table="helix_sessions")
+            print(f"❌ Error saving session {session_key} to store: {e}")
+
+    def _user_id_for(self, session_key: str):
+        if not session_key.startswith("user:"):
+            return None  # Anonymous socket sessions are not persisted
+        try:
+            user = User.query.filter_by(email=session_key[len("user:"):]).first()
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Error looking up user for session {session_key}: {e}")
+            return None
+        return user.id if user else None
+
+    def _snapshot(self, session_key: str, entry: dict):
+        """Persists conversation state and the revision history to UserSection."""
+        agent = entry["agent"]
+        try:
+            user_id = self._user_id_for(session_key)
+            if user_id is None:
+                return
+
+            snapshot = json.dumps(agent.to_snapshot())
+            section = (
+                UserSection.query
+                .filter_by(user_id=user_id, section_name=SESSION_SECTION_NAME)
+                .order_by(UserSection.timestamp.desc())
+                .first()
+            )
+            if section:
+                section.section_data = snapshot
+            else:
+                db.session.add(UserSection(user_id=user_id, section_name=SESSION_SECTION_NAME, section_data=snapshot))
+
+            with db_write_seconds.time(table="user_section"):
+                db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            db_write_errors.inc(table="user_section")
+            print(f"❌ Error snapshotting session {session_key}: {e}")
+
+    def _rehydrate(self, session_key: str, agent: HelixAgent):
+        """Restores a previously evicted session."""
+        try:
+            user_id = agent.user_id
+            if user_id is None:
+                return
+
+            section = (
+                UserSection.query
+                .filter_by(user_id=user_id, section_name=SESSION_SECTION_NAME)
+                .order_by(UserSection.timestamp.desc())
+                .first()
+            )
+            if section:
+                agent.load_snapshot(json.loads(section.section_data))
+
+            # Snapshots from before revision history: the newest saved sequence is the workspace
+            if agent.workspace.head is None:
+                sequence = Sequence.query.filter_by(user_id=user_id).order_by(Sequence.timestamp.desc()).first()
+                if sequence:
+                    agent.latest_workspace = sequence.sequence_data
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Error rehydrating session {session_key}: {e}")
+
+
+# ✅ Global session manager, linked to the app and Socket.IO in app.py
+session_manager = SessionManager()
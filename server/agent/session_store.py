@@ -0,0 +1,137 @@
+import json
+import sqlite3
+import threading
+import time
+
+from database.pool import get_connection
+
+
+class SessionConflictError(Exception):
+    """Raised by `save` when the stored version is not the one the caller loaded (another worker saved first)."""
+
+
+def _conflict(key, expected_version):
+    return SessionConflictError(f"Session {key} changed since version {expected_version}")
+
+
+class SQLiteSessionStore:
+    """Session state in a local SQLite file, shared by every worker process on one host."""
+
+    def __init__(self, path="helix_sessions.sqlite3"):
+        self.path = path
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS helix_sessions ("
+                " session_key TEXT PRIMARY KEY, version INTEGER NOT NULL, state TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_helix_sessions_updated_at ON helix_sessions (updated_at)")
+
+    def _conn(self):
+        # One connection per thread; sqlite3 connections are not shareable across threads by default
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            self._local.conn = conn
+        return conn
+
+    def version(self, key):
+        row = self._conn().execute("SELECT version FROM helix_sessions WHERE session_key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def load(self, key):
+        row = self._conn().execute("SELECT version, state FROM helix_sessions WHERE session_key = ?", (key,)).fetchone()
+        return (row[0], json.loads(row[1])) if row else None
+
+    def save(self, key, state: dict, expected_version=0):
+        with self._conn() as conn:
+            # ✅ Compare-and-set: no row comes back when another worker saved in between
+            if expected_version:
+                row = conn.execute(
+                    "UPDATE helix_sessions SET version = version + 1, state = ?, updated_at = ?"
+                    " WHERE session_key = ? AND version = ? RETURNING version",
+                    (json.dumps(state), time.time(), key, expected_version)
+                ).fetchone()
+            else:
+                row = conn.execute(
+                    "INSERT INTO helix_sessions (session_key, version, state, updated_at) VALUES (?, 1, ?, ?)"
+                    " ON CONFLICT (session_key) DO NOTHING RETURNING version",
+                    (key, json.dumps(state), time.time())
+                ).fetchone()
+        if row is None:
+            raise _conflict(key, expected_version)
+        return row[0]
+
+    def delete(self, key):
+        with self._conn() as conn:
+            conn.execute("DELETE FROM helix_sessions WHERE session_key = ?", (key,))
+
+    def prune(self, max_age_seconds):
+        """Deletes sessions not saved for `max_age_seconds`. Returns how many were removed."""
+        with self._conn() as conn:
+            return conn.execute("DELETE FROM helix_sessions WHERE updated_at < ?",
+                                (time.time() - max_age_seconds,)).rowcount
+
+
+class PostgresSessionStore:
+    """Session state in Postgres through the shared pool, shared by every worker and node.
+
+    The `helix_sessions` table is created by the migrations (`python -m database.migrate`).
+    """
+
+    def version(self, key):
+        with get_connection() as conn, conn.cursor() as cur:
+            cur.execute("SELECT version FROM helix_sessions WHERE session_key = %s", (key,))
+            row = cur.fetchone()
+        return row[0] if row else None
+
+    def load(self, key):
+        with get_connection() as conn, conn.cursor() as cur:
+            cur.execute("SELECT version, state FROM helix_sessions WHERE session_key = %s", (key,))
+            row = cur.fetchone()
+        return (row[0], json.loads(row[1])) if row else None
+
+    def save(self, key, state: dict, expected_version=0):
+        with get_connection() as conn, conn.cursor() as cur:
+            # ✅ Compare-and-set: no row comes back when another worker saved in between
+            if expected_version:
+                cur.execute(
+                    "UPDATE helix_sessions SET version = version + 1, state = %s, updated_at = CURRENT_TIMESTAMP"
+                    " WHERE session_key = %s AND version = %s RETURNING version",
+                    (json.dumps(state), key, expected_version)
+                )
+            else:
+                cur.execute(
+                    "INSERT INTO helix_sessions (session_key, version, state) VALUES (%s, 1, %s)"
+                    " ON CONFLICT (session_key) DO NOTHING RETURNING version",
+                    (key, json.dumps(state))
+                )
+            row = cur.fetchone()
+        if row is None:
+            raise _conflict(key, expected_version)
+        return row[0]
+
+    def delete(self, key):
+        with get_connection() as conn, conn.cursor() as cur:
+            cur.execute("DELETE FROM helix_sessions WHERE session_key = %s", (key,))
+
+    def prune(self, max_age_seconds):
+        """Deletes sessions not saved for `max_age_seconds`. Returns how many were removed."""
+        with get_connection() as conn, conn.cursor() as cur:
+            cur.execute("DELETE FROM helix_sessions WHERE updated_at < CURRENT_TIMESTAMP - %s * INTERVAL '1 second'",
+                        (max_age_seconds,))
+            return cur.rowcount
+
+
+def create_session_store(kind: str, sqlite_path: str = "helix_sessions.sqlite3"):
+    """Builds the store named by HELIX_SESSION_STORE ("sqlite" or "postgres").
+
+    "memory" (the default) returns None: with a single worker the cached
+    agents already are the session state, so nothing is saved.
+    """
+    if kind == "postgres":
+        return PostgresSessionStore()
+    if kind == "sqlite":
+        return SQLiteSessionStore(sqlite_path)
+    return None
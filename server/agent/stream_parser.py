@@ -0,0 +1,80 @@
+import json
+
+
+class TaskStreamParser:
+    """Incrementally scans a streamed JSON workspace and yields each finished step.
+
+    The model streams text shaped like `{"tasks": [{...}, {...}], "final_sequence": "..."}`.
+    `feed()` takes the next chunk and returns the step objects inside `tasks`
+    that were completed by it, so they can be shown before the whole
+    document has arrived. Text before the first `{` (e.g. a markdown fence)
+    is ignored.
+    """
+
+    def __init__(self, array_key="tasks"):
+        self.array_key = array_key
+        self.text = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = None
+        self._last_string = None
+        self._array_depth = None  # depth inside the tasks array, once found
+        self._item_start = None
+        self.items = []
+
+    def feed(self, chunk: str) -> list:
+        self.text += chunk
+        completed = []
+
+        while self._pos < len(self.text):
+            char = self.text[self._pos]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    self._last_string = self.text[self._string_start:self._pos + 1]
+            elif char == '"':
+                self._in_string = True
+                self._string_start = self._pos
+            elif char in "{[":
+                if (
+                    char == "["
+                    and self._array_depth is None
+                    and self._depth == 1
+                    and self._last_string == json.dumps(self.array_key)
+                ):
+                    self._array_depth = self._depth + 1
+                elif char == "{" and self._array_depth is not None and self._depth == self._array_depth:
+                    self._item_start = self._pos
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if (
+                    char == "}"
+                    and self._item_start is not None
+                    and self._depth == self._array_depth
+                ):
+                    item = self._parse_item(self.text[self._item_start:self._pos + 1])
+                    self._item_start = None
+                    if item is not None:
+                        self.items.append(item)
+                        completed.append(item)
+                elif char == "]" and self._array_depth is not None and self._depth == self._array_depth - 1:
+                    self._array_depth = -1  # tasks array closed; ignore any later arrays
+            self._pos += 1
+
+        return completed
+
+    @staticmethod
+    def _parse_item(text):
+        try:
+            item = json.loads(text)
+        except json.JSONDecodeError:
+            return None
+        return item if isinstance(item, dict) else None
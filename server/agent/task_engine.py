@@ -0,0 +1,171 @@
+import hashlib
+import itertools
+import json
+import random
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from database.db_setup import upsert_task_status, fetch_task_status
+
+PENDING = "pending"
+RUNNING = "running"
+RETRYING = "retrying"
+COMPLETED = "completed"
+FAILED = "failed"
+
+
+def idempotency_key_for(step: dict, scope: str = "") -> str:
+    """Stable key for a step: the same step content in the same scope runs only once."""
+    payload = json.dumps({"scope": scope, "step": step}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class TaskEngine:
+    """Executes sequence steps on a worker pool with retries, backoff and idempotency.
+
+    Each step moves pending -> running -> (retrying ->) completed | failed, and
+    every transition is upserted to the `tasks` table under the step's
+    idempotency key. A step whose key already completed returns the stored
+    result instead of running again. `on_progress(job_id, update)` is called
+    on every transition (used to push Socket.IO progress events). Each attempt
+    calls `handler(step, deadline)` with its own monotonic deadline,
+    `step_timeout` seconds out. `owner`
+    (`{"user_id", "session_key"}`) is stored with the rows so a user's task
+    history can be read back.
+    """
+
+    MAX_TRACKED_JOBS = 1000
+    MAX_COMPLETED_KEYS = 10000
+
+    def __init__(self, max_workers=8, max_retries=3, backoff_base=1.0, backoff_max=30.0, step_timeout=60.0):
+        self.max_workers = max_workers
+        self.step_timeout = step_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._pool = None
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()  # job_id -> {"steps": {step_id: update}, "total": n}
+        self._completed = OrderedDict()  # idempotency_key -> result, for this process
+
+    def init_app(self, app):
+        self.max_workers = app.config.get("HELIX_TASK_WORKERS", self.max_workers)
+        self.max_retries = app.config.get("HELIX_TASK_RETRIES", self.max_retries)
+        self.backoff_base = app.config.get("HELIX_TASK_BACKOFF", self.backoff_base)
+        self.step_timeout = app.config.get("HELIX_TASK_TIMEOUT", self.step_timeout)
+
+    def _executor(self):
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="helix-task")
+        return self._pool
+
+    def execute_one(self, handler, step: dict, idempotency_key: str = None, scope: str = "", owner: dict = None) -> dict:
+        """Runs one step synchronously and returns its final update.
+
+        Called on a request worker, so there is a single attempt and no backoff sleep;
+        a failed key is not final and the client can resubmit it. A client-supplied
+        `idempotency_key` is combined with `scope`, so keys never match across sessions.
+        """
+        key = idempotency_key_for({"client_key": idempotency_key} if idempotency_key else step, scope)
+        return self._run_step(None, handler, step, key, None, owner, max_retries=0)
+
+    def execute_sequence(self, handler, steps: list, scope: str = "", on_progress=None, owner: dict = None) -> str:
+        """Fans every step out to the pool and returns a job id immediately."""
+        job_id = f"job-{next(self._ids)}"
+        with self._lock:
+            self._jobs[job_id] = {"total": len(steps), "steps": {}, "owner": owner}
+            while len(self._jobs) > self.MAX_TRACKED_JOBS:
+                self._jobs.popitem(last=False)
+
+        for step in steps:
+            key = idempotency_key_for(step, scope)
+            # A key completed here may still sit in the write-behind batch, where a later pending row would replace it
+            self._record(job_id, step, {"status": PENDING, "attempt": 0}, on_progress, key, owner,
+                         persist=key not in self._completed)
+            self._executor().submit(self._run_step, job_id, handler, step, key, on_progress, owner)
+        return job_id
+
+    def job_status(self, job_id: str, owner: dict = None):
+        """The job's progress, or None when it is unknown or was started by another session."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or (job["owner"] or {}).get("session_key") != (owner or {}).get("session_key"):
+                return None
+            steps = list(job["steps"].values())
+        done = sum(1 for update in steps if update["status"] in (COMPLETED, FAILED))
+        return {"job_id": job_id, "total": job["total"], "done": done, "steps": steps}
+
+    def shutdown(self, wait=True):
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait)
+            self._pool = None
+
+    def _run_step(self, job_id, handler, step, key, on_progress, owner=None, max_retries=None):
+        max_retries = self.max_retries if max_retries is None else max_retries
+        # ✅ Idempotency: never re-run a step whose key already completed
+        previous = self._completed.get(key)
+        if previous is None:
+            stored = fetch_task_status(key)
+            if stored and stored[0] == COMPLETED:
+                previous = _from_text(stored[1])
+        if previous is not None:
+            # Persisted too: a row another worker or an earlier run left behind must end up completed
+            return self._record(job_id, step, {"status": COMPLETED, "attempt": 0, "result": previous, "cached": True},
+                                on_progress, key, owner)
+
+        attempt = 0
+        while True:
+            attempt += 1
+            self._record(job_id, step, {"status": RUNNING, "attempt": attempt}, on_progress, key, owner)
+            try:
+                result = handler(step, time.monotonic() + self.step_timeout)
+                with self._lock:
+                    self._completed[key] = result
+                    while len(self._completed) > self.MAX_COMPLETED_KEYS:
+                        self._completed.popitem(last=False)
+                return self._record(job_id, step, {"status": COMPLETED, "attempt": attempt, "result": result},
+                                    on_progress, key, owner)
+            except Exception as e:
+                if attempt > max_retries:
+                    return self._record(job_id, step, {"status": FAILED, "attempt": attempt, "result": str(e)},
+                                        on_progress, key, owner)
+                delay = min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1)) * random.uniform(0.5, 1.0)
+                self._record(job_id, step, {"status": RETRYING, "attempt": attempt, "result": str(e),
+                                            "retry_in": round(delay, 2)}, on_progress, key, owner)
+                time.sleep(delay)
+
+    def _record(self, job_id, step, update, on_progress, key, owner=None, persist=True):
+        update = {"step_id": step.get("id"), "idempotency_key": key, **update}
+        if persist:
+            upsert_task_status(key, step.get("id") or 0, step.get("description") or json.dumps(step),
+                               update["status"], _as_text(update.get("result")), update["attempt"], **(owner or {}))
+        if job_id is not None:
+            with self._lock:
+                if job_id in self._jobs:
+                    self._jobs[job_id]["steps"][step.get("id")] = update
+        if on_progress:
+            try:
+                on_progress(job_id, update)
+            except Exception as e:
+                print(f"❌ Error reporting task progress: {e}")
+        return update
+
+
+def _as_text(result):
+    if result is None or isinstance(result, str):
+        return result
+    return json.dumps(result)
+
+
+def _from_text(text):
+    try:
+        return json.loads(text)
+    except (TypeError, ValueError):
+        return text
+
+
+# ✅ Shared execution engine
+task_engine = TaskEngine()
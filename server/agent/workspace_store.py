@@ -0,0 +1,194 @@
+import json
+import threading
+import time
+
+
+def _encode(value) -> str:
+    return json.dumps(value, separators=(",", ":"), sort_keys=True)
+
+
+def _split(task: dict):
+    """`(id, step JSON without the id)`: ids are renumbered on inserts and deletes, the payload is not."""
+    payload = {key: value for key, value in task.items() if key != "id"}
+    return task.get("id"), _encode(payload)
+
+
+def _step(step_id, step: str) -> dict:
+    task = json.loads(step)
+    return task if step_id is None else {"id": step_id, **task}
+
+
+def _step_json(step_id, step: str) -> str:
+    if step_id is None:
+        return step
+    return '{"id":' + json.dumps(step_id) + ("," + step[1:] if step != "{}" else "}")
+
+
+class Revision:
+    """One immutable workspace version.
+
+    `steps` is a tuple of canonical step JSON strings (without the step
+    id, kept in `ids`) taken from the store's pool, so a step that did not
+    change is the same string object in every revision that contains it,
+    even after an insert or delete renumbered it (nothing is copied on commit).
+    """
+
+    __slots__ = ("version", "parent", "steps", "ids", "final_sequence", "label", "created_at")
+
+    def __init__(self, version, parent, steps, ids, final_sequence, label, created_at=None):
+        self.version = version
+        self.parent = parent
+        self.steps = steps
+        self.ids = ids
+        self.final_sequence = final_sequence
+        self.label = label
+        self.created_at = created_at or time.time()
+
+    def workspace(self) -> dict:
+        """A fresh, mutable workspace dict (decoded from the shared step strings)."""
+        return {"tasks": [_step(step_id, step) for step_id, step in zip(self.ids, self.steps)],
+                "final_sequence": self.final_sequence}
+
+    def to_json(self) -> str:
+        """The workspace as JSON, assembled from the stored step strings without re-encoding them."""
+        tasks = ",".join(_step_json(step_id, step) for step_id, step in zip(self.ids, self.steps))
+        return '{"tasks":[' + tasks + '],"final_sequence":' + json.dumps(self.final_sequence) + "}"
+
+    def summary(self) -> dict:
+        return {"version": self.version, "parent": self.parent, "label": self.label, "steps": len(self.steps),
+                "created_at": self.created_at}
+
+
+class WorkspaceStore:
+    """Versioned, copy-on-write history of one session's workspace.
+
+    `commit` interns every step (minus its id) as a canonical JSON string
+    and records a new Revision with the next version; unchanged steps are
+    shared with earlier revisions. `revert` re-commits an earlier revision's step
+    tuple as a new version, so it costs O(1) and never calls the LLM.
+    `diff` compares two revisions step by step on the shared strings and
+    returns the same shape as `workspace_delta`. Only the newest
+    `max_revisions` are kept; `to_dict` stores each distinct step once.
+    """
+
+    def __init__(self, max_revisions=50):
+        self.max_revisions = max_revisions
+        self.version = 0  # Monotonic: reverts and restores get new versions too
+        self._revisions = {}  # version -> Revision, oldest first
+        self._pool = {}  # step JSON -> the same string, shared by every revision containing it
+        self._head = None
+        self._head_workspace = None  # Decoded head, built on first read
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._revisions)
+
+    @property
+    def head(self):
+        return self._head
+
+    def current(self):
+        """The head workspace, or None before the first commit. Shared between callers: do not mutate it."""
+        with self._lock:
+            if self._head is None:
+                return None
+            if self._head_workspace is None:
+                self._head_workspace = self._head.workspace()
+            return self._head_workspace
+
+    def commit(self, workspace: dict, label="edit"):
+        """Records `workspace` as the new head. Returns the new Revision, or None if nothing changed."""
+        tasks = [task for task in (workspace or {}).get("tasks", []) if isinstance(task, dict)]
+        split = [_split(task) for task in tasks]
+        with self._lock:
+            ids = tuple(step_id for step_id, _ in split)
+            steps = tuple(self._intern(step) for _, step in split)
+            final_sequence = (workspace or {}).get("final_sequence")
+            head = self._head
+            if head is not None and (steps, ids, final_sequence) == (head.steps, head.ids, head.final_sequence):
+                return None
+            revision = self._add(steps, ids, final_sequence, label)
+            self._head_workspace = None
+            return revision
+
+    def revert(self, version: int):
+        """Makes revision `version` the head again, as a new version. Raises KeyError if it was pruned."""
+        with self._lock:
+            target = self._revisions[version]
+            revision = self._add(target.steps, target.ids, target.final_sequence, f"revert:{version}")
+            self._head_workspace = None
+            return revision
+
+    def get(self, version: int):
+        return self._revisions.get(version)
+
+    def revisions(self) -> list:
+        with self._lock:
+            return [revision.summary() for revision in self._revisions.values()]
+
+    def diff(self, old_version: int, new_version: int) -> dict:
+        """Changes from one revision to another: `{"upserts", "removed"[, "final_sequence"]}` keyed by step id."""
+        old, new = self._revisions[old_version], self._revisions[new_version]
+        old_steps = dict(zip(old.ids, old.steps))
+        new_ids = set(new.ids)
+        delta = {
+            # Shared steps are the same string object, so unchanged ones compare by identity
+            "upserts": [_step(step_id, step) for step_id, step in zip(new.ids, new.steps) if old_steps.get(step_id) != step],
+            "removed": [step_id for step_id in old.ids if step_id not in new_ids],
+        }
+        if old.final_sequence != new.final_sequence:
+            delta["final_sequence"] = new.final_sequence
+        return delta
+
+    def _intern(self, step: str) -> str:
+        return self._pool.setdefault(step, step)
+
+    def _add(self, steps, ids, final_sequence, label):
+        self.version += 1
+        revision = Revision(self.version, self._head.version if self._head else None, steps, ids, final_sequence, label)
+        self._revisions[revision.version] = revision
+        self._head = revision
+        if len(self._revisions) > self.max_revisions:
+            while len(self._revisions) > self.max_revisions:
+                del self._revisions[next(iter(self._revisions))]
+            live = {step for kept in self._revisions.values() for step in kept.steps}
+            self._pool = {step: step for step in self._pool if step in live}
+        return revision
+
+    def to_dict(self) -> dict:
+        """Compact form: each distinct step once, revisions as indexes into that list."""
+        with self._lock:
+            index = {}
+            steps = []
+            revisions = []
+            for revision in self._revisions.values():
+                positions = []
+                for step in revision.steps:
+                    if step not in index:
+                        index[step] = len(steps)
+                        steps.append(step)
+                    positions.append(index[step])
+                revisions.append([revision.version, revision.parent, positions, list(revision.ids),
+                                  revision.final_sequence, revision.label, revision.created_at])
+            return {"version": self.version, "head": self._head.version if self._head else None,
+                    "steps": steps, "revisions": revisions}
+
+    @classmethod
+    def from_dict(cls, data: dict, max_revisions=50):
+        store = cls(max_revisions=max_revisions)
+        steps = data.get("steps", [])
+        for entry in data.get("revisions", []):
+            if len(entry) == 6:
+                # Saved while step strings still carried their id
+                version, parent, positions, final_sequence, label, created_at = entry
+                split = [_split(json.loads(steps[position])) for position in positions]
+                ids = tuple(step_id for step_id, _ in split)
+                revision_steps = tuple(store._intern(step) for _, step in split)
+            else:
+                version, parent, positions, ids, final_sequence, label, created_at = entry
+                ids = tuple(ids)
+                revision_steps = tuple(store._intern(steps[position]) for position in positions)
+            store._revisions[version] = Revision(version, parent, revision_steps, ids, final_sequence, label, created_at)
+        store.version = data.get("version", 0)
+        store._head = store._revisions.get(data.get("head"))
+        return store
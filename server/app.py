@@ -1,28 +1,44 @@
 import os
-from flask import Flask, request, jsonify
+import atexit
+from flask import Flask
 from flask_cors import CORS
 from flask_socketio import SocketIO
-from flask_sqlalchemy import SQLAlchemy
-from flask_bcrypt import Bcrypt
-from flask_jwt_extended import JWTManager, create_access_token
-from datetime import timedelta
+from flask_jwt_extended import JWTManager
 from dotenv import load_dotenv  
 
 # Load environment variables from .env file
 load_dotenv()
 
-# ✅ Import HelixAgent and Database Models
-from agent.helix_agent import HelixAgent
+# ✅ Import the HelixAgent session manager and Database Models
+from agent.session_manager import session_manager
+from agent.llm_client import llm_client
+from agent.query_executor import query_executor
+from agent.response_cache import response_cache
+from agent.intent_router import intent_router
+from agent.task_engine import task_engine
 from routes.auth import auth_bp
 from routes.message import message_bp
 from routes.execute_task import execute_task_bp
+from routes.stats import stats_bp
+from routes.metrics import metrics_bp
+from routes.campaign import campaign_bp
+from routes.history import history_bp
+from routes.health import health_bp
+from routes.workspace import workspace_bp
+from agent.campaign import campaign_runner
+from agent.sequence_index import sequence_index
+from agent.prompts import prompt_registry
+from monitoring.metrics import instrument_socketio
 from socket_events.events import register_socket_events  # ✅ Ensure it accepts 2 params now
-from database.models import db, User, UserSection, Sequence  
-from database.db_setup import ensure_db_exists, connect_and_create_table
+from database.models import db
+from database.pool import init_pool, close_pool
+from database.write_behind import write_queue
+from security.credentials import credentials
 
 # Initialize Flask App
 app = Flask(__name__)
-CORS(app, resources={r"/*": {"origins": "http://localhost:5173"}}, methods=["GET", "POST", "OPTIONS"], supports_credentials=True)
+CORS(app, resources={r"/*": {"origins": "http://localhost:5173"}}, methods=["GET", "POST", "OPTIONS"], supports_credentials=True,
+     expose_headers=["X-Session-Id"])  # Anonymous HTTP session id (routes/message.py)
 
 # **Database Connection Parameters from .env**
 DB_HOST = os.getenv("DB_HOST")
@@ -35,60 +51,141 @@ SECRET_KEY = os.getenv("SECRET_KEY")
 # Configure PostgreSQL URI for SQLAlchemy
 app.config['SQLALCHEMY_DATABASE_URI'] = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# Fail fast instead of hanging when Postgres is down, and replace connections dropped by a restart
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+    "pool_pre_ping": True,
+    "connect_args": {"connect_timeout": int(os.getenv("DB_CONNECT_TIMEOUT", 5))},
+}
 app.config['JWT_SECRET_KEY'] = SECRET_KEY  # Flask Secret Key
 
+# Per-session HelixAgent limits (LRU size, idle TTL in seconds, messages kept per session)
+app.config['HELIX_MAX_SESSIONS'] = int(os.getenv("HELIX_MAX_SESSIONS", 500))
+app.config['HELIX_SESSION_TTL'] = int(os.getenv("HELIX_SESSION_TTL", 1800))
+app.config['HELIX_MAX_HISTORY'] = int(os.getenv("HELIX_MAX_HISTORY", 40))
+# Workspace revisions kept per session for undo/revert (every revision is also saved to the sequence table)
+app.config['HELIX_WORKSPACE_REVISIONS'] = int(os.getenv("HELIX_WORKSPACE_REVISIONS", 50))
+app.config['HELIX_STREAM_WORKSPACE'] = os.getenv("HELIX_STREAM_WORKSPACE", "true").lower() == "true"
+# Where per-turn session state lives: memory (one worker), sqlite (one host) or postgres (many nodes)
+app.config['HELIX_SESSION_STORE'] = os.getenv("HELIX_SESSION_STORE", "memory")
+app.config['HELIX_SESSION_STORE_PATH'] = os.getenv("HELIX_SESSION_STORE_PATH", "helix_sessions.sqlite3")
+app.config['HELIX_SESSION_STORE_TTL'] = int(os.getenv("HELIX_SESSION_STORE_TTL", 7 * 24 * 3600))
+
+# Bounded LLM worker pool (concurrent turns, waiting turns, per-turn timeout in seconds)
+app.config['HELIX_LLM_WORKERS'] = int(os.getenv("HELIX_LLM_WORKERS", 8))
+app.config['HELIX_LLM_QUEUE_LIMIT'] = int(os.getenv("HELIX_LLM_QUEUE_LIMIT", 100))
+app.config['HELIX_LLM_TIMEOUT'] = float(os.getenv("HELIX_LLM_TIMEOUT", 120))
+
+# LLM client: model tiers with their rate limits, routing per call type, retries and circuit breaking
+app.config['HELIX_MODEL_STRONG'] = os.getenv("HELIX_MODEL_STRONG", "gpt-4")
+app.config['HELIX_MODEL_FAST'] = os.getenv("HELIX_MODEL_FAST", "gpt-4o-mini")
+app.config['HELIX_STRONG_RPM'] = int(os.getenv("HELIX_STRONG_RPM", 500))
+app.config['HELIX_STRONG_TPM'] = int(os.getenv("HELIX_STRONG_TPM", 40000))
+app.config['HELIX_FAST_RPM'] = int(os.getenv("HELIX_FAST_RPM", 500))
+app.config['HELIX_FAST_TPM'] = int(os.getenv("HELIX_FAST_TPM", 200000))
+app.config['HELIX_LLM_ROUTES'] = os.getenv("HELIX_LLM_ROUTES", "extract_fields=fast,intent=fast")
+app.config['HELIX_LLM_RETRIES'] = int(os.getenv("HELIX_LLM_RETRIES", 3))
+app.config['HELIX_LLM_FALLBACK_WAIT'] = float(os.getenv("HELIX_LLM_FALLBACK_WAIT", 1.0))
+app.config['HELIX_LLM_REQUEST_TIMEOUT'] = float(os.getenv("HELIX_LLM_REQUEST_TIMEOUT", 60))
+app.config['HELIX_LLM_BREAKER_THRESHOLD'] = int(os.getenv("HELIX_LLM_BREAKER_THRESHOLD", 5))
+app.config['HELIX_LLM_BREAKER_RESET'] = float(os.getenv("HELIX_LLM_BREAKER_RESET", 30))
+
+# Generated-sequence cache ("sqlite", "postgres" or "off"); similarity enables near-match reuse
+app.config['HELIX_CACHE_BACKEND'] = os.getenv("HELIX_CACHE_BACKEND", "sqlite")
+app.config['HELIX_CACHE_PATH'] = os.getenv("HELIX_CACHE_PATH", "helix_cache.sqlite3")
+app.config['HELIX_CACHE_MAX_ENTRIES'] = int(os.getenv("HELIX_CACHE_MAX_ENTRIES", 5000))
+app.config['HELIX_CACHE_TTL'] = int(os.getenv("HELIX_CACHE_TTL", 7 * 24 * 3600))
+app.config['HELIX_CACHE_SIMILARITY'] = float(os.getenv("HELIX_CACHE_SIMILARITY", 0)) or None
+# user: entries are private to their owner; global: unseeded generations are shared by every user (one tenant)
+app.config['HELIX_CACHE_SHARING'] = os.getenv("HELIX_CACHE_SHARING", "user")
+
+# Step execution engine (parallel workers, retries with exponential backoff in seconds)
+app.config['HELIX_TASK_WORKERS'] = int(os.getenv("HELIX_TASK_WORKERS", 8))
+app.config['HELIX_TASK_RETRIES'] = int(os.getenv("HELIX_TASK_RETRIES", 3))
+app.config['HELIX_TASK_BACKOFF'] = float(os.getenv("HELIX_TASK_BACKOFF", 1.0))
+app.config['HELIX_TASK_TIMEOUT'] = float(os.getenv("HELIX_TASK_TIMEOUT", 60))
+
+# Local intent classifier: below this confidence, routing escalates to a small LLM call
+app.config['HELIX_INTENT_THRESHOLD'] = float(os.getenv("HELIX_INTENT_THRESHOLD", 0.6))
+
+# Seed generation with the user's closest previous sequence when its field similarity is at least this (0 = off)
+app.config['HELIX_SEED_SIMILARITY'] = float(os.getenv("HELIX_SEED_SIMILARITY", 0)) or None
+# ✅ Record every session's turns and LLM replies for offline replay (benchmarks/replay.py); empty = off
+app.config['HELIX_RECORD_DIR'] = os.getenv("HELIX_RECORD_DIR") or None
+
+# Bulk campaigns: concurrent generations (process-wide), upload size and the offline batch backend (openai | local)
+app.config['HELIX_CAMPAIGN_WORKERS'] = int(os.getenv("HELIX_CAMPAIGN_WORKERS", 4))
+app.config['HELIX_CAMPAIGN_MAX_RECORDS'] = int(os.getenv("HELIX_CAMPAIGN_MAX_RECORDS", 200))
+app.config['HELIX_BATCH_BACKEND'] = os.getenv("HELIX_BATCH_BACKEND", "openai")
+
+# Password hashing (bcrypt cost; existing hashes are upgraded on login), the bounded verification
+# pool and how long a verified JWT is trusted without decoding it again (0 = every request)
+app.config['HELIX_BCRYPT_ROUNDS'] = int(os.getenv("HELIX_BCRYPT_ROUNDS", 12))
+app.config['HELIX_AUTH_WORKERS'] = int(os.getenv("HELIX_AUTH_WORKERS", 2))
+app.config['HELIX_AUTH_QUEUE_LIMIT'] = int(os.getenv("HELIX_AUTH_QUEUE_LIMIT", 32))
+app.config['HELIX_TOKEN_CACHE_TTL'] = int(os.getenv("HELIX_TOKEN_CACHE_TTL", 60))
+
+# Enables the runtime profiler toggle (/api/profiler); unset keeps it disabled
+app.config['HELIX_ADMIN_TOKEN'] = os.getenv("HELIX_ADMIN_TOKEN") or None
+
+# Shared psycopg2 pool + write-behind batching for messages/tasks
+app.config['DB_POOL_MIN'] = int(os.getenv("DB_POOL_MIN", 1))
+app.config['DB_POOL_MAX'] = int(os.getenv("DB_POOL_MAX", 10))
+app.config['DB_FLUSH_INTERVAL'] = float(os.getenv("DB_FLUSH_INTERVAL", 0.5))
+app.config['DB_MAX_BATCH_SIZE'] = int(os.getenv("DB_MAX_BATCH_SIZE", 500))
+app.config['DB_CONNECT_TIMEOUT'] = int(os.getenv("DB_CONNECT_TIMEOUT", 5))
+
 # Initialize Extensions
 db.init_app(app)
-bcrypt = Bcrypt(app)
 jwt = JWTManager(app)
-socketio = SocketIO(app, cors_allowed_origins="*", ping_interval=25, ping_timeout=60)
+# Optional message queue (e.g. redis://localhost:6379/0) so several server processes share one fan-out
+# SOCKETIO_ASYNC_MODE must match the worker class wsgi.py runs under (threading, eventlet or gevent)
+socketio = SocketIO(app, cors_allowed_origins="*", ping_interval=25, ping_timeout=60,
+                    message_queue=os.getenv("SOCKETIO_MESSAGE_QUEUE") or None,
+                    async_mode=os.getenv("SOCKETIO_ASYNC_MODE") or None)
+instrument_socketio(socketio)  # Counts/times every emit for /metrics
 
-# ✅ Initialize HelixAgent with socketio
-helix_agent = HelixAgent(socketio_instance=socketio)
+# ✅ Initialize the per-session HelixAgent manager with socketio
+session_manager.init_app(app, socketio)
+query_executor.init_app(app)
+llm_client.init_app(app)
+campaign_runner.init_app(app)
+sequence_index.init_app(app)
+prompt_registry.load()  # Parse the prompt templates once, not per call
+task_engine.init_app(app)
+credentials.init_app(app)
 
 # Register HTTP Routes
 app.register_blueprint(auth_bp, url_prefix="/api")
 app.register_blueprint(message_bp, url_prefix="/api")
 app.register_blueprint(execute_task_bp, url_prefix="/api")
+app.register_blueprint(stats_bp, url_prefix="/api")
+app.register_blueprint(campaign_bp, url_prefix="/api")
+app.register_blueprint(history_bp, url_prefix="/api")
+app.register_blueprint(workspace_bp, url_prefix="/api")
+app.register_blueprint(metrics_bp)  # /metrics and /api/profiler
+app.register_blueprint(health_bp)  # /healthz and /readyz
+
+# ✅ Register Socket.IO Events with the session manager
+register_socket_events(socketio, session_manager, query_executor)
+
+# ✅ No DDL or connections at import: the schema is managed by `python -m database.migrate`,
+# and the pool connects on first use (see /readyz for dependency status)
+init_pool(DB_HOST, DB_PORT, DB_USER, DB_PASSWORD, DB_NAME,
+          minconn=app.config['DB_POOL_MIN'], maxconn=app.config['DB_POOL_MAX'],
+          connect_timeout=app.config['DB_CONNECT_TIMEOUT'])
+write_queue.configure(flush_interval=app.config['DB_FLUSH_INTERVAL'],
+                      max_batch_size=app.config['DB_MAX_BATCH_SIZE'])
+write_queue.start()
+response_cache.init_app(app)
+intent_router.confidence_threshold = app.config['HELIX_INTENT_THRESHOLD']
 
-# ✅ Register Socket.IO Events with HelixAgent
-register_socket_events(socketio, helix_agent)
-
-# ✅ Ensure Database Setup
-with app.app_context():
-    ensure_db_exists(DB_HOST, DB_PORT, DB_USER, DB_PASSWORD, DB_NAME)
-    connect_and_create_table(DB_HOST, DB_PORT, DB_USER, DB_PASSWORD, DB_NAME)
-    
-    # ✅ Only create tables if they don’t exist (Prevents redefinition errors)
-    db.create_all()
-    print("✅ Database setup complete and tables created successfully.")
-
-# ✅ Authentication Routes
-@app.route('/api/auth/signup', methods=['POST'])
-def signup():
-    data = request.get_json()
-    name, email, company, role, password = data.get('name'), data.get('email'), data.get('company'), data.get('role'), data.get('password')
-
-    if User.query.filter_by(email=email).first():
-        return jsonify({'error': 'Email already exists'}), 400
-    
-    new_user = User(name=name, email=email, company=company, role=role, password=password)
-    db.session.add(new_user)
-    db.session.commit()
-    
-    return jsonify({'message': 'User registered successfully'}), 201
-
-@app.route('/api/auth/login', methods=['POST'])
-def login():
-    data = request.get_json()
-    email, password = data.get('email'), data.get('password')
-    user = User.query.filter_by(email=email).first()
-    
-    if user and bcrypt.check_password_hash(user.password, password):
-        access_token = create_access_token(identity=email, expires_delta=timedelta(hours=1))
-        return jsonify({'message': 'Login successful', 'email': email, 'token': access_token}), 200
-    else:
-        return jsonify({'error': 'Invalid credentials'}), 401
+# ✅ Drain queued rows and release connections on shutdown (atexit runs in reverse order)
+atexit.register(close_pool)
+atexit.register(write_queue.shutdown)
+atexit.register(query_executor.shutdown)
+atexit.register(task_engine.shutdown)
+atexit.register(campaign_runner.shutdown)
+atexit.register(credentials.shutdown)
 
 # ✅ Start Server
 if __name__ == "__main__":
@@ -0,0 +1,144 @@
+"""Login-storm benchmark for the credential service.
+
+Simulates a shift-start burst: `--users` logins arrive at once while a
+"chat" probe thread does a tiny unit of work every 10 ms, standing in for
+the socket handlers that share the worker. Runs the burst twice, once
+checking passwords inline on every request thread (the old login route)
+and once through the bounded credential pool, and reports login
+throughput, login latency, shed logins and how late the probe ran.
+Also times a password check per bcrypt cost and a JWT identity lookup
+with and without the verified-token cache. No database or server needed.
+
+    python -m benchmarks.auth_benchmark --users 200 --rounds 10 12 --workers 2
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+import jwt
+
+from benchmarks.intent_benchmark import percentile
+from benchmarks.load_test import RESULTS_DIR, git_commit
+from security.credentials import AuthBusyError, CredentialService
+
+PASSWORD = "correct horse battery staple"
+
+
+def time_check(service, stored, repeats=5) -> float:
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        service._verify(stored, PASSWORD)
+        samples.append((time.perf_counter() - start) * 1000)
+    return percentile(samples, 50)
+
+
+def probe(stop, lateness):
+    """Wakes every 10 ms and records how late it ran (a stalled worker shows up as lateness)."""
+    while not stop.is_set():
+        expected = time.perf_counter() + 0.01
+        time.sleep(0.01)
+        lateness.append(max(0.0, (time.perf_counter() - expected) * 1000))
+
+
+def storm(check, users) -> dict:
+    """Starts `users` logins at once, each calling `check()`; returns throughput and latency stats."""
+    results = []
+    lateness = []
+    stop = threading.Event()
+    prober = threading.Thread(target=probe, args=(stop, lateness))
+    prober.start()
+    barrier = threading.Barrier(users)
+
+    def login():
+        barrier.wait()
+        start = time.perf_counter()
+        try:
+            ok = check()
+            results.append(("ok" if ok else "failed", (time.perf_counter() - start) * 1000))
+        except AuthBusyError:
+            results.append(("shed", (time.perf_counter() - start) * 1000))
+
+    threads = [threading.Thread(target=login) for _ in range(users)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    stop.set()
+    prober.join()
+
+    served = [ms for outcome, ms in results if outcome == "ok"] or [0.0]
+    return {
+        "logins": users,
+        "ok": sum(1 for outcome, _ in results if outcome == "ok"),
+        "shed": sum(1 for outcome, _ in results if outcome == "shed"),
+        "elapsed_s": elapsed,
+        "logins_per_s": len(served) / elapsed if elapsed else 0.0,
+        "login_ms": {"p50": percentile(served, 50), "p95": percentile(served, 95), "max": max(served)},
+        "probe_late_ms": {"p50": percentile(lateness or [0.0], 50), "p95": percentile(lateness or [0.0], 95),
+                          "max": max(lateness or [0.0])},
+    }
+
+
+def token_lookups(lookups) -> dict:
+    secret = "benchmark-secret-of-at-least-32-bytes"
+    token = jwt.encode({"sub": "recruiter@example.com", "exp": int(time.time()) + 3600}, secret, algorithm="HS256")
+
+    def decode(value):
+        return jwt.decode(value, secret, algorithms=["HS256"])
+
+    report = {}
+    for label, ttl in (("uncached", 0), ("cached", 60)):
+        service = CredentialService(token_ttl=ttl)
+        start = time.perf_counter()
+        for _ in range(lookups):
+            service.identity_for_token(token, decode)
+        report[f"{label}_us"] = (time.perf_counter() - start) * 1e6 / lookups
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100, help="Concurrent logins in the burst")
+    parser.add_argument("--rounds", type=int, nargs="+", default=[10, 12], help="bcrypt costs to compare")
+    parser.add_argument("--workers", type=int, default=2, help="Credential pool threads")
+    parser.add_argument("--queue-limit", type=int, default=None, help="Pool queue limit (default: --users, nothing shed)")
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/auth-<commit>-<time>.json)")
+    args = parser.parse_args()
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "config": {"users": args.users, "workers": args.workers, "queue_limit": args.queue_limit or args.users,
+                   "cpus": os.cpu_count()},
+        "check_ms_by_rounds": {},
+        "storms": {},
+        "token_lookup": token_lookups(20000),
+    }
+    for rounds in args.rounds:
+        service = CredentialService(rounds=rounds, max_workers=args.workers, max_queue_depth=args.queue_limit or args.users)
+        stored = service.hash_password(PASSWORD)
+        report["check_ms_by_rounds"][rounds] = time_check(service, stored)
+        print(f"🔗 bcrypt cost {rounds}: {report['check_ms_by_rounds'][rounds]:.1f} ms per check")
+
+        report["storms"][f"inline-{rounds}"] = storm(lambda: service._verify(stored, PASSWORD)[0], args.users)
+        report["storms"][f"pool-{rounds}"] = storm(lambda: service.check_password(stored, PASSWORD)[0], args.users)
+        service.shutdown()
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"auth-{report['commit'] or 'unknown'}-{datetime.now():%Y%m%d-%H%M%S}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+    print(f"✅ Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+"""Local stand-in for the OpenAI chat completions API, for load tests.
+
+Answers `POST /v1/chat/completions` (plain, streamed and tool calls) with
+canned but well-formed replies for each of the agent's prompts. Latency
+is `latency` seconds to the first token plus `len(reply) / 4` tokens at
+`tokens_per_second`; `malformed_rate` of the JSON replies are truncated
+(and completed when the client asks for a continuation). Usage reports
+cached prompt tokens the way OpenAI's prefix cache does: the prefix shared
+with an earlier prompt, once it is at least 1024 tokens, in 128-token steps.
+
+    python -m benchmarks.fake_openai --port 8765 --latency 0.3 --tokens-per-second 80
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=fake python app.py
+"""
+import argparse
+import itertools
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CHUNK_CHARS = 24  # ~6 tokens per streamed chunk
+CACHE_MIN_TOKENS = 1024
+CACHE_STEP_TOKENS = 128
+RECENT_PROMPTS = 256  # Prompts remembered for the simulated prefix cache
+
+
+def _sequence(fields_text: str) -> dict:
+    role = "Software Engineer"
+    for line in fields_text.splitlines():
+        if line.startswith("Job Role:"):
+            role = line.split(":", 1)[1].strip() or role
+    steps = ("Initial outreach email", "Follow-up email", "Final email")
+    return {
+        "tasks": [
+            {
+                "id": number,
+                "description": f"Step {number}: {title}",
+                "message": {
+                    "subject": f"{title} - {role}",
+                    "body": f"Hi {{{{candidate_name}}}}, we are hiring a {role}. " + "We would love to talk. " * 6,
+                },
+            }
+            for number, title in enumerate(steps, start=1)
+        ],
+        "final_sequence": f"A structured 3-step outreach sequence to hire a {role}.",
+    }
+
+
+def reply_for(body: dict):
+    """Returns `(content, tool_arguments)` for a chat completion request."""
+    messages = body.get("messages", [])
+    system = "\n".join(m.get("content") or "" for m in messages if m.get("role") == "system")
+    if len(messages) >= 2 and messages[-2].get("role") == "assistant" and "cut off" in (messages[-1].get("content") or ""):
+        # Continuation request: send the rest of the reply that was truncated
+        full, _ = reply_for({"messages": messages[:-2]})
+        partial = messages[-2].get("content") or ""
+        partial = partial.split("\n", 1)[-1] if partial.startswith("```") else partial
+        return (full[len(partial):] if full.startswith(partial) else full), None
+    if body.get("tools"):
+        if "ONLY ONE" in system:
+            operation = {"op": "insert", "fields": {
+                "description": "Step 4: LinkedIn follow-up",
+                "subject": "Quick follow-up",
+                "body": "Hi {{candidate_name}}, following up on my email about the role.",
+            }}
+        else:
+            operation = {"op": "update", "step_id": 1, "fields": {"subject": "A shorter subject"}}
+        return None, json.dumps({"operations": [operation]})
+    if system.startswith("Classify the recruiter"):
+        return "modify", None
+    if "extract structured hiring details" in system:
+        return json.dumps({
+            "job_role": "Senior Backend Engineer",
+            "technologies": "Python, PostgreSQL",
+            "company_description": "A logistics software company",
+            "location": "Remote",
+            "benefits": "Equity and health insurance",
+        }), None
+    if "executing one step" in system:
+        return json.dumps({"channel": "email", "subject": "Let's talk", "body": "Hi {{candidate_name}}, ..."}), None
+    if "Generate a structured JSON outreach sequence" in system:
+        return json.dumps(_sequence(system)), None
+    return "OK", None
+
+
+def _common_prefix(a: str, b: str) -> int:
+    """Length of the shared prefix (binary search over slice compares, which run in C)."""
+    low, high = 0, min(len(a), len(b))
+    while low < high:
+        mid = (low + high + 1) // 2
+        if a[:mid] == b[:mid]:
+            low = mid
+        else:
+            high = mid - 1
+    return low
+
+
+class FakeOpenAI:
+    """Threaded HTTP server; `start()` returns the base URL to hand to the OpenAI client."""
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.3, tokens_per_second=80.0, malformed_rate=0.0, seed=11):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.malformed_rate = malformed_rate
+        self._rng = random.Random(seed)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.streamed = 0
+        self.malformed = 0
+        self._prompts = []
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name="fake-openai", daemon=True)
+        self._thread.start()
+        return self.base_url
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"requests": self.requests, "streamed": self.streamed, "malformed": self.malformed}
+
+    def _prompt_usage(self, body):
+        """`(prompt_tokens, cached_tokens)` for a request, at ~4 characters per token."""
+        prompt = json.dumps(body.get("tools") or []) + "".join(
+            f"{m.get('role')}:{m.get('content') or ''}\n" for m in body.get("messages", []))
+        with self._lock:
+            shared = max((_common_prefix(prompt, earlier) for earlier in self._prompts), default=0)
+            self._prompts.append(prompt)
+            del self._prompts[:-RECENT_PROMPTS]
+        prompt_tokens, shared_tokens = len(prompt) // 4, shared // 4
+        if shared_tokens < CACHE_MIN_TOKENS:
+            return prompt_tokens, 0
+        return prompt_tokens, CACHE_MIN_TOKENS + (shared_tokens - CACHE_MIN_TOKENS) // CACHE_STEP_TOKENS * CACHE_STEP_TOKENS
+
+    def _maybe_break(self, content):
+        with self._lock:
+            broken = content is not None and content.startswith("{") and self._rng.random() < self.malformed_rate
+            if broken:
+                self.malformed += 1
+        return content[: len(content) // 2] if broken else content
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self.send_error(404)
+                    return
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                content, arguments = reply_for(body)
+                content = fake._maybe_break(content)
+                prompt_tokens, cached_tokens = fake._prompt_usage(body)
+                text = content if content is not None else arguments
+                usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(text or "") // 4,
+                         "total_tokens": prompt_tokens + len(text or "") // 4,
+                         "prompt_tokens_details": {"cached_tokens": cached_tokens}}
+                with fake._lock:
+                    fake.requests += 1
+                    fake.streamed += bool(body.get("stream"))
+                    completion_id = f"chatcmpl-fake-{next(fake._ids)}"
+
+                time.sleep(fake.latency)
+                if body.get("stream"):
+                    self._stream(body, completion_id, text, usage)
+                else:
+                    time.sleep(len(text) / 4 / fake.tokens_per_second)
+                    self._complete(body, completion_id, content, arguments, usage)
+
+            def _complete(self, body, completion_id, content, arguments, usage):
+                message = {"role": "assistant", "content": content}
+                if arguments is not None:
+                    message["tool_calls"] = [{
+                        "id": f"call-{completion_id}",
+                        "type": "function",
+                        "function": {"name": "apply_sequence_patch", "arguments": arguments},
+                    }]
+                payload = json.dumps({
+                    "id": completion_id,
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": body.get("model", "fake"),
+                    "choices": [{"index": 0, "message": message,
+                                 "finish_reason": "tool_calls" if arguments is not None else "stop"}],
+                    "usage": usage,
+                }).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _stream(self, body, completion_id, text, usage):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                delay = CHUNK_CHARS / 4 / fake.tokens_per_second
+                for start in range(0, len(text), CHUNK_CHARS):
+                    time.sleep(delay)
+                    self._event(body, completion_id, {"content": text[start:start + CHUNK_CHARS]}, None)
+                self._event(body, completion_id, {}, "stop")
+                if (body.get("stream_options") or {}).get("include_usage"):
+                    self._event(body, completion_id, None, None, usage)
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+                self.close_connection = True
+
+            def _event(self, body, completion_id, delta, finish_reason, usage=None):
+                chunk = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": body.get("model", "fake"),
+                    # The usage chunk (include_usage) has no choices
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}] if usage is None else [],
+                }
+                if usage is not None:
+                    chunk["usage"] = usage
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.3, help="Seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=80.0)
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="Share of JSON replies to truncate")
+    args = parser.parse_args()
+
+    fake = FakeOpenAI(args.host, args.port, args.latency, args.tokens_per_second, args.malformed_rate)
+    print(f"🔗 Fake OpenAI listening on {fake.start()}")
+    try:
+        fake._thread.join()
+    except KeyboardInterrupt:
+        fake.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Offline accuracy/latency benchmark for the intent router.
+
+Runs stratified k-fold cross-validation of the TF-IDF classifier on the
+shipped labelled set, compares it with the original keyword routing and
+times single-message predictions.
+
+    python -m benchmarks.intent_benchmark [--folds 5] [--examples path.jsonl]
+"""
+import argparse
+import json
+import random
+import time
+from collections import defaultdict
+
+from agent.intent_router import (
+    DEFAULT_TRAINING_SET,
+    INTENTS,
+    KeywordIntentClassifier,
+    TfidfIntentClassifier,
+    load_examples,
+)
+
+
+def stratified_folds(examples, folds, seed=7):
+    by_intent = defaultdict(list)
+    for example in examples:
+        by_intent[example["intent"]].append(example)
+    buckets = [[] for _ in range(folds)]
+    rng = random.Random(seed)
+    for rows in by_intent.values():
+        rng.shuffle(rows)
+        for index, row in enumerate(rows):
+            buckets[index % folds].append(row)
+    return buckets
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def evaluate(classifier, examples, threshold):
+    correct = 0
+    confident = 0
+    confident_correct = 0
+    latencies = []
+    confusion = defaultdict(lambda: defaultdict(int))
+    for example in examples:
+        start = time.perf_counter()
+        intent, confidence = classifier.predict(example["text"])
+        latencies.append((time.perf_counter() - start) * 1e6)
+        confusion[example["intent"]][intent] += 1
+        correct += intent == example["intent"]
+        if confidence >= threshold:
+            confident += 1
+            confident_correct += intent == example["intent"]
+    return correct, confident, confident_correct, latencies, confusion
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--examples", default=DEFAULT_TRAINING_SET)
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--threshold", type=float, default=0.6)
+    args = parser.parse_args()
+
+    examples = load_examples(args.examples)
+    buckets = stratified_folds(examples, args.folds)
+
+    totals = {"correct": 0, "confident": 0, "confident_correct": 0}
+    latencies = []
+    train_ms = []
+    confusion = defaultdict(lambda: defaultdict(int))
+    for index, test_rows in enumerate(buckets):
+        train_rows = [row for i, bucket in enumerate(buckets) if i != index for row in bucket]
+        start = time.perf_counter()
+        classifier = TfidfIntentClassifier().fit(train_rows)
+        train_ms.append((time.perf_counter() - start) * 1000)
+        correct, confident, confident_correct, fold_latencies, fold_confusion = evaluate(classifier, test_rows, args.threshold)
+        totals["correct"] += correct
+        totals["confident"] += confident
+        totals["confident_correct"] += confident_correct
+        latencies.extend(fold_latencies)
+        for expected, row in fold_confusion.items():
+            for predicted, count in row.items():
+                confusion[expected][predicted] += count
+
+    keyword_correct, _, _, keyword_latencies, _ = evaluate(KeywordIntentClassifier(), examples, 0)
+
+    report = {
+        "examples": len(examples),
+        "folds": args.folds,
+        "tfidf": {
+            "accuracy": totals["correct"] / len(examples),
+            "escalation_rate": 1 - totals["confident"] / len(examples),
+            "accuracy_when_confident": (totals["confident_correct"] / totals["confident"]) if totals["confident"] else 0.0,
+            "train_ms_mean": sum(train_ms) / len(train_ms),
+            "predict_us_p50": percentile(latencies, 50),
+            "predict_us_p99": percentile(latencies, 99),
+            "confusion": {expected: dict(confusion[expected]) for expected in INTENTS},
+        },
+        "keyword_baseline": {
+            "accuracy": keyword_correct / len(examples),
+            "predict_us_p50": percentile(keyword_latencies, 50),
+        },
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+"""Concurrent-recruiter load test against a local OpenAI stand-in.
+
+Starts `benchmarks.fake_openai`, points the OpenAI client at it and drives
+the real app (routing, agent turns, Postgres persistence) with N simulated
+users, each playing a scripted conversation through `POST /api/message`
+or the `user_message` socket event. Needs the same database and `.env`
+as the server.
+
+    python -m benchmarks.load_test --users 20 --transport http --latency 0.3
+    python -m benchmarks.load_test --users 20 --transport socket --compare benchmarks/results/<previous>.json
+
+Each run is written to `benchmarks/results/` as JSON (turn latency
+percentiles, throughput, LLM wait and DB time per turn) so runs from
+different commits can be compared with `--compare`.
+"""
+import argparse
+import json
+import os
+import subprocess
+import threading
+import time
+from datetime import datetime, timezone
+
+from benchmarks.fake_openai import FakeOpenAI
+from benchmarks.intent_benchmark import percentile
+from monitoring.metrics import llm_seconds, llm_tokens
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+SCRIPT = (
+    "I'm hiring a Senior Backend Engineer",
+    "Python, Django and PostgreSQL",
+    "{company} builds route planning software for delivery fleets",
+    "Remote, within Europe",
+    "Equity, a $150k salary and unlimited PTO",
+    "Make the subject of step 1 shorter",
+    "Add a LinkedIn follow-up step at the end",
+)
+
+# Metrics compared by --compare, with the direction that counts as better
+COMPARED = {
+    "turn_ms.p50": "lower", "turn_ms.p95": "lower", "turn_ms.p99": "lower",
+    "throughput_turns_per_s": "higher", "llm_wait_ms_per_turn": "lower", "db_ms_per_turn": "lower",
+    "cached_prompt_share": "higher",
+}
+
+
+class Timings:
+    """Thread-safe accumulator for time spent in the database."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.totals = {"orm_ms": 0.0, "orm_queries": 0, "pool_ms": 0.0, "pool_checkouts": 0}
+
+    def add(self, name, ms, counter):
+        with self._lock:
+            self.totals[name] += ms
+            self.totals[counter] += 1
+
+
+def instrument(timings, app):
+    """Wraps SQLAlchemy cursors and the psycopg2 pool with timers (LLM time comes from the metrics registry)."""
+    import database.pool as pool
+    from database.models import db
+    from sqlalchemy import event
+
+    with app.app_context():
+        engine = db.engine
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        timings.add("orm_ms", (time.perf_counter() - conn.info["query_start"].pop()) * 1000, "orm_queries")
+
+    # Time each pooled connection from checkout to return (cache, task status, session store, write-behind).
+    # The pool is created lazily and callers import get_connection by name, so hook the pool factory.
+    get_pool = pool._get_pool
+    checkouts = {}
+    instrumented = []
+
+    def timed_get_pool():
+        target = get_pool()
+        if target not in instrumented:
+            getconn, putconn = target.getconn, target.putconn
+
+            def timed_getconn(*args, **kwargs):
+                conn = getconn(*args, **kwargs)
+                checkouts[id(conn)] = time.perf_counter()
+                return conn
+
+            def timed_putconn(conn, *args, **kwargs):
+                start = checkouts.pop(id(conn), None)
+                if start is not None:
+                    timings.add("pool_ms", (time.perf_counter() - start) * 1000, "pool_checkouts")
+                return putconn(conn, *args, **kwargs)
+
+            target.getconn, target.putconn = timed_getconn, timed_putconn
+            instrumented.append(target)
+        return target
+
+    pool._get_pool = timed_get_pool
+
+
+def run_http_user(app, user, turns, results):
+    client = app.test_client()
+    session_id = None  # Issued by the server on the first turn
+    for text in turns:
+        start = time.perf_counter()
+        headers = {"X-Session-Id": session_id} if session_id else {}
+        response = client.post("/api/message", json={"message": text}, headers=headers)
+        session_id = session_id or response.headers.get("X-Session-Id")
+        results.append({"ms": (time.perf_counter() - start) * 1000, "ok": response.status_code == 200,
+                        "status": response.status_code})
+
+
+def run_socket_user(app, socketio, user, turns, results, turn_timeout):
+    client = socketio.test_client(app)
+    try:
+        client.get_received()  # Drop the connect-time snapshot
+        for text in turns:
+            start = time.perf_counter()
+            ack = client.emit("user_message", text, callback=True)
+            outcome = None
+            while outcome is None and time.perf_counter() - start < turn_timeout:
+                for packet in client.get_received():
+                    if packet["name"] == "turn_complete":
+                        outcome = packet["args"][0]
+                if outcome is None:
+                    time.sleep(0.005)
+            ok = bool(ack) and ack.get("status") == "queued" and outcome is not None and outcome.get("type") != "error"
+            results.append({"ms": (time.perf_counter() - start) * 1000, "ok": ok,
+                            "status": (outcome or {}).get("type") or (ack or {}).get("status") or "timeout"})
+    finally:
+        client.disconnect()
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(__file__)).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(report, baseline_path, metrics=COMPARED):
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+
+    def lookup(data, dotted):
+        for part in dotted.split("."):
+            data = (data or {}).get(part)
+        return data
+
+    print(f"\nCompared with {baseline_path} ({baseline.get('commit')}):")
+    for metric, better in metrics.items():
+        old, new = lookup(baseline, metric), lookup(report, metric)
+        if not old or new is None:
+            continue
+        change = (new - old) / old * 100
+        worse = change > 0 if better == "lower" else change < 0
+        print(f"  {metric:<26} {old:>10.1f} -> {new:>10.1f}  ({change:+.1f}%){'  ❌' if worse and abs(change) > 10 else ''}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--turns", type=int, default=len(SCRIPT), help="Turns per user (the script repeats)")
+    parser.add_argument("--transport", choices=("http", "socket"), default="http")
+    parser.add_argument("--latency", type=float, default=0.3, help="Fake LLM seconds to first token")
+    parser.add_argument("--tokens-per-second", type=float, default=80.0)
+    parser.add_argument("--malformed-rate", type=float, default=0.0)
+    parser.add_argument("--shared-company", action="store_true",
+                        help="Give every user the same details (identical prompts; the response cache is per "
+                             "session, so each user still generates once)")
+    parser.add_argument("--turn-timeout", type=float, default=120.0)
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/load-<commit>-<time>.json)")
+    parser.add_argument("--compare", help="Earlier result file to compare against")
+    args = parser.parse_args()
+
+    fake = FakeOpenAI(latency=args.latency, tokens_per_second=args.tokens_per_second, malformed_rate=args.malformed_rate)
+    os.environ["OPENAI_BASE_URL"] = fake.start()
+    os.environ.setdefault("OPENAI_API_KEY", "fake")
+
+    from app import app, socketio  # After OPENAI_BASE_URL is set; uses the configured (migrated) database
+
+    timings = Timings()
+    instrument(timings, app)
+
+    results = []
+    threads = []
+    started = time.perf_counter()
+    for user in range(args.users):
+        company = "Acme Logistics" if args.shared_company else f"Acme Logistics {user}"
+        turns = [SCRIPT[i % len(SCRIPT)].format(company=company) for i in range(args.turns)]
+        user_results = []
+        results.append(user_results)
+        if args.transport == "http":
+            target, target_args = run_http_user, (app, user, turns, user_results)
+        else:
+            target, target_args = run_socket_user, (app, socketio, user, turns, user_results, args.turn_timeout)
+        threads.append(threading.Thread(target=target, args=target_args, name=f"load-user-{user}"))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    turns = [turn for user_results in results for turn in user_results]
+    llm_seconds_total, llm_calls = llm_seconds.totals()
+    tokens = {}
+    for _, (_, kind), _, value in llm_tokens.samples():
+        tokens[kind] = tokens.get(kind, 0) + value
+    latencies = [turn["ms"] for turn in turns] or [0.0]
+    totals = timings.totals
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "config": {
+            "users": args.users, "turns_per_user": args.turns, "transport": args.transport,
+            "latency": args.latency, "tokens_per_second": args.tokens_per_second,
+            "malformed_rate": args.malformed_rate, "shared_company": args.shared_company,
+            "llm_workers": app.config.get("HELIX_LLM_WORKERS"),
+        },
+        "turns": len(turns),
+        "errors": sum(1 for turn in turns if not turn["ok"]),
+        "elapsed_s": elapsed,
+        "throughput_turns_per_s": len(turns) / elapsed if elapsed else 0.0,
+        "turn_ms": {
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "max": max(latencies),
+        },
+        "llm_calls": llm_calls,
+        "llm_wait_ms_per_turn": llm_seconds_total * 1000 / len(turns) if turns else 0.0,
+        "cached_prompt_share": tokens.get("cached_prompt", 0) / tokens["prompt"] if tokens.get("prompt") else 0.0,
+        "db_ms_per_turn": (totals["orm_ms"] + totals["pool_ms"]) / len(turns) if turns else 0.0,
+        "db": totals,
+        "fake_openai": fake.stats(),
+    }
+    fake.stop()
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"load-{report['commit'] or 'unknown'}-{datetime.now():%Y%m%d-%H%M%S}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+    print(f"✅ Results written to {output}")
+
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == "__main__":
+    main()
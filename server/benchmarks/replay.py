@@ -0,0 +1,190 @@
+"""Deterministic offline replay of recorded agent sessions.
+
+Sessions recorded with `HELIX_RECORD_DIR` (see `agent/cassette.py`) are
+re-run through `HelixAgent` with the recorded LLM replies instead of the
+API, spread over worker processes. No database, network or Socket.IO is
+touched, so thousands of sessions replay in seconds and a change to
+routing, field extraction, prompts or output parsing can be checked
+against real conversations before it ships.
+
+    python -m benchmarks.replay recordings/ --processes 8
+    python -m benchmarks.replay recordings/ --compare benchmarks/results/<previous>.json
+
+For every session it diffs each turn's workspace against the recorded one
+and scores the extracted hiring fields against the recorded values. Turns
+whose LLM calls changed so much that no recorded reply fits (or that were
+served from the response cache while recording; record with
+HELIX_CACHE_BACKEND=off to avoid those) are counted as unreplayable and
+resume from the recorded state.
+"""
+import argparse
+import glob
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+from agent.cassette import Cassette, ReplayLLM
+from benchmarks.intent_benchmark import percentile
+from benchmarks.load_test import RESULTS_DIR, compare, git_commit
+
+FIELDS = ("job_role", "technologies", "company_description", "location", "benefits")
+
+# Metrics compared by --compare, with the direction that counts as better
+COMPARED = {
+    "field_accuracy": "higher", "workspace_match_rate": "higher", "exact_call_share": "higher",
+    "turn_ms.p50": "lower", "turn_ms.p95": "lower",
+}
+
+
+def _normalise(value):
+    return " ".join(str(value).lower().split()) if value is not None else None
+
+
+def diff_workspaces(expected, actual, path="") -> list:
+    """Paths (`tasks[1].message.subject`) where two workspaces differ, empty when they match."""
+    if isinstance(expected, dict) and isinstance(actual, dict):
+        changed = []
+        for key in sorted(set(expected) | set(actual)):
+            changed.extend(diff_workspaces(expected.get(key), actual.get(key), f"{path}.{key}" if path else key))
+        return changed
+    if isinstance(expected, list) and isinstance(actual, list):
+        changed = [f"{path}[{index}]" for index in range(min(len(expected), len(actual)), max(len(expected), len(actual)))]
+        for index, (left, right) in enumerate(zip(expected, actual)):
+            changed.extend(diff_workspaces(left, right, f"{path}[{index}]"))
+        return changed
+    return [] if expected == actual else [path]
+
+
+def field_matches(expected: dict, actual: dict) -> dict:
+    """`{field: True/False}` for every field the recording filled in (case and spacing ignored)."""
+    return {
+        field: _normalise(expected.get(field)) == _normalise((actual or {}).get(field))
+        for field in FIELDS
+        if (expected or {}).get(field) is not None
+    }
+
+
+def replay_session(path: str) -> dict:
+    """Replays one cassette in a fresh agent and returns its per-session result."""
+    from agent.helix_agent import HelixAgent  # Imported in the worker process
+
+    turns = Cassette(path).turns()
+    llm = ReplayLLM()
+    agent = HelixAgent(stream_workspace=False)
+    agent.llm = llm
+    agent.persist = False
+
+    result = {"session": os.path.basename(path), "turns": len(turns), "replayed_turns": 0, "unreplayable_turns": 0,
+              "workspace_diffs": [], "turn_ms": [], "recorded_turn_ms": [], "fields": {}}
+    for index, turn in enumerate(turns):
+        if turn["end"] is None:
+            continue  # The recorded turn failed or was cancelled before it finished
+        llm.load_turn(turn["calls"])
+        missing = llm.missing
+        start = time.perf_counter()
+        try:
+            response = agent.process_query(turn["input"])
+            workspace = response.get("workspace") or {}
+        except Exception as e:
+            print(f"❌ {result['session']} turn {index} raised {e!r}")
+            workspace = None
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        if workspace is None or llm.missing > missing:
+            # ✅ Carry on from the recorded state so one unreplayable turn does not fail the rest
+            result["unreplayable_turns"] += 1
+            agent.required_fields = dict(turn["end"]["f"])
+            agent.latest_workspace = turn["end"]["w"] or agent.latest_workspace
+            continue
+
+        result["replayed_turns"] += 1
+        result["turn_ms"].append(elapsed_ms)
+        result["recorded_turn_ms"].append(turn["end"].get("ms") or 0.0)
+        changed = diff_workspaces(turn["end"]["w"], workspace)
+        if changed:
+            result["workspace_diffs"].append({"turn": index, "input": turn["input"], "changed": changed[:20]})
+
+    final = next((turn["end"] for turn in reversed(turns) if turn["end"] is not None), None)
+    result["fields"] = field_matches(final["f"], agent.required_fields) if final else {}
+    result["llm_calls"] = {"exact": llm.exact, "fuzzy": llm.fuzzy, "missing": llm.missing}
+    return result
+
+
+def cassette_paths(targets) -> list:
+    paths = []
+    for target in targets:
+        if os.path.isdir(target):
+            paths.extend(sorted(glob.glob(os.path.join(target, "**", "*.jsonl.gz"), recursive=True)))
+        else:
+            paths.append(target)
+    return paths
+
+
+def summarise(results: list, elapsed: float, processes: int) -> dict:
+    turn_ms = [ms for result in results for ms in result["turn_ms"]] or [0.0]
+    recorded_ms = [ms for result in results for ms in result["recorded_turn_ms"]] or [0.0]
+    replayed = sum(result["replayed_turns"] for result in results)
+    matched = replayed - sum(len(result["workspace_diffs"]) for result in results)
+    calls = {kind: sum(result["llm_calls"][kind] for result in results) for kind in ("exact", "fuzzy", "missing")}
+    per_field = {}
+    for result in results:
+        for field, ok in result["fields"].items():
+            hits, total = per_field.get(field, (0, 0))
+            per_field[field] = (hits + ok, total + 1)
+    scored = sum(total for _, total in per_field.values())
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "config": {"processes": processes},
+        "sessions": len(results),
+        "turns": sum(result["turns"] for result in results),
+        "replayed_turns": replayed,
+        "unreplayable_turns": sum(result["unreplayable_turns"] for result in results),
+        "elapsed_s": elapsed,
+        "sessions_per_s": len(results) / elapsed if elapsed else 0.0,
+        "workspace_match_rate": matched / replayed if replayed else 0.0,
+        "field_accuracy": sum(hits for hits, _ in per_field.values()) / scored if scored else 0.0,
+        "field_accuracy_by_field": {field: hits / total for field, (hits, total) in sorted(per_field.items())},
+        "llm_calls": calls,
+        "exact_call_share": calls["exact"] / sum(calls.values()) if sum(calls.values()) else 0.0,
+        # Replayed turns skip the API, so this is the agent's own overhead per turn
+        "turn_ms": {"p50": percentile(turn_ms, 50), "p95": percentile(turn_ms, 95), "max": max(turn_ms)},
+        "recorded_turn_ms": {"p50": percentile(recorded_ms, 50), "p95": percentile(recorded_ms, 95)},
+        "session_results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("targets", nargs="+", help="Cassette files or directories of them")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/replay-<commit>-<time>.json)")
+    parser.add_argument("--compare", help="Earlier result file to compare against")
+    args = parser.parse_args()
+
+    paths = cassette_paths(args.targets)
+    if not paths:
+        parser.error("no cassettes found")
+
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.processes) as executor:
+        results = list(executor.map(replay_session, paths, chunksize=max(1, len(paths) // (args.processes * 4))))
+    report = summarise(results, time.perf_counter() - started, args.processes)
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"replay-{report['commit'] or 'unknown'}-{datetime.now():%Y%m%d-%H%M%S}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps({key: value for key, value in report.items() if key != "session_results"}, indent=2))
+    print(f"✅ Results written to {output}")
+
+    if args.compare:
+        compare(report, args.compare, COMPARED)
+
+
+if __name__ == "__main__":
+    main()
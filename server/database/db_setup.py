@@ -1,5 +1,9 @@
+import json
 import psycopg2
 from psycopg2 import sql
+from datetime import datetime
+from database.pool import get_connection
+from database.write_behind import write_queue
 
 def ensure_db_exists(host, port, user, password, db_name):
     """
@@ -68,6 +72,14 @@ def connect_and_create_table(host, port, user, password, db_name):
                 timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             );
         """)
+
+        # Execution-engine columns: one row per idempotency key, updated on every status transition
+        cur.execute("""
+            ALTER TABLE tasks
+                ADD COLUMN IF NOT EXISTS idempotency_key VARCHAR(64) UNIQUE,
+                ADD COLUMN IF NOT EXISTS attempts INT DEFAULT 0,
+                ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP;
+        """)
         
         conn.commit()
         print("✅ Tables created successfully (if they didn't exist).")
@@ -80,44 +92,92 @@ def connect_and_create_table(host, port, user, password, db_name):
     except psycopg2.Error as e:
         print(f"❌ Error connecting to PostgreSQL: {e}")
 
-# Functions for inserting data
-def insert_message(sender: str, content: str):
-    """Insert a message into the messages table."""
-    try:
-        conn = psycopg2.connect(
-            host="localhost",
-            port="5432",
-            database="mydatabase",
-            user="postgres",
-            password="mysecretpassword"
-        )
-        cur = conn.cursor()
-        cur.execute("INSERT INTO messages (sender, content) VALUES (%s, %s);", (sender, content))
-        conn.commit()
-        cur.close()
-        conn.close()
-        print("✅ Message inserted successfully.")
-    except psycopg2.Error as e:
-        print(f"❌ Error inserting message: {e}")
+# Functions for inserting data (queued, written in batches by the write-behind worker)
+def insert_message(sender: str, content: str, user_id: int = None, session_key: str = None):
+    """Queue a message for the messages table, stamped now rather than when its batch is flushed."""
+    write_queue.enqueue(
+        "messages",
+        ("sender", "content", "user_id", "session_key", "timestamp"),
+        (sender, content, user_id, session_key, datetime.utcnow())
+    )
 
 def insert_task(task_id: int, description: str, execution_status: str = "pending", result: str = None):
-    """Insert a task into the tasks table."""
-    try:
-        conn = psycopg2.connect(
-            host="localhost",
-            port="5432",
-            database="mydatabase",
-            user="postgres",
-            password="mysecretpassword"
-        )
-        cur = conn.cursor()
+    """Queue a task for the tasks table."""
+    write_queue.enqueue(
+        "tasks",
+        ("task_id", "description", "execution_status", "result"),
+        (task_id, description, execution_status, result)
+    )
+
+def insert_sequence(user_id: int, session_key: str, version: int, sequence_json: str, fields: dict):
+    """Queue a newly generated sequence as a new sequence row (`sequence_json` is already-encoded JSON)."""
+    write_queue.enqueue(
+        "sequence",
+        ("user_id", "session_key", "version", "sequence_data", "fields", "timestamp"),
+        (user_id, session_key, version, sequence_json, json.dumps(fields), datetime.utcnow())
+    )
+
+def insert_sequence_revision(user_id: int, session_key: str, version: int, sequence_json: str, fields: dict):
+    """Queue one edit/revert revision of a session's workspace for the sequence_revision table."""
+    write_queue.enqueue(
+        "sequence_revision",
+        ("user_id", "session_key", "version", "sequence_data", "fields", "timestamp"),
+        (user_id, session_key, version, sequence_json, json.dumps(fields), datetime.utcnow())
+    )
+
+def prune_sequence_revisions(session_key: str, keep: int):
+    """Deletes all but the newest `keep` sequence_revision rows of a session."""
+    with get_connection() as conn, conn.cursor() as cur:
         cur.execute(
-            "INSERT INTO tasks (task_id, description, execution_status, result) VALUES (%s, %s, %s, %s);",
-            (task_id, description, execution_status, result)
+            "DELETE FROM sequence_revision WHERE session_key = %s AND id NOT IN"
+            " (SELECT id FROM sequence_revision WHERE session_key = %s ORDER BY id DESC LIMIT %s)",
+            (session_key, session_key, keep)
         )
-        conn.commit()
-        cur.close()
-        conn.close()
-        print("✅ Task inserted successfully.")
-    except psycopg2.Error as e:
-        print(f"❌ Error inserting task: {e}")
+
+def upsert_task_status(idempotency_key: str, task_id: int, description: str, execution_status: str,
+                       result: str = None, attempts: int = 0, user_id: int = None, session_key: str = None):
+    """Queue a status transition for an executed task (one row per idempotency key).
+
+    A completed row is final: later transitions for its key (e.g. a re-submitted step's
+    `pending`) never overwrite it, so the stored result keeps serving retries.
+    """
+    write_queue.enqueue(
+        "tasks",
+        ("idempotency_key", "task_id", "description", "execution_status", "result", "attempts", "updated_at",
+         "user_id", "session_key"),
+        (idempotency_key, task_id, description, execution_status, result, attempts, datetime.utcnow(),
+         user_id, session_key),
+        conflict=("idempotency_key",),
+        conflict_where="tasks.execution_status <> 'completed'"
+    )
+
+def fetch_task_status(idempotency_key: str):
+    """Return (execution_status, result) for a previously executed task, or None."""
+    try:
+        with get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    "SELECT execution_status, result FROM tasks WHERE idempotency_key = %s;",
+                    (idempotency_key,)
+                )
+                return cur.fetchone()
+    except Exception as e:
+        print(f"❌ Error reading task status: {e}")
+        return None
+
+def fetch_messages(user_id: int, limit: int, before=None):
+    """Return up to `limit` of a user's messages, newest first, as (id, sender, content, timestamp) rows.
+
+    `before` is the (timestamp, id) of the last row of the previous page (keyset pagination).
+    """
+    query = "SELECT id, sender, content, timestamp FROM messages WHERE user_id = %s"
+    params = [user_id]
+    if before is not None:
+        query += " AND (timestamp, id) < (%s, %s)"
+        params.extend(before)
+    query += " ORDER BY timestamp DESC, id DESC LIMIT %s;"
+    params.append(limit)
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(query, params)
+            return cur.fetchall()
@@ -0,0 +1,39 @@
+"""Creates the database and brings its schema up to date. Run once per deploy, before starting the server:
+
+    python -m database.migrate
+
+The server itself never runs DDL, so workers start without waiting on Postgres.
+"""
+import os
+import sys
+from dotenv import load_dotenv
+from sqlalchemy import create_engine
+from database.db_setup import ensure_db_exists, connect_and_create_table
+from database.migrations import apply_migrations, LATEST_VERSION
+from database.models import db
+
+
+def main():
+    load_dotenv()
+    host, port, name = os.getenv("DB_HOST"), os.getenv("DB_PORT"), os.getenv("DB_NAME")
+    user, password = os.getenv("DB_USER"), os.getenv("DB_PASSWORD")
+
+    ensure_db_exists(host, port, user, password, name)
+    connect_and_create_table(host, port, user, password, name)
+
+    # ✅ Model tables (user, user_section, sequence, sequence_revision, campaign_batch) straight from the metadata; no Flask app needed
+    engine = create_engine(f"postgresql://{user}:{password}@{host}:{port}/{name}")
+    try:
+        db.metadata.create_all(engine)
+    finally:
+        engine.dispose()
+
+    version = apply_migrations(host, port, user, password, name)
+    if version != LATEST_VERSION:
+        print(f"❌ Schema is at version {version}, expected {LATEST_VERSION}")
+        sys.exit(1)
+    print(f"✅ Database schema is up to date (version {version})")
+
+
+if __name__ == "__main__":
+    main()
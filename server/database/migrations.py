@@ -0,0 +1,160 @@
+import psycopg2
+
+# Ordered schema changes; each one runs once and is recorded in schema_migrations.
+# Append new entries, never edit an applied one.
+MIGRATIONS = [
+    (1, "history_owners_and_indexes", [
+        # messages/tasks had no owner: link rows to the user and to the session they came from
+        """
+        ALTER TABLE messages
+            ADD COLUMN IF NOT EXISTS user_id INT REFERENCES "user"(id) ON DELETE CASCADE,
+            ADD COLUMN IF NOT EXISTS session_key VARCHAR(255);
+        """,
+        """
+        ALTER TABLE tasks
+            ADD COLUMN IF NOT EXISTS user_id INT REFERENCES "user"(id) ON DELETE CASCADE,
+            ADD COLUMN IF NOT EXISTS session_key VARCHAR(255);
+        """,
+        # (owner, timestamp, id) matches the keyset pagination order, so a page is one index range scan
+        "CREATE INDEX IF NOT EXISTS ix_messages_user_timestamp ON messages (user_id, timestamp, id);",
+        "CREATE INDEX IF NOT EXISTS ix_messages_session_timestamp ON messages (session_key, timestamp, id);",
+        "CREATE INDEX IF NOT EXISTS ix_tasks_user_timestamp ON tasks (user_id, timestamp, id);",
+        "CREATE INDEX IF NOT EXISTS ix_sequence_user_timestamp ON sequence (user_id, timestamp, id);",
+        "CREATE INDEX IF NOT EXISTS ix_user_section_user_name ON user_section (user_id, section_name, timestamp);",
+    ]),
+    (2, "sequence_jsonb_search", [
+        # Rewrites the table once; every stored value was written with json.dumps
+        "ALTER TABLE sequence ALTER COLUMN sequence_data TYPE JSONB USING sequence_data::jsonb;",
+        "ALTER TABLE sequence ADD COLUMN IF NOT EXISTS fields JSONB;",
+        # Weights: job role (A) > technologies (B) > subjects (C) > bodies (D), so ts_rank_cd ranks by role first
+        """
+        ALTER TABLE sequence ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+            setweight(to_tsvector('english', coalesce(fields->>'job_role', '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(fields->>'technologies', '')), 'B') ||
+            setweight(jsonb_to_tsvector('english',
+                jsonb_path_query_array(sequence_data, '$.tasks[*].message.subject'), '["string"]'), 'C') ||
+            setweight(jsonb_to_tsvector('english',
+                jsonb_path_query_array(sequence_data, '$.tasks[*].message.body'), '["string"]'), 'D')
+        ) STORED;
+        """,
+        "CREATE INDEX IF NOT EXISTS ix_sequence_search ON sequence USING GIN (search_vector);",
+    ]),
+    (3, "shared_store_tables", [
+        # Previously created by the postgres session store / response cache on first use
+        """
+        CREATE TABLE IF NOT EXISTS helix_sessions (
+            session_key VARCHAR(255) PRIMARY KEY, version INTEGER NOT NULL, state TEXT NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS response_cache (
+            cache_key VARCHAR(64) PRIMARY KEY, namespace VARCHAR(16) NOT NULL, workspace TEXT NOT NULL, vector TEXT,
+            created_at DOUBLE PRECISION NOT NULL, last_used DOUBLE PRECISION NOT NULL
+        );
+        """,
+    ]),
+    (4, "sequence_revisions", [
+        # Every workspace revision is now a sequence row; these tie it to its session's revision history
+        """
+        ALTER TABLE sequence
+            ADD COLUMN IF NOT EXISTS session_key VARCHAR(255),
+            ADD COLUMN IF NOT EXISTS version INT;
+        """,
+        "CREATE INDEX IF NOT EXISTS ix_sequence_session_version ON sequence (session_key, version);",
+    ]),
+    (5, "campaign_batch_owners", [
+        # Batch owners and record fields were held in worker memory; any worker can now serve a batch
+        """
+        CREATE TABLE IF NOT EXISTS campaign_batch (
+            batch_id VARCHAR(64) PRIMARY KEY, user_id INT NOT NULL REFERENCES "user"(id),
+            fields JSONB NOT NULL, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, collected_at TIMESTAMP
+        );
+        """,
+    ]),
+    (6, "sequence_revision_history", [
+        # Intermediate revisions flooded /api/sequences, search and the similar-sequence index.
+        # They move to their own table; sequence keeps one row per chat session (its latest revision).
+        """
+        CREATE TABLE IF NOT EXISTS sequence_revision (
+            id SERIAL PRIMARY KEY, user_id INT NOT NULL REFERENCES "user"(id) ON DELETE CASCADE,
+            session_key VARCHAR(255) NOT NULL, version INT NOT NULL, sequence_data JSONB NOT NULL, fields JSONB,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        """,
+        """
+        INSERT INTO sequence_revision (user_id, session_key, version, sequence_data, fields, timestamp)
+        SELECT user_id, session_key, version, sequence_data, fields, timestamp
+        FROM sequence WHERE session_key IS NOT NULL;
+        """,
+        """
+        DELETE FROM sequence s USING sequence newer
+        WHERE s.session_key = newer.session_key AND (newer.version, newer.id) > (s.version, s.id);
+        """,
+        "DROP INDEX IF EXISTS ix_sequence_session_version;",
+        # NULL session keys (campaign rows) stay distinct, so only chat rows are one per session
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_sequence_session ON sequence (session_key);",
+        "CREATE INDEX IF NOT EXISTS ix_sequence_revision_session_version ON sequence_revision (session_key, version);",
+    ]),
+    (7, "sequence_rows_per_generation", [
+        # Session keys are per user, so one sequence row per session overwrote every earlier generation.
+        # Each generation is a new sequence row again; only edit revisions go to sequence_revision.
+        "DROP INDEX IF EXISTS ux_sequence_session;",
+        "CREATE INDEX IF NOT EXISTS ix_sequence_session_version ON sequence (session_key, version);",
+    ]),
+    (8, "helix_sessions_ttl", [
+        # Stale sessions are pruned on updated_at (HELIX_SESSION_STORE_TTL)
+        "CREATE INDEX IF NOT EXISTS ix_helix_sessions_updated_at ON helix_sessions (updated_at);",
+    ]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def schema_version(cur):
+    """The applied schema version (0 before the first migration), read with an open cursor."""
+    cur.execute("SELECT to_regclass('schema_migrations') IS NOT NULL;")
+    if not cur.fetchone()[0]:
+        return 0
+    cur.execute("SELECT COALESCE(MAX(version), 0) FROM schema_migrations;")
+    return cur.fetchone()[0]
+
+
+def apply_migrations(host, port, user, password, db_name):
+    """Applies every migration newer than the recorded schema version. Returns the current version."""
+    try:
+        conn = psycopg2.connect(host=host, port=port, user=user, password=password, database=db_name)
+    except psycopg2.Error as e:
+        print(f"❌ Error connecting to PostgreSQL for migrations: {e}")
+        return None
+
+    try:
+        with conn.cursor() as cur:
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS schema_migrations (
+                    version INT PRIMARY KEY,
+                    name VARCHAR(255) NOT NULL,
+                    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                );
+            """)
+            conn.commit()
+            cur.execute("SELECT COALESCE(MAX(version), 0) FROM schema_migrations;")
+            current = cur.fetchone()[0]
+
+            for version, name, statements in MIGRATIONS:
+                if version <= current:
+                    continue
+                # ✅ One transaction per migration: it is either fully applied and recorded, or not at all
+                for statement in statements:
+                    cur.execute(statement)
+                cur.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s);", (version, name))
+                conn.commit()
+                current = version
+                print(f"✅ Applied migration {version:03d} ({name})")
+        return current
+    except psycopg2.Error as e:
+        conn.rollback()
+        print(f"❌ Error applying migrations: {e}")
+        return None
+    finally:
+        conn.close()
@@ -1,9 +1,8 @@
 from flask_sqlalchemy import SQLAlchemy
-from flask_bcrypt import Bcrypt
+from sqlalchemy.dialects.postgresql import JSONB
 from datetime import datetime
 
 db = SQLAlchemy()
-bcrypt = Bcrypt()
 
 # Define User model
 class User(db.Model):
@@ -14,12 +13,12 @@ class User(db.Model):
     role = db.Column(db.String(120), nullable=False)
     password = db.Column(db.String(128), nullable=False)
 
-    def __init__(self, name, email, company, role, password):
+    def __init__(self, name, email, company, role, password_hash):
         self.name = name
         self.email = email
         self.company = company
         self.role = role
-        self.password = bcrypt.generate_password_hash(password).decode('utf-8')
+        self.password = password_hash  # From credentials.new_password_hash (bcrypt runs on the auth pool)
 
 # Define User Section model to save user-selected sections
 class UserSection(db.Model):
@@ -29,9 +28,43 @@ class UserSection(db.Model):
     section_data = db.Column(db.Text, nullable=False)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (db.Index("ix_user_section_user_name", "user_id", "section_name", "timestamp"),)
+
 # Define Sequence model
 class Sequence(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    sequence_data = db.Column(db.Text, nullable=False)
+    sequence_data = db.Column(JSONB, nullable=False)
+    fields = db.Column(JSONB)  # required_fields the sequence was generated for
+    session_key = db.Column(db.String(255))  # Chat session and workspace revision the sequence was generated in
+    version = db.Column(db.Integer)
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    # search_vector (generated tsvector + GIN index) is maintained by migration 002 and only read through SQL
+
+    # Keyset pagination order for GET /api/sequences
+    __table_args__ = (
+        db.Index("ix_sequence_user_timestamp", "user_id", "timestamp", "id"),
+        db.Index("ix_sequence_session_version", "session_key", "version"),
+    )
+
+# Edit and revert revisions of a chat session's workspace (generations are sequence rows), pruned per session
+class SequenceRevision(db.Model):
+    __tablename__ = "sequence_revision"
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete="CASCADE"), nullable=False)
+    session_key = db.Column(db.String(255), nullable=False)
+    version = db.Column(db.Integer, nullable=False)
+    sequence_data = db.Column(JSONB, nullable=False)
+    fields = db.Column(JSONB)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (db.Index("ix_sequence_revision_session_version", "session_key", "version"),)
+
+# Offline campaign batches: who submitted them and the records behind each custom_id
+class CampaignBatch(db.Model):
+    __tablename__ = "campaign_batch"
+    batch_id = db.Column(db.String(64), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    fields = db.Column(JSONB, nullable=False)  # key -> required_fields; the Batch API only echoes custom_id back
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    collected_at = db.Column(db.DateTime)  # Set by the first read of the finished results
@@ -0,0 +1,54 @@
+from contextlib import contextmanager
+import threading
+from psycopg2.pool import ThreadedConnectionPool
+
+_pool = None
+_settings = None
+_lock = threading.Lock()
+
+def init_pool(host, port, user, password, db_name, minconn=1, maxconn=10, connect_timeout=5):
+    """Records the shared pool's settings. Called once at startup from the app config.
+
+    No connection is opened here: the pool is created on first use, so the
+    server starts (and forks workers) without waiting on Postgres, and a
+    database that is down at boot is picked up once it comes back.
+    """
+    global _settings
+    _settings = dict(minconn=minconn, maxconn=maxconn, host=host, port=port, user=user, password=password,
+                     database=db_name, connect_timeout=connect_timeout)
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        with _lock:
+            if _pool is None:
+                if _settings is None:
+                    raise RuntimeError("Database pool is not initialised; call init_pool() first")
+                settings = dict(_settings)
+                _pool = ThreadedConnectionPool(settings.pop("minconn"), settings.pop("maxconn"), **settings)
+                print(f"🔗 PostgreSQL pool ready for '{settings['database']}' "
+                      f"({_settings['minconn']}-{_settings['maxconn']} connections)")
+    return _pool
+
+def close_pool():
+    """Closes every pooled connection."""
+    global _pool
+    with _lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+
+@contextmanager
+def get_connection():
+    """Borrows a connection from the pool (created on first use), committing on success and rolling back on error."""
+    pool = _get_pool()
+    conn = pool.getconn()
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        if not conn.closed:
+            conn.rollback()
+        raise
+    finally:
+        pool.putconn(conn, close=bool(conn.closed))  # Drop connections the server closed (e.g. after a restart)
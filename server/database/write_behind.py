@@ -0,0 +1,202 @@
+import queue
+import threading
+import time
+import psycopg2
+from psycopg2.extras import execute_values
+from psycopg2.pool import PoolError
+from database.pool import get_connection
+from monitoring.metrics import db_write_seconds, db_rows_written, db_write_errors
+
+# Worth retrying later: the database or the pool, not the rows, was the problem
+TRANSIENT_ERRORS = (psycopg2.OperationalError, psycopg2.InterfaceError, PoolError)
+
+class WriteBehindQueue:
+    """Buffers row inserts and writes them in multi-row batches on a background thread.
+
+    `enqueue` never touches the database, so the request path does not wait on a
+    round-trip. Rows are flushed every `flush_interval` seconds or as soon as
+    `max_batch_size` rows are pending, and `shutdown` drains whatever is left.
+    Rows that hit a transient database error are kept and retried with
+    exponential backoff (up to `max_backoff` seconds) ahead of newer rows.
+    """
+
+    def __init__(self, flush_interval=0.5, max_batch_size=500, max_queue_size=10000, max_backoff=30,
+                 shutdown_retries=3):
+        self.flush_interval = flush_interval
+        self.max_batch_size = max_batch_size
+        self.max_backoff = max_backoff
+        self.shutdown_retries = shutdown_retries
+        self._retry = []  # Rows from the last flush that failed transiently; at most one batch
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._stop = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self.dropped_rows = 0
+        self.written_rows = 0
+
+    def configure(self, flush_interval=None, max_batch_size=None):
+        if flush_interval is not None:
+            self.flush_interval = flush_interval
+        if max_batch_size is not None:
+            self.max_batch_size = max_batch_size
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="helix-write-behind", daemon=True)
+                self._thread.start()
+
+    def enqueue(self, table: str, columns: tuple, row: tuple, conflict: tuple = None, conflict_where: str = None):
+        """Queues one row for `table`. Drops (and counts) the row if the buffer is full.
+
+        With `conflict` (a unique column tuple) the row is upserted: later rows
+        for the same key overwrite earlier ones, within and across batches.
+        `conflict_where` guards that update (e.g. never overwrite a finished row).
+        """
+        self.start()
+        try:
+            self._queue.put_nowait((table, columns, row, (conflict, conflict_where) if conflict else None))
+        except queue.Full:
+            self.dropped_rows += 1
+            print(f"❌ Write-behind queue full, dropped row for '{table}'")
+
+    def pending(self) -> int:
+        return self._queue.qsize() + len(self._retry)
+
+    def shutdown(self, timeout=10):
+        """Stops the worker after flushing every queued row."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        left = self._flush(self._drain(limit=None))  # Anything enqueued after the worker exited
+        self._drop(left)
+
+    def _drain(self, limit):
+        rows = []
+        while limit is None or len(rows) < limit:
+            try:
+                rows.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return rows
+
+    def _backoff(self, failures):
+        return min(self.max_backoff, self.flush_interval * 2 ** failures)
+
+    def _run(self):
+        failures = 0
+        while not self._stop.is_set():
+            # ✅ Rows that failed transiently go first, ahead of newer rows for the same keys
+            batch, self._retry = self._retry, []
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or self._stop.is_set():
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._retry = self._flush(batch)
+            failures = failures + 1 if self._retry else 0
+            if failures:
+                self._stop.wait(self._backoff(failures))
+
+        # ✅ Drain on shutdown, giving a flapping database a few more tries
+        failures = 0
+        while True:
+            batch, self._retry = self._retry, []
+            batch += self._drain(limit=self.max_batch_size - len(batch))
+            if not batch:
+                break
+            self._retry = self._flush(batch)
+            if self._retry:
+                failures += 1
+                if failures >= self.shutdown_retries:
+                    self._drop(self._retry)
+                    self._retry = []
+                    break
+                time.sleep(self._backoff(failures))
+
+    def _drop(self, rows):
+        if rows:
+            self.dropped_rows += len(rows)
+            print(f"❌ Write-behind gave up on {len(rows)} rows")
+
+    def _query(self, table, columns, conflict):
+        query = f"INSERT INTO {table} ({', '.join(columns)}) VALUES %s"
+        if conflict:
+            keys, where = conflict
+            updates = ", ".join(f"{c} = EXCLUDED.{c}" for c in columns if c not in keys)
+            query += f" ON CONFLICT ({', '.join(keys)}) DO UPDATE SET {updates}"
+            if where:
+                query += f" WHERE {where}"
+        return query
+
+    def _flush(self, batch):
+        """Writes `batch` with one transaction per (table, columns, conflict) group.
+
+        A group that hits a transient error (connection lost, pool exhausted)
+        is returned to be retried later. A group that fails for any other
+        reason is rewritten row by row, so one bad row only loses itself.
+        """
+        if not batch:
+            return []
+
+        grouped = {}
+        for table, columns, row, conflict in batch:
+            rows = grouped.setdefault((table, columns, conflict), {} if conflict else [])
+            if conflict:
+                # Postgres rejects an upsert that touches the same row twice, so keep the latest
+                rows[tuple(row[columns.index(column)] for column in conflict[0])] = row
+            else:
+                rows.append(row)
+
+        retry = []
+        for (table, columns, conflict), rows in grouped.items():
+            rows = list(rows.values()) if conflict else rows
+            try:
+                try:
+                    with get_connection() as conn, conn.cursor() as cur:
+                        with db_write_seconds.time(table=table):
+                            execute_values(cur, self._query(table, columns, conflict), rows,
+                                           page_size=self.max_batch_size)
+                    self.written_rows += len(rows)
+                    db_rows_written.inc(len(rows), table=table)
+                except TRANSIENT_ERRORS:
+                    raise
+                except Exception as e:
+                    db_write_errors.inc(table=table)
+                    print(f"❌ Batch of {len(rows)} rows for '{table}' failed ({e}); writing them one by one")
+                    self._write_rows(table, columns, conflict, rows)
+            except TRANSIENT_ERRORS as e:
+                db_write_errors.inc(table=table)
+                print(f"⏹️ Could not write {len(rows)} rows for '{table}' ({e}); will retry")
+                retry.extend((table, columns, row, conflict) for row in rows)
+        return retry
+
+    def _write_rows(self, table, columns, conflict, rows):
+        """Fallback for a failed group: each row under its own savepoint, dropping only the ones that fail."""
+        query = self._query(table, columns, conflict)
+        written = 0
+        with get_connection() as conn, conn.cursor() as cur:
+            for row in rows:
+                cur.execute("SAVEPOINT helix_row")
+                try:
+                    execute_values(cur, query, [row])
+                except TRANSIENT_ERRORS:
+                    raise
+                except Exception as e:
+                    cur.execute("ROLLBACK TO SAVEPOINT helix_row")
+                    self.dropped_rows += 1
+                    db_write_errors.inc(table=table)
+                    print(f"❌ Dropped row for '{table}': {e}")
+                    continue
+                cur.execute("RELEASE SAVEPOINT helix_row")
+                written += 1
+        self.written_rows += written
+        db_rows_written.inc(written, table=table)
+
+# ✅ Shared write-behind queue used by insert_message / insert_task
+write_queue = WriteBehindQueue()
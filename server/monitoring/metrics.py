@@ -0,0 +1,223 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Seconds; tuned for everything from a socket emit to a full generation turn
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)] + list(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter, optionally split by label values."""
+
+    kind = "counter"
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(labels.get(name, "") for name in self.labelnames), 0)
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [(f"{self.name}_total", key, (), value) for key, value in items]
+
+
+class Histogram:
+    """Cumulative-bucket histogram (Prometheus semantics), optionally split by label values."""
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def totals(self):
+        """`(sum, count)` across every label combination."""
+        with self._lock:
+            return sum(s[-2] for s in self._series.values()), sum(s[-1] for s in self._series.values())
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(series)) for key, series in self._series.items()]
+        rows = []
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                rows.append((f"{self.name}_bucket", key, (f'le="{bound}"',), cumulative))
+            rows.append((f"{self.name}_bucket", key, ('le="+Inf"',), series[-1]))
+            rows.append((f"{self.name}_sum", key, (), series[-2]))
+            rows.append((f"{self.name}_count", key, (), series[-1]))
+        return rows
+
+
+class MetricsRegistry:
+    """In-process metrics rendered in the Prometheus text format (no client library needed).
+
+    Besides counters and histograms, `register_collector(fn)` adds gauges
+    read at scrape time: `fn()` returns `(name, help, {label_tuple: value})`
+    triples, which is how the existing `stats()` counters are exported.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._register(Counter(name, help_text, labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, help_text, labelnames, buckets))
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def register_collector(self, collector, labelnames=()):
+        with self._lock:
+            self._collectors.append((collector, tuple(labelnames)))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for sample_name, key, extra, value in metric.samples():
+                lines.append(f"{sample_name}{_format_labels(metric.labelnames, key, extra)} {_format_value(value)}")
+
+        for collector, labelnames in collectors:
+            try:
+                gauges = collector()
+            except Exception as e:
+                print(f"❌ Metrics collector failed: {e}")
+                continue
+            for name, help_text, values in gauges:
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} gauge")
+                for key, value in values.items():
+                    lines.append(f"{name}{_format_labels(labelnames, key)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+# ✅ Shared registry and the hot-path metrics recorded across the server
+metrics = MetricsRegistry()
+
+span_seconds = metrics.histogram("helix_span_duration_seconds", "Time spent in instrumented code paths.", ("span",))
+turn_seconds = metrics.histogram("helix_turn_duration_seconds", "Agent turn latency by outcome.", ("outcome",))
+
+llm_seconds = metrics.histogram("helix_llm_request_duration_seconds", "LLM call latency (full stream for streamed calls).",
+                                ("purpose", "stream"))
+llm_tokens = metrics.counter("helix_llm_tokens", "Tokens reported by the LLM API (kind: prompt, completion, cached_prompt).",
+                             ("purpose", "kind"))
+llm_cached_prompt_share = metrics.histogram("helix_llm_cached_prompt_share",
+                                            "Share of each call's prompt tokens served from the provider's prefix cache.",
+                                            ("purpose",), buckets=(0.0, 0.1, 0.25, 0.5, 0.75, 0.9, 1.0))
+llm_retries = metrics.counter("helix_llm_retries", "LLM call retries after 429/5xx/connection errors.", ("purpose",))
+llm_errors = metrics.counter("helix_llm_errors", "LLM calls that raised.", ("purpose",))
+llm_fallbacks = metrics.counter("helix_llm_fallbacks", "LLM calls served by a fallback tier.", ("purpose", "tier"))
+llm_throttled = metrics.counter("helix_llm_throttled", "Times a tier's RPM/TPM budget could not admit a call.", ("tier",))
+llm_parse_failures = metrics.counter("helix_llm_parse_failures", "LLM replies that could not be parsed or validated.",
+                                     ("purpose",))
+llm_output_repairs = metrics.counter("helix_llm_output_repairs",
+                                     "Malformed LLM replies recovered locally (repaired) or by a continuation request.",
+                                     ("purpose", "method"))
+
+db_write_seconds = metrics.histogram("helix_db_write_duration_seconds", "Database write latency.", ("table",))
+db_rows_written = metrics.counter("helix_db_rows_written", "Rows written to the database.", ("table",))
+db_write_errors = metrics.counter("helix_db_write_errors", "Failed database writes.", ("table",))
+session_conflicts = metrics.counter("helix_session_conflicts",
+                                     "Turns discarded because another worker saved the session first.")
+
+socket_emits = metrics.counter("helix_socket_emits", "Socket.IO events emitted.", ("event",))
+socket_emit_seconds = metrics.histogram("helix_socket_emit_duration_seconds", "Time spent in socketio.emit.", ("event",))
+
+
+@contextmanager
+def span(name: str):
+    """Times a block into `helix_span_duration_seconds{span=name}`."""
+    with span_seconds.time(span=name):
+        yield
+
+
+def instrument_socketio(socketio):
+    """Counts and times every `socketio.emit` (agent, channel and handler emits all go through it)."""
+    emit = socketio.emit
+
+    def timed_emit(event, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return emit(event, *args, **kwargs)
+        finally:
+            socket_emits.inc(event=event)
+            socket_emit_seconds.observe(time.perf_counter() - start, event=event)
+
+    socketio.emit = timed_emit
+    return socketio
+
+
+def stats_collector(name: str, help_text: str, stats_fn):
+    """Exports every numeric field of a `stats()` dict as `<name>_<field>` gauges."""
+    def collect():
+        return [
+            (f"{name}_{field}", f"{help_text} ({field}).", {(): value})
+            for field, value in stats_fn().items()
+            if isinstance(value, (int, float)) and not isinstance(value, bool)
+        ]
+    return collect
@@ -0,0 +1,81 @@
+import sys
+import threading
+import time
+from collections import Counter
+
+
+class SamplingProfiler:
+    """Low-overhead wall-clock profiler that can be switched on and off at runtime.
+
+    A background thread snapshots every thread's stack (`sys._current_frames`)
+    each `interval` seconds and counts collapsed stacks, which `report()`
+    returns in the folded format flame-graph tools read
+    (`thread;outer;...;inner count`).
+    """
+
+    MAX_DEPTH = 64
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self._stacks = Counter()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.samples = 0
+        self.started_at = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval=None):
+        with self._lock:
+            if self.running:
+                return False
+            if interval:
+                self.interval = interval
+            self._stacks.clear()
+            self.samples = 0
+            self.started_at = time.time()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="helix-profiler", daemon=True)
+            self._thread.start()
+        print(f"✅ Sampling profiler started ({self.interval * 1000:.0f}ms interval)")
+        return True
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        print(f"⏹️ Sampling profiler stopped after {self.samples} samples")
+
+    def status(self) -> dict:
+        return {"running": self.running, "interval": self.interval, "samples": self.samples,
+                "started_at": self.started_at}
+
+    def report(self, limit=500) -> str:
+        with self._lock:
+            top = self._stacks.most_common(limit)
+        return "\n".join(f"{stack} {count}" for stack, count in top) + "\n"
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            stacks = []
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                frames = []
+                while frame is not None and len(frames) < self.MAX_DEPTH:
+                    code = frame.f_code
+                    frames.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]})")
+                    frame = frame.f_back
+                stacks.append(";".join([names.get(thread_id, str(thread_id))] + frames[::-1]))
+            with self._lock:
+                self._stacks.update(stacks)
+                self.samples += 1
+
+
+# ✅ Shared profiler, toggled through /api/profiler
+profiler = SamplingProfiler()
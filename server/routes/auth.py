@@ -1,34 +1,74 @@
+from datetime import timedelta
 from flask import Blueprint, request, jsonify
-from werkzeug.security import generate_password_hash, check_password_hash
 from flask_cors import cross_origin
+from flask_jwt_extended import create_access_token
 from database.models import db, User
+from security.credentials import credentials, AuthBusyError
 
 auth_bp = Blueprint("auth", __name__)
 
-@auth_bp.route("/signup", methods=["POST", "OPTIONS"])
+@auth_bp.route("/auth/signup", methods=["POST", "OPTIONS"])
+@auth_bp.route("/signup", methods=["POST", "OPTIONS"])  # Older clients
 @cross_origin()
 def signup():
     if request.method == "OPTIONS":
         return "", 200  # Handle preflight request
 
     try:
-        data = request.json
+        data = request.get_json() or {}
         email = data.get("email")
         password = data.get("password")
-        username = data.get("username")
+        name = data.get("name") or data.get("username")
 
-        if not email or not password or not username:
+        if not email or not password or not name:
             return jsonify({"error": "Missing required fields"}), 400
 
         if User.query.filter_by(email=email).first():
-            return jsonify({"error": "User already exists"}), 409
+            return jsonify({"error": "Email already exists"}), 400
+        db.session.rollback()  # ✅ Don't hold a DB connection while the password is hashed
 
-        hashed_password = generate_password_hash(password, method="pbkdf2:sha256")
+        try:
+            # ✅ bcrypt at HELIX_BCRYPT_ROUNDS, on the credential pool rather than this worker
+            password_hash = credentials.new_password_hash(password)
+        except AuthBusyError as e:
+            print(f"⏹️ Signup for {email} shed: {e}")
+            return jsonify({"error": "Too many sign-ups right now, please retry shortly"}), 503, {"Retry-After": "2"}
 
-        new_user = User(email=email, password=hashed_password, username=username)
+        new_user = User(name=name, email=email, company=data.get("company") or "", role=data.get("role") or "",
+                        password_hash=password_hash)
         db.session.add(new_user)
         db.session.commit()
 
-        return jsonify({"message": "User registered successfully!"}), 201
+        return jsonify({"message": "User registered successfully"}), 201
     except Exception as e:
+        db.session.rollback()
         return jsonify({"error": str(e)}), 500
+
+@auth_bp.route("/auth/login", methods=["POST"])
+def login():
+    data = request.get_json() or {}
+    email, password = data.get("email"), data.get("password")
+    user = User.query.filter_by(email=email).first()
+    user_id, stored = (user.id, user.password) if user else (None, None)
+    db.session.rollback()  # ✅ Don't hold a DB connection while waiting for the hash check
+
+    try:
+        ok, new_hash = credentials.check_password(stored, password)
+    except AuthBusyError as e:
+        print(f"⏹️ Login for {email} shed: {e}")
+        return jsonify({"error": "Too many logins right now, please retry shortly"}), 503, {"Retry-After": "2"}
+
+    if not ok:
+        return jsonify({"error": "Invalid credentials"}), 401
+
+    if new_hash:
+        # ✅ Rehash-on-login: move legacy pbkdf2 / old-cost bcrypt hashes to the current settings
+        try:
+            User.query.filter_by(id=user_id, password=stored).update({"password": new_hash})
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Could not upgrade password hash for {email}: {e}")
+
+    access_token = create_access_token(identity=email, expires_delta=timedelta(hours=1))
+    return jsonify({'message': 'Login successful', 'email': email, 'token': access_token}), 200
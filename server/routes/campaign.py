@@ -0,0 +1,111 @@
+import json
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from agent.campaign import CampaignInputError, campaign_runner, dedupe, parse_records
+from agent.sequence_index import sequence_index
+from database.models import db, User, Sequence
+from monitoring.metrics import db_write_seconds, db_write_errors
+
+campaign_bp = Blueprint("campaign", __name__)
+
+SEQUENCE_WRITE_BATCH = 25  # Sequence rows per bulk insert while a campaign streams
+
+def _save_sequences(user_id, generated):
+    """Bulk-inserts generated `(fields, workspace)` pairs into the Sequence table."""
+    if not generated:
+        return
+    sequences = [Sequence(user_id=user_id, sequence_data=workspace, fields=fields) for fields, workspace in generated]
+    try:
+        with db_write_seconds.time(table="sequence"):
+            db.session.add_all(sequences)
+            db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        db_write_errors.inc(table="sequence")
+        print(f"❌ Error saving {len(generated)} campaign sequences: {e}")
+        return
+    for sequence in sequences:
+        sequence_index.add(user_id, sequence.id, sequence.fields)
+
+@campaign_bp.route("/campaigns", methods=["POST"])
+@jwt_required()
+def create_campaign():
+    """
+    Generates sequences for many roles at once.
+    Body: a JSON list of required_fields records (or {"records": [...]}), or CSV (Content-Type: text/csv).
+    Streams one NDJSON line per record as it completes, then a summary line.
+    With ?mode=batch the work is submitted through the Batch API instead (202 + batch_id).
+    """
+    user = User.query.filter_by(email=get_jwt_identity()).first()
+    if user is None:
+        return jsonify({"error": "Unknown user"}), 401
+    try:
+        records = parse_records(request.get_data(), request.content_type, campaign_runner.max_records)
+    except CampaignInputError as e:
+        return jsonify({"error": str(e)}), 400
+    jobs = dedupe(records)
+
+    if request.args.get("mode") == "batch":
+        try:
+            batch_id, cached = campaign_runner.submit_batch(jobs, user.id)
+        except Exception as e:
+            print(f"❌ Error submitting campaign batch: {e}")
+            return jsonify({"error": "Could not submit the batch"}), 502
+        _save_sequences(user.id, [(jobs[key][0], workspace) for key, workspace in cached.items()])
+        return jsonify({
+            "batch_id": batch_id,
+            "records": len(records),
+            "unique": len(jobs),
+            "cached": [{"key": key, "indexes": jobs[key][1], "workspace": cached[key]} for key in cached],
+            "submitted": [{"key": key, "indexes": indexes} for key, (_, indexes) in jobs.items() if key not in cached],
+        }), 202
+
+    app = current_app._get_current_object()
+
+    def stream():
+        pending, completed, failed = [], 0, 0
+        for key, fields, indexes, workspace, error in campaign_runner.run(jobs, app, user.id):
+            if workspace is not None:
+                completed += 1
+                pending.append((fields, workspace))
+            else:
+                failed += 1
+            for position, index in enumerate(indexes):
+                line = {"index": index, "key": key, "status": "completed" if workspace is not None else "failed",
+                        "fields": fields}
+                if position:
+                    line["duplicate_of"] = indexes[0]
+                if workspace is not None:
+                    line["workspace"] = workspace
+                else:
+                    line["error"] = error
+                yield json.dumps(line) + "\n"
+            if len(pending) >= SEQUENCE_WRITE_BATCH:
+                _save_sequences(user.id, pending)
+                pending = []
+        _save_sequences(user.id, pending)
+        yield json.dumps({"summary": {"records": len(records), "unique": len(jobs),
+                                      "completed": completed, "failed": failed}}) + "\n"
+
+    return Response(stream_with_context(stream()), mimetype="application/x-ndjson")
+
+@campaign_bp.route("/campaigns/batch/<batch_id>", methods=["GET"])
+@jwt_required()
+def campaign_batch_status(batch_id):
+    """Status of the caller's offline campaign; once completed, returns the results and saves the sequences (once)."""
+    user = User.query.filter_by(email=get_jwt_identity()).first()
+    if user is None:
+        return jsonify({"error": "Unknown user"}), 401
+    try:
+        status, results, first_collection = campaign_runner.collect_batch(batch_id, user.id)
+    except Exception as e:
+        print(f"❌ Error reading campaign batch {batch_id}: {e}")
+        return jsonify({"error": "Could not read the batch"}), 502
+    if status == "not_found":
+        return jsonify({"error": "Batch not found"}), 404
+    if results is None:
+        return jsonify({"batch_id": batch_id, "status": status}), 200
+
+    if first_collection:
+        _save_sequences(user.id, [(r["fields"], r["workspace"]) for r in results.values() if "workspace" in r])
+    return jsonify({"batch_id": batch_id, "status": status, "results": results}), 200
@@ -1,23 +1,89 @@
+import json
 from flask import Blueprint, request, jsonify
-from agent.helix_agent import helix_agent
+from agent.session_manager import session_manager
+from agent.task_engine import task_engine
+from routes.message import resolve_session_key
 
 execute_task_bp = Blueprint("execute_task", __name__)
 
+def task_scope(helix_agent) -> str:
+    """Idempotency scope: the same step only shares a result within one session and one set of hiring details."""
+    return json.dumps({"session": helix_agent.room or "", "fields": helix_agent.required_fields}, sort_keys=True)
+
+def validate_steps(steps) -> str:
+    """Why `steps` cannot be executed as a sequence, or None. Progress is tracked per step id, so ids must be unique."""
+    if not isinstance(steps, list):
+        return "tasks must be a list"
+    seen = set()
+    for index, step in enumerate(steps):
+        if not isinstance(step, dict):
+            return f"Step {index} is not an object"
+        step_id = step.get("id")
+        if step_id is None or isinstance(step_id, (dict, list)):
+            return f"Step {index} has no id"
+        if step_id in seen:
+            return f"Duplicate step id {step_id!r}"
+        seen.add(step_id)
+    return None
+
 @execute_task_bp.route("/execute-task", methods=["POST"])
 def execute_task_endpoint():
     """
     Endpoint to execute a single task.
-    Expects JSON with key "stepText" containing the task description.
+    Expects JSON with key "stepText" containing the task description
+    (optionally "stepId" and an "idempotencyKey").
     Returns the execution result as JSON.
     """
     try:
         data = request.json
-        step_text = data.get("stepText", "")
-        # Ensure that the HelixAgent class has an execute_step method
-        result = helix_agent.execute_step(step_text)
-        return jsonify(result)
+        step = {"id": data.get("stepId"), "description": data.get("stepText", "")}
+        helix_agent = session_manager.get_agent(resolve_session_key())
+        result = task_engine.execute_one(helix_agent.execute_step, step, data.get("idempotencyKey"),
+                                         scope=task_scope(helix_agent), owner=helix_agent.owner())
+        status_code = 500 if result["status"] == "failed" else 200
+        return jsonify(result), status_code
+    except Exception as e:
+        return jsonify({
+            "status": "error",
+            "message": f"An error occurred: {str(e)}"
+        }), 500
+
+@execute_task_bp.route("/execute-sequence", methods=["POST"])
+def execute_sequence_endpoint():
+    """
+    Endpoint to execute every step of a sequence concurrently.
+    Expects optional JSON key "tasks" (a list of step objects with unique ids);
+    defaults to the session's current workspace.
+    Returns 202 with a job id; progress is pushed as `task_progress` socket events.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        helix_agent = session_manager.get_agent(resolve_session_key())
+        steps = data.get("tasks") or (helix_agent.latest_workspace or {}).get("tasks") or []
+        if not steps:
+            return jsonify({"status": "error", "message": "No sequence steps to execute"}), 400
+        error = validate_steps(steps)
+        if error:
+            return jsonify({"status": "error", "message": error}), 400
+
+        def on_progress(job_id, update):
+            if helix_agent.socketio:
+                helix_agent.socketio.emit("task_progress", {"job_id": job_id, **update}, to=helix_agent.room)
+
+        job_id = task_engine.execute_sequence(helix_agent.execute_step, steps, scope=task_scope(helix_agent),
+                                              on_progress=on_progress, owner=helix_agent.owner())
+        return jsonify({"status": "accepted", "job_id": job_id, "total": len(steps)}), 202
     except Exception as e:
         return jsonify({
             "status": "error",
             "message": f"An error occurred: {str(e)}"
         }), 500
+
+@execute_task_bp.route("/execute-sequence/<job_id>", methods=["GET"])
+def execute_sequence_status(job_id):
+    """Returns per-step status for a sequence execution job started by the same session."""
+    helix_agent = session_manager.get_agent(resolve_session_key())
+    status = task_engine.job_status(job_id, owner=helix_agent.owner())
+    if status is None:
+        return jsonify({"status": "error", "message": "Unknown job"}), 404
+    return jsonify(status)
@@ -0,0 +1,56 @@
+import time
+from flask import Blueprint, jsonify
+from agent.llm_client import llm_client
+from agent.session_manager import session_manager
+from database.migrations import LATEST_VERSION, schema_version
+from database.pool import get_connection
+from database.write_behind import write_queue
+
+health_bp = Blueprint("health", __name__)
+
+STARTED_AT = time.time()
+
+def _check_database():
+    start = time.perf_counter()
+    try:
+        with get_connection() as conn, conn.cursor() as cur:
+            version = schema_version(cur)
+    except Exception as e:
+        # ✅ Driver errors name hosts, users and databases: log them here, report only "down"
+        print(f"❌ Readiness check: database unavailable - {str(e).strip()}")
+        return False, {"status": "down"}
+    status = {"latency_ms": round((time.perf_counter() - start) * 1000, 1), "schema_version": version,
+              "expected_schema_version": LATEST_VERSION}
+    if version < LATEST_VERSION:
+        return False, dict(status, status="migrations_pending", hint="run python -m database.migrate")
+    return True, dict(status, status="ok")
+
+def _check_llm():
+    # No network call: an open circuit already means the tier's recent calls failed
+    tiers = {name: tier["circuit"] for name, tier in llm_client.stats().items()}
+    available = any(state != "open" for state in tiers.values())
+    return {"status": "ok" if available else "unavailable", "tiers": tiers}
+
+@health_bp.route("/healthz", methods=["GET"])
+def healthz():
+    """Liveness: the process is up and serving requests. Never touches a dependency."""
+    return jsonify({"status": "ok", "uptime_s": round(time.time() - STARTED_AT, 1)}), 200
+
+@health_bp.route("/readyz", methods=["GET"])
+def readyz():
+    """
+    Readiness: 200 when this worker can serve turns, else 503.
+    The database (reachable, schema migrated) gates readiness; the LLM tiers and
+    in-process queues are reported but do not, since every worker shares them.
+    """
+    database_ready, database = _check_database()
+    body = {
+        "status": "ready" if database_ready else "not_ready",
+        "checks": {
+            "database": database,
+            "llm": _check_llm(),
+            "session_store": {"kind": session_manager.store_kind, "sessions": len(session_manager)},
+            "write_queue": {"pending": write_queue.pending(), "dropped_rows": write_queue.dropped_rows},
+        },
+    }
+    return jsonify(body), 200 if database_ready else 503
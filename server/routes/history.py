@@ -0,0 +1,161 @@
+import base64
+import hashlib
+import json
+from datetime import datetime
+from flask import Blueprint, Response, jsonify, request
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy import text
+from agent.sequence_index import sequence_index
+from agent.campaign import REQUIRED_FIELDS
+from database.db_setup import fetch_messages
+from database.models import db, User, Sequence
+
+history_bp = Blueprint("history", __name__)
+
+class CursorError(ValueError):
+    """Raised for a `before` cursor that was not produced by this API."""
+
+def encode_cursor(timestamp, row_id) -> str:
+    return base64.urlsafe_b64encode(f"{timestamp.isoformat()}|{row_id}".encode("utf-8")).decode("ascii")
+
+def decode_cursor(cursor: str):
+    """Returns the (timestamp, id) keyset position encoded by `encode_cursor`."""
+    try:
+        timestamp, row_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|")
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except (ValueError, UnicodeError) as e:
+        raise CursorError(f"Invalid cursor: {e}")
+
+def _page_args(default_limit, max_limit):
+    limit = min(max(request.args.get("limit", default_limit, type=int), 1), max_limit)
+    cursor = request.args.get("before")
+    return limit, cursor, (decode_cursor(cursor) if cursor else None)
+
+def _conditional_page(rows, keys, limit, cursor, serialize):
+    """Builds the page response with an ETag; answers 304 when the client's copy is current.
+
+    The listed rows are append-only (messages, and sequence rows: each
+    generation is a new row, edits go to sequence_revision), so the
+    (timestamp, id) keys of a page identify its content and a matching page
+    is never serialised.
+    """
+    digest = hashlib.sha1(json.dumps([cursor, limit, [(str(t), i) for t, i in keys]]).encode("utf-8"))
+    etag = digest.hexdigest()
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        next_cursor = encode_cursor(*keys[-1]) if len(keys) == limit else None
+        response = jsonify({"items": [serialize(row) for row in rows], "next_cursor": next_cursor})
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "private, no-cache"  # Always revalidate; a 304 is cheap
+    return response
+
+def _current_user_id():
+    user = User.query.filter_by(email=get_jwt_identity()).first()
+    return user.id if user else None
+
+@history_bp.route("/history", methods=["GET"])
+@jwt_required()
+def get_history():
+    """
+    Conversation history of the signed-in user, newest first.
+    Query: limit (default 50, max 200), before (the previous page's next_cursor).
+    """
+    user_id = _current_user_id()
+    if user_id is None:
+        return jsonify({"error": "Unknown user"}), 401
+    try:
+        limit, cursor, before = _page_args(50, 200)
+    except CursorError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        rows = fetch_messages(user_id, limit, before)
+    except Exception as e:
+        print(f"❌ Error reading message history: {e}")
+        return jsonify({"error": "Could not read the history"}), 500
+
+    def serialize(row):
+        row_id, sender, content, timestamp = row
+        return {"id": row_id, "sender": sender, "content": content, "timestamp": timestamp.isoformat()}
+
+    keys = [(timestamp, row_id) for row_id, _, _, timestamp in rows]
+    return _conditional_page(rows, keys, limit, cursor, serialize)
+
+@history_bp.route("/sequences", methods=["GET"])
+@jwt_required()
+def get_sequences():
+    """
+    Saved sequences of the signed-in user, newest first.
+    Query: limit (default 20, max 100), before (the previous page's next_cursor).
+    """
+    user_id = _current_user_id()
+    if user_id is None:
+        return jsonify({"error": "Unknown user"}), 401
+    try:
+        limit, cursor, before = _page_args(20, 100)
+    except CursorError as e:
+        return jsonify({"error": str(e)}), 400
+
+    query = Sequence.query.filter(Sequence.user_id == user_id)
+    if before is not None:
+        query = query.filter(db.tuple_(Sequence.timestamp, Sequence.id) < before)
+    rows = query.order_by(Sequence.timestamp.desc(), Sequence.id.desc()).limit(limit).all()
+
+    def serialize(row):
+        return {"id": row.id, "fields": row.fields, "workspace": row.sequence_data, "version": row.version,
+                "timestamp": row.timestamp.isoformat()}
+
+    return _conditional_page(rows, [(row.timestamp, row.id) for row in rows], limit, cursor, serialize)
+
+@history_bp.route("/sequences/search", methods=["GET"])
+@jwt_required()
+def search_sequences():
+    """
+    Full-text search over the user's saved sequences (job role, technologies, subjects and bodies).
+    Query: q (web-search syntax, e.g. `python "data engineer" -intern`), limit (default 10, max 50).
+    Matches on the job role rank above technologies, then subjects, then bodies.
+    """
+    user_id = _current_user_id()
+    if user_id is None:
+        return jsonify({"error": "Unknown user"}), 401
+    q = (request.args.get("q") or "").strip()
+    if not q:
+        return jsonify({"error": "Missing query parameter 'q'"}), 400
+    limit = min(max(request.args.get("limit", 10, type=int), 1), 50)
+
+    rows = db.session.execute(text("""
+        SELECT id, fields, sequence_data, timestamp, ts_rank_cd(search_vector, query) AS rank
+        FROM sequence, websearch_to_tsquery('english', :q) AS query
+        WHERE user_id = :user_id AND search_vector @@ query
+        ORDER BY rank DESC, timestamp DESC
+        LIMIT :limit
+    """), {"q": q, "user_id": user_id, "limit": limit}).all()
+    return jsonify({"items": [
+        {"id": row.id, "fields": row.fields, "workspace": row.sequence_data,
+         "timestamp": row.timestamp.isoformat(), "rank": round(row.rank, 4)}
+        for row in rows
+    ]})
+
+@history_bp.route("/sequences/similar", methods=["GET"])
+@jwt_required()
+def similar_sequences():
+    """
+    The user's previous sequences generated for the most similar hiring details (local n-gram vectors).
+    Query: any of job_role, technologies, company_description, location, benefits; limit (default 5, max 20).
+    """
+    user_id = _current_user_id()
+    if user_id is None:
+        return jsonify({"error": "Unknown user"}), 401
+    fields = {key: request.args.get(key) for key in REQUIRED_FIELDS}
+    if not any(fields.values()):
+        return jsonify({"error": f"Pass at least one of {', '.join(REQUIRED_FIELDS)}"}), 400
+    limit = min(max(request.args.get("limit", 5, type=int), 1), 20)
+
+    matches = sequence_index.similar(user_id, fields, limit=limit, min_score=0.0)
+    sequences = {row.id: row for row in Sequence.query.filter(Sequence.id.in_([m[0] for m in matches])).all()}
+    return jsonify({"items": [
+        {"id": sequence_id, "score": round(score, 4), "fields": sequences[sequence_id].fields,
+         "workspace": sequences[sequence_id].sequence_data,
+         "timestamp": sequences[sequence_id].timestamp.isoformat()}
+        for sequence_id, score in matches if sequence_id in sequences
+    ]})
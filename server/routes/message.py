@@ -1,10 +1,60 @@
-from flask import Blueprint, request, jsonify
-from agent.helix_agent import helix_agent
+import re
+import secrets
+from flask import Blueprint, g, request, jsonify
+from flask_jwt_extended import verify_jwt_in_request, get_jwt, get_jwt_identity
+from agent.session_manager import session_manager
+from agent.query_executor import query_executor, QueryCancelled, QueueFullError
+from agent.session_store import SessionConflictError
+from security.credentials import credentials
 
 message_bp = Blueprint("message", __name__)
 
+SESSION_HEADER = "X-Session-Id"
+ANON_SESSION_ID = re.compile(r"[A-Za-z0-9_-]{22,64}")  # secrets.token_urlsafe(16) and longer
+
+def _anonymous_session_id():
+    """The anonymous client's session id (header, or `session_id` in the JSON body), or a fresh random one.
+
+    Ids are only accepted in the issued shape, so clients cannot fall into a shared or guessable session.
+    """
+    data = request.get_json(silent=True) or {}
+    session_id = request.headers.get(SESSION_HEADER) or data.get("session_id")
+    if isinstance(session_id, str) and ANON_SESSION_ID.fullmatch(session_id):
+        return session_id
+    g.issued_session_id = secrets.token_urlsafe(16)
+    return g.issued_session_id
+
+@message_bp.after_app_request
+def send_issued_session_id(response):
+    # ✅ A client without a valid id learns the one it was given; it sends it back as X-Session-Id
+    if getattr(g, "issued_session_id", None):
+        response.headers[SESSION_HEADER] = g.issued_session_id
+    return response
+
+def resolve_session_key():
+    """Keys the session on the JWT identity, falling back to an anonymous server-issued session id."""
+    verify_jwt_in_request(optional=True)
+    identity = get_jwt_identity()
+    if identity:
+        # ✅ Verified above, so a socket handshake with the same token can skip decoding it again
+        credentials.remember_token(request.headers.get("Authorization", "").partition(" ")[2], get_jwt())
+        return session_manager.key_for_user(identity)
+    return session_manager.key_for_anon(_anonymous_session_id())
+
 @message_bp.route("/message", methods=["POST"])
 def handle_http_message():
     data = request.json
-    response = helix_agent.process_query(data.get("message", ""))
+    helix_agent = session_manager.get_agent(resolve_session_key())
+    try:
+        response = query_executor.run(
+            helix_agent, data.get("message", ""), bypass_cache=bool(data.get("bypass_cache", False))
+        )
+    except QueueFullError:
+        return jsonify({"error": "Helix is busy, please retry shortly"}), 503
+    except QueryCancelled as e:
+        return jsonify({"error": str(e)}), 504
+    except SessionConflictError:
+        return jsonify({"error": "This session was updated elsewhere; your message was not applied, please retry"}), 409
+    if getattr(g, "issued_session_id", None):
+        response = {**response, "session_id": g.issued_session_id}
     return jsonify(response)
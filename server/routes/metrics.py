@@ -0,0 +1,72 @@
+import hmac
+from flask import Blueprint, Response, current_app, jsonify, request
+from agent.query_executor import query_executor
+from agent.field_extractor import field_extractor
+from agent.response_cache import response_cache
+from agent.intent_router import intent_router
+from agent.session_manager import session_manager
+from agent.llm_client import llm_client
+from agent.sequence_index import sequence_index
+from agent.prompts import prompt_registry
+from database.write_behind import write_queue
+from security.credentials import credentials
+from monitoring.metrics import metrics, stats_collector
+from monitoring.profiler import profiler
+
+metrics_bp = Blueprint("metrics", __name__)
+
+# ✅ The /api/stats counters, exported as gauges on every scrape
+metrics.register_collector(stats_collector("helix_llm_queue", "LLM worker pool", query_executor.stats))
+metrics.register_collector(stats_collector("helix_field_extractor", "Local field extraction", field_extractor.stats))
+metrics.register_collector(stats_collector("helix_response_cache", "Generated-sequence cache", response_cache.stats))
+metrics.register_collector(stats_collector("helix_intent_router", "Local intent routing", intent_router.stats))
+metrics.register_collector(stats_collector("helix_sequence_index", "Similar-sequence index", sequence_index.stats))
+metrics.register_collector(stats_collector("helix_credentials", "Password checks and token cache", credentials.stats))
+metrics.register_collector(lambda: [
+    ("helix_sessions_active", "Agent sessions held in memory.", {(): len(session_manager)}),
+    ("helix_write_queue_pending", "Rows waiting in the write-behind queue.", {(): write_queue.pending()}),
+    ("helix_write_queue_dropped_rows", "Rows the write-behind queue dropped.", {(): write_queue.dropped_rows}),
+])
+metrics.register_collector(lambda: [
+    ("helix_llm_circuit_open", "1 while the tier's circuit breaker is not closed.",
+     {(name,): int(tier["circuit"] != "closed") for name, tier in llm_client.stats().items()}),
+    ("helix_llm_requests_available", "Requests left in the tier's RPM bucket.",
+     {(name,): tier["requests_available"] for name, tier in llm_client.stats().items()}),
+    ("helix_llm_tokens_available", "Tokens left in the tier's TPM bucket.",
+     {(name,): tier["tokens_available"] for name, tier in llm_client.stats().items()}),
+], labelnames=("tier",))
+metrics.register_collector(lambda: [
+    ("helix_prompt_static_tokens", "Tokens in the template's static (cacheable) prefix.",
+     {(name, template["version"]): template["static_tokens"] for name, template in prompt_registry.stats().items()}),
+], labelnames=("template", "version"))
+
+@metrics_bp.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    """Prometheus text exposition of the hot-path counters and histograms."""
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+def _is_admin():
+    token = current_app.config.get("HELIX_ADMIN_TOKEN")
+    supplied = request.headers.get("X-Admin-Token", "")
+    return bool(token) and hmac.compare_digest(token, supplied)
+
+@metrics_bp.route("/api/profiler", methods=["GET", "POST"])
+def toggle_profiler():
+    """GET returns folded stacks (text) or status (?format=json); POST {"enabled", "interval"} starts/stops sampling.
+
+    Disabled unless HELIX_ADMIN_TOKEN is set; requests must send it as X-Admin-Token.
+    """
+    if not _is_admin():
+        return jsonify({"error": "Not found"}), 404
+
+    if request.method == "POST":
+        data = request.get_json(silent=True) or {}
+        if data.get("enabled", True):
+            profiler.start(interval=data.get("interval"))
+        elif profiler.running:
+            profiler.stop()
+        return jsonify(profiler.status())
+
+    if request.args.get("format") == "json":
+        return jsonify(profiler.status())
+    return Response(profiler.report(), mimetype="text/plain")
@@ -0,0 +1,25 @@
+from flask import Blueprint, jsonify
+from agent.query_executor import query_executor
+from agent.field_extractor import field_extractor
+from agent.response_cache import response_cache
+from agent.intent_router import intent_router
+from agent.llm_client import llm_client
+from agent.sequence_index import sequence_index
+from agent.prompts import prompt_registry
+from security.credentials import credentials
+
+stats_bp = Blueprint("stats", __name__)
+
+@stats_bp.route("/stats", methods=["GET"])
+def get_stats():
+    """Returns in-process agent counters (LLM queue depth, field-extraction, cache and intent-routing rates, LLM tiers, similar-sequence index, prompt templates, logins)."""
+    return jsonify({
+        "llm_queue": query_executor.stats(),
+        "field_extractor": field_extractor.stats(),
+        "response_cache": response_cache.stats(),
+        "intent_router": intent_router.stats(),
+        "llm_tiers": llm_client.stats(),
+        "sequence_index": sequence_index.stats(),
+        "prompts": prompt_registry.stats(),
+        "credentials": credentials.stats(),
+    })
@@ -0,0 +1,63 @@
+from flask import Blueprint, request, jsonify
+from agent.session_manager import session_manager
+from agent.session_store import SessionConflictError
+from routes.message import resolve_session_key
+
+workspace_bp = Blueprint("workspace", __name__)
+
+@workspace_bp.route("/workspace/revisions", methods=["GET"])
+def list_revisions():
+    """The session's kept workspace revisions (oldest first) and the current version."""
+    helix_agent = session_manager.get_agent(resolve_session_key())
+    head = helix_agent.workspace.head
+    return jsonify({"version": head.version if head else None, "revisions": helix_agent.workspace.revisions()})
+
+@workspace_bp.route("/workspace/revisions/<int:version>", methods=["GET"])
+def get_revision(version):
+    helix_agent = session_manager.get_agent(resolve_session_key())
+    revision = helix_agent.workspace.get(version)
+    if revision is None:
+        return jsonify({"error": f"Unknown revision {version}"}), 404
+    return jsonify({**revision.summary(), "workspace": revision.workspace()})
+
+@workspace_bp.route("/workspace/diff", methods=["GET"])
+def diff_revisions():
+    """
+    Step changes between two revisions, in the `workspace_delta` shape (upserts, removed, final_sequence).
+    Query: from (required), to (default: current version).
+    """
+    helix_agent = session_manager.get_agent(resolve_session_key())
+    head = helix_agent.workspace.head
+    old_version = request.args.get("from", type=int)
+    new_version = request.args.get("to", head.version if head else None, type=int)
+    if old_version is None or new_version is None:
+        return jsonify({"error": "Missing integer 'from' (and 'to' when the session has no revisions)"}), 400
+    try:
+        return jsonify({"from": old_version, "to": new_version,
+                        **helix_agent.workspace.diff(old_version, new_version)})
+    except KeyError:
+        return jsonify({"error": "Unknown revision"}), 404
+
+@workspace_bp.route("/workspace/revert", methods=["POST"])
+def revert_workspace():
+    """
+    Makes an earlier revision current again, as a new version (no LLM call).
+    Expects JSON {"version": n}. The change reaches the session's sockets as a `workspace_delta`.
+    """
+    data = request.get_json(silent=True) or {}
+    version = data.get("version")
+    if not isinstance(version, int):
+        return jsonify({"error": "Missing integer 'version'"}), 400
+    helix_agent = session_manager.get_agent(resolve_session_key())
+    # ✅ Same lock as a chat turn, so a revert cannot interleave with an edit; don't park the worker behind one
+    if not helix_agent.lock.acquire(timeout=helix_agent.REVERT_LOCK_TIMEOUT):
+        return jsonify({"error": "A message is still being processed, please retry once it finishes"}), 409
+    try:
+        workspace = helix_agent.revert(version)
+    except KeyError:
+        return jsonify({"error": f"Unknown revision {version}"}), 404
+    except SessionConflictError:
+        return jsonify({"error": "This session was updated elsewhere; the revert was not applied"}), 409
+    finally:
+        helix_agent.lock.release()
+    return jsonify({"version": helix_agent.workspace.head.version, "workspace": workspace})
@@ -0,0 +1,206 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+import bcrypt
+from werkzeug.security import check_password_hash
+
+from monitoring.metrics import metrics
+
+auth_seconds = metrics.histogram("helix_auth_verify_duration_seconds",
+                                 "Password verification latency, queueing included.", ("outcome",))
+
+BCRYPT_PREFIXES = ("$2a$", "$2b$", "$2y$")
+LEGACY_PREFIXES = ("pbkdf2:", "scrypt:")  # Written by the old werkzeug signup route
+
+
+class AuthBusyError(Exception):
+    """Raised when `max_queue_depth` verifications are already waiting for a worker."""
+
+
+def _bcrypt_rounds(stored: str):
+    try:
+        return int(stored.split("$")[2])
+    except (IndexError, ValueError):
+        return None
+
+
+def _offload():
+    """Under eventlet, bcrypt in a (green) pool thread would block the hub: run it on a real OS thread."""
+    try:
+        from eventlet import patcher, tpool
+    except ImportError:
+        return None
+    return tpool.execute if patcher.is_monkey_patched("thread") else None
+
+
+class CredentialService:
+    """One place to hash and check passwords and to resolve JWTs.
+
+    Hashes are bcrypt at `rounds`. Older hashes (werkzeug pbkdf2, or bcrypt
+    at another cost) still verify, and a successful login returns the
+    replacement hash so callers can store it (rehash-on-login). Checks run
+    on a bounded pool of `max_workers` threads with at most
+    `max_queue_depth` waiting, so a login burst queues or fails fast with
+    AuthBusyError instead of tying up every request worker; signup hashes
+    on the same pool. JWTs that passed verification are cached for
+    `token_ttl` seconds (never past their expiry), so a socket handshake
+    with a token the HTTP API already verified is a dict hit.
+    """
+
+    def __init__(self, rounds=12, max_workers=2, max_queue_depth=32, timeout=10, token_ttl=60, token_cache_size=10000):
+        self.rounds = rounds
+        self.max_workers = max_workers
+        self.max_queue_depth = max_queue_depth
+        self.timeout = timeout
+        self.token_ttl = token_ttl
+        self.token_cache_size = token_cache_size
+        self._pool = None
+        self._dummy_hash = None
+        self._lock = threading.Lock()
+        self._tokens = OrderedDict()  # token -> (identity, expires_at)
+        self.queued = 0
+        self.verified = 0
+        self.failed = 0
+        self.rehashed = 0
+        self.rejected = 0
+        self.token_hits = 0
+        self.token_misses = 0
+
+    def init_app(self, app):
+        self.rounds = app.config.get("HELIX_BCRYPT_ROUNDS", self.rounds)
+        self.max_workers = app.config.get("HELIX_AUTH_WORKERS", self.max_workers)
+        self.max_queue_depth = app.config.get("HELIX_AUTH_QUEUE_LIMIT", self.max_queue_depth)
+        self.token_ttl = app.config.get("HELIX_TOKEN_CACHE_TTL", self.token_ttl)
+
+    def _executor(self):
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="helix-auth")
+        return self._pool
+
+    def hash_password(self, password: str) -> str:
+        return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(self.rounds)).decode("utf-8")
+
+    def needs_rehash(self, stored: str) -> bool:
+        return not stored.startswith(BCRYPT_PREFIXES) or _bcrypt_rounds(stored) != self.rounds
+
+    def _verify(self, stored, password):
+        """`(ok, new_hash or None)`; runs on a pool thread."""
+        if stored is None:
+            # Unknown user: spend the same time as a real check so response times do not reveal accounts
+            if self._dummy_hash is None:
+                self._dummy_hash = self.hash_password("helix-dummy-password")
+            bcrypt.checkpw(password.encode("utf-8"), self._dummy_hash.encode("utf-8"))
+            return False, None
+        if stored.startswith(BCRYPT_PREFIXES):
+            ok = bcrypt.checkpw(password.encode("utf-8"), stored.encode("utf-8"))
+        elif stored.startswith(LEGACY_PREFIXES):
+            ok = check_password_hash(stored, password)
+        else:
+            ok = False
+        if ok and self.needs_rehash(stored):
+            return True, self.hash_password(password)
+        return ok, None
+
+    def _run(self, fn, *args):
+        with self._lock:
+            self.queued -= 1
+        offload = _offload()
+        return offload(fn, *args) if offload else fn(*args)
+
+    def _submit(self, fn, *args):
+        """Runs `fn(*args)` on the auth pool and waits for it. Raises AuthBusyError when the queue is full."""
+        with self._lock:
+            if self.queued >= self.max_queue_depth:
+                self.rejected += 1
+                raise AuthBusyError(f"{self.queued} password checks already waiting")
+            self.queued += 1
+        future = self._executor().submit(self._run, fn, *args)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            if future.cancel():
+                with self._lock:
+                    self.queued -= 1  # Never started, so _run will not count it down
+            raise FutureTimeoutError(f"Password hashing exceeded {self.timeout}s")
+
+    def new_password_hash(self, password: str) -> str:
+        """`hash_password` on the auth pool (signup), so bcrypt never runs on a request worker."""
+        try:
+            return self._submit(self.hash_password, password)
+        except FutureTimeoutError as e:
+            raise AuthBusyError(str(e))
+
+    def check_password(self, stored, password: str):
+        """Checks `password` against a stored hash (None for an unknown user) on the auth pool.
+
+        Returns `(ok, new_hash)`; `new_hash` is set when the stored hash
+        should be replaced. Raises AuthBusyError when the queue is full.
+        """
+        start = time.perf_counter()
+        try:
+            ok, new_hash = self._submit(self._verify, stored, password or "")
+        except FutureTimeoutError as e:
+            auth_seconds.observe(time.perf_counter() - start, outcome="timeout")
+            raise AuthBusyError(str(e))
+        with self._lock:
+            if ok:
+                self.verified += 1
+            else:
+                self.failed += 1
+            if new_hash:
+                self.rehashed += 1
+        auth_seconds.observe(time.perf_counter() - start, outcome="ok" if ok else "rejected")
+        return ok, new_hash
+
+    def identity_for_token(self, token: str, decode):
+        """The JWT's `sub`, from the cache or by calling `decode(token)` (whose errors propagate)."""
+        with self._lock:
+            cached = self._tokens.get(token)
+            if cached is not None and cached[1] > time.time():
+                self._tokens.move_to_end(token)
+                self.token_hits += 1
+                return cached[0]
+            self.token_misses += 1
+
+        claims = decode(token)
+        self.remember_token(token, claims)
+        return claims["sub"]
+
+    def remember_token(self, token: str, claims: dict):
+        """Caches a token that was just verified (never one that was not) for `token_ttl` seconds."""
+        if not self.token_ttl:
+            return
+        now = time.time()
+        expires_at = min(now + self.token_ttl, claims.get("exp") or now + self.token_ttl)
+        with self._lock:
+            self._tokens[token] = (claims["sub"], expires_at)
+            self._tokens.move_to_end(token)
+            while len(self._tokens) > self.token_cache_size:
+                self._tokens.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.token_hits + self.token_misses
+            return {
+                "bcrypt_rounds": self.rounds,
+                "queue_depth": self.queued,
+                "verified": self.verified,
+                "failed": self.failed,
+                "rehashed": self.rehashed,
+                "rejected": self.rejected,
+                "max_workers": self.max_workers,
+                "tokens_cached": len(self._tokens),
+                "token_hit_rate": self.token_hits / lookups if lookups else 0.0,
+            }
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+# ✅ Shared credential service, configured in app.py
+credentials = CredentialService()
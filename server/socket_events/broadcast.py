@@ -0,0 +1,61 @@
+import copy
+
+
+def workspace_delta(previous: dict, current: dict) -> dict:
+    """Changes needed to turn `previous` into `current`, keyed by step id.
+
+    `upserts` holds only new or changed steps, `removed` the ids that
+    disappeared, and `final_sequence` is included only when it changed.
+    """
+    previous = previous or {}
+    current = current or {}
+    old_steps = {task.get("id"): task for task in previous.get("tasks", []) if isinstance(task, dict)}
+    new_steps = {task.get("id"): task for task in current.get("tasks", []) if isinstance(task, dict)}
+
+    delta = {
+        "upserts": [task for step_id, task in new_steps.items() if old_steps.get(step_id) != task],
+        "removed": [step_id for step_id in old_steps if step_id not in new_steps],
+    }
+    if previous.get("final_sequence") != current.get("final_sequence"):
+        delta["final_sequence"] = current.get("final_sequence")
+    return delta
+
+
+class WorkspaceChannel:
+    """Versioned workspace publishing for one session room.
+
+    Each publish bumps `version` and emits `workspace_delta` with only what
+    changed since the last publish. `snapshot()` returns the full state for
+    (re)connecting clients, which is sent as `workspace_snapshot`.
+    """
+
+    def __init__(self, socketio=None, room=None):
+        self.socketio = socketio
+        self.room = room
+        self.version = 0
+        self._published = {}
+
+    def publish(self, workspace: dict, partial: bool = False):
+        delta = workspace_delta(self._published, workspace)
+        if not delta["upserts"] and not delta["removed"] and "final_sequence" not in delta:
+            return None
+
+        self.version += 1
+        self._published = copy.deepcopy(workspace) if workspace else {}
+        payload = {"version": self.version, "base_version": self.version - 1, "partial": partial, **delta}
+        if self.socketio:
+            self.socketio.emit("workspace_delta", payload, to=self.room)
+        return payload
+
+    def restore(self, version: int, workspace: dict):
+        """Resumes versioning from saved session state (e.g. after another worker served a turn)."""
+        self.version = version or 0
+        self._published = copy.deepcopy(workspace) if (workspace and self.version) else {}
+
+    def snapshot(self) -> dict:
+        return {"version": self.version, "workspace": self._published}
+
+    def send_snapshot(self, to):
+        """Full resync for one socket (on connect or when it detects a version gap)."""
+        if self.socketio:
+            self.socketio.emit("workspace_snapshot", self.snapshot(), to=to)
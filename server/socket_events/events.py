@@ -1,24 +1,111 @@
-from flask_socketio import SocketIO
-from agent.helix_agent import HelixAgent
+from flask import request
+from flask_socketio import SocketIO, join_room
+from flask_jwt_extended import decode_token
+from agent.session_manager import SessionManager
+from agent.query_executor import QueryExecutor, QueueFullError
+from agent.session_store import SessionConflictError
+from security.credentials import credentials
 
-def register_socket_events(socketio: SocketIO, helix_agent: HelixAgent):
-    """Registers all WebSocket event handlers and links HelixAgent."""
+def register_socket_events(socketio: SocketIO, session_manager: SessionManager, query_executor: QueryExecutor):
+    """Registers all WebSocket event handlers and resolves a HelixAgent per connection."""
+
+    # sid -> session key (JWT identity when the client authenticated, else the sid itself)
+    session_keys = {}
+
+    @socketio.on("connect")
+    def handle_connect(auth=None):
+        """Binds the socket to the user's session when a JWT is supplied in the handshake."""
+        session_key = session_manager.key_for_sid(request.sid)
+        token = (auth or {}).get("token")
+        if token:
+            try:
+                session_key = session_manager.key_for_user(credentials.identity_for_token(token, decode_token))
+            except Exception as e:
+                print(f"❌ Invalid socket token, using anonymous session: {e}")
+        session_keys[request.sid] = session_key
+        join_room(session_key)  # Agent emits (progress, workspace deltas) target this room
+        session_manager.get_agent(session_key).resync(request.sid)
+
+    @socketio.on("workspace_resync")
+    def handle_workspace_resync(*args):
+        """Full snapshot for a client that missed a delta (its version no longer matches)."""
+        session_key = session_keys.get(request.sid, session_manager.key_for_sid(request.sid))
+        session_manager.get_agent(session_key).resync(request.sid)
+
+    @socketio.on("workspace_revert")
+    def handle_workspace_revert(version):
+        """Makes an earlier workspace revision current again; every socket of the session gets the delta."""
+        session_key = session_keys.get(request.sid, session_manager.key_for_sid(request.sid))
+        helix_agent = session_manager.get_agent(session_key)
+        if not helix_agent.lock.acquire(timeout=helix_agent.REVERT_LOCK_TIMEOUT):
+            return {"status": "busy", "message": "A message is still being processed, please retry once it finishes"}
+        try:
+            helix_agent.revert(int(version))
+        except (KeyError, TypeError, ValueError):
+            return {"status": "error", "message": f"Unknown revision {version}"}
+        except SessionConflictError:
+            return {"status": "conflict", "message": "This session was updated elsewhere; the revert was not applied"}
+        finally:
+            helix_agent.lock.release()
+        return {"status": "ok", "version": helix_agent.workspace.head.version}
+
+    @socketio.on("disconnect")
+    def handle_disconnect(*args):
+        """Anonymous sessions die with their socket; user sessions stay until LRU/TTL eviction."""
+        query_executor.cancel_owner(request.sid)
+        session_key = session_keys.pop(request.sid, None)
+        if session_key and session_key.startswith("sid:"):
+            session_manager.evict(session_key)
 
     @socketio.on("user_message")
     def handle_socket_message(message):
-        """Handles incoming WebSocket messages and processes them with HelixAgent."""
+        """Queues the message on the LLM worker pool and acknowledges immediately.
+
+        Chat replies are emitted to this socket as `ai_response`; workspace
+        changes reach every socket of the session as `workspace_delta`.
+        `turn_complete` tells the socket the turn finished (`type` is
+        "question", "final", "error", or "conflict" when another worker
+        saved the session first and this turn was discarded).
+        """
         print(f"📩 Received socket message: {message}")
+        sid = request.sid
 
-        try:
-            result = helix_agent.process_query(message)
-            print(f"✅ Processed LLM Result: {result}")
+        # Plain strings are messages; dicts may carry per-request options
+        bypass_cache = False
+        if isinstance(message, dict):
+            bypass_cache = bool(message.get("bypass_cache", False))
+            message = message.get("message", "")
 
+        def on_done(result):
+            print(f"✅ Processed LLM Result: {result}")
             if "chat" in result and result["chat"]:
-                socketio.emit("ai_response", result["chat"]["content"])
-            
-            if "workspace" in result and result["workspace"]:
-                socketio.emit("workspace_update", result["workspace"])
+                socketio.emit("ai_response", result["chat"]["content"], to=sid)
+            socketio.emit("turn_complete", {"type": result.get("type")}, to=sid)
+
+        def on_error(error):
+            print(f"❌ Error processing socket message: {str(error)}")
+            if isinstance(error, SessionConflictError):
+                # ✅ The socket already got the winning state as a workspace_snapshot
+                socketio.emit("ai_response", "This session was updated in another tab. Please send your message again.", to=sid)
+                socketio.emit("turn_complete", {"type": "conflict"}, to=sid)
+                return
+            socketio.emit("ai_response", "An error occurred while processing your request. Please try again.", to=sid)
+            socketio.emit("turn_complete", {"type": "error"}, to=sid)
+
+        try:
+            session_key = session_keys.get(sid, session_manager.key_for_sid(sid))
+            helix_agent = session_manager.get_agent(session_key)
+            request_id, _ = query_executor.submit(
+                helix_agent, message, owner=sid, on_done=on_done, on_error=on_error, bypass_cache=bypass_cache
+            )
+            return {"status": "queued", "request_id": request_id, "queue_depth": query_executor.stats()["queue_depth"]}
+
+        except QueueFullError as e:
+            print(f"❌ LLM queue full: {e}")
+            socketio.emit("ai_response", "Helix is busy right now. Please try again in a moment.", to=sid)
+            return {"status": "rejected"}
 
         except Exception as e:
             print(f"❌ Error processing socket message: {str(e)}")
-            socketio.emit("ai_response", "An error occurred while processing your request. Please try again.")
+            socketio.emit("ai_response", "An error occurred while processing your request. Please try again.", to=sid)
+            return {"status": "error"}
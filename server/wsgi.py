@@ -0,0 +1,24 @@
+"""Production entry point.
+
+Single process (threading mode):
+    python wsgi.py
+
+Several processes, no sticky sessions (see "Multi-worker deployment" in the README):
+    SOCKETIO_ASYNC_MODE=eventlet HELIX_SESSION_STORE=postgres SOCKETIO_MESSAGE_QUEUE=redis://localhost:6379/0 \\
+        gunicorn -k eventlet -w 4 --bind 0.0.0.0:5000 wsgi:app
+"""
+import os
+
+# ✅ Patch the standard library before anything else imports it
+ASYNC_MODE = os.getenv("SOCKETIO_ASYNC_MODE", "")
+if ASYNC_MODE == "eventlet":
+    import eventlet
+    eventlet.monkey_patch()
+elif ASYNC_MODE == "gevent":
+    from gevent import monkey
+    monkey.patch_all()
+
+from app import app, socketio  # noqa: E402
+
+if __name__ == "__main__":
+    socketio.run(app, host="0.0.0.0", port=int(os.getenv("PORT", 5000)))